@@ -0,0 +1,226 @@
+from service.generator import DataGenerator
+from service.database import Database
+from service.sqlite_database import SQLiteDatabase
+from service.cache import EntityCache
+from service.load_indexes import LOAD_INDEX_MODES
+from config.probabilities import load_config
+from config.env import SAMPLING_BACKEND, FAKER_POOL_SIZE, LOAD_INDEXES
+from main import build_stages
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_SCALES = "1000,10000,100000"
+
+class TimedRows:
+    """Iterável que acumula o tempo gasto gerando as linhas (dentro de cada next)."""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            return next(self.rows)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+class BenchmarkGenerator(DataGenerator):
+    """DataGenerator que mede o tempo de geração das linhas de cada estágio."""
+
+    # Geradores criados, na ordem, para somar o tempo de geração de cada estágio
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timed_rows = []
+        BenchmarkGenerator.instances.append(self)
+
+    def generate_shards(self, method_name, columns, items, *shared_args, start=0):
+        # A espera pelos shards (processos) e a geração das linhas de cada um são medidas em separado
+        shards = TimedRows(super().generate_shards(method_name, columns, items, *shared_args, start=start))
+        self.timed_rows.append(shards)
+        for index, rows in shards:
+            rows = TimedRows(rows)
+            self.timed_rows.append(rows)
+            yield index, rows
+
+    @property
+    def generation_seconds(self):
+        return sum(rows.seconds for rows in self.timed_rows)
+
+def peak_rss_mb(who=None):
+    """Pico de memória residente do processo (ou dos processos filhos), em MB."""
+    if resource is None:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    return usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def count_rows(database, table_name):
+    """Quantidade de linhas da tabela."""
+    with database() as db:
+        return db.search(table_name=table_name, columns=["COUNT(*) AS TOTAL"])[0]["TOTAL"]
+
+def git_revision():
+    """Commit atual, para comparar resultados entre versões."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_scale(config, num_customer, database, options, graph=False):
+    """Executa todos os estágios, em sequência, para num_customer clientes e retorna as métricas de cada um."""
+    stages = build_stages(config, EntityCache(), num_customer, dict(options, database=database), BenchmarkGenerator, graph=graph)
+    results = []
+    start = time.perf_counter()
+
+    for stage in stages:
+        table_names = sorted(stage.outputs)
+        rows_before = sum(count_rows(database, table_name) for table_name in table_names)
+        first_generator = len(BenchmarkGenerator.instances)
+
+        stage_start = time.perf_counter()
+        load_mode = stage.func()
+        seconds = time.perf_counter() - stage_start
+
+        rows = sum(count_rows(database, table_name) for table_name in table_names) - rows_before
+        generators = BenchmarkGenerator.instances[first_generator:]
+        generation_seconds = sum(generator.generation_seconds for generator in generators)
+        # A gravação é o tempo do estágio menos a espera pelos lotes (a geração em paralelo não entra)
+        insert_seconds = seconds - sum(generator.db.wait_seconds for generator in generators)
+
+        results.append({
+            "stage": stage.name,
+            "table": ", ".join(table_names),
+            "rows": rows,
+            "seconds": round(seconds, 4),
+            "generation_seconds": round(generation_seconds, 4),
+            "insert_seconds": round(insert_seconds, 4),
+            "rows_per_second": round(rows / seconds, 1) if seconds else None,
+            "load_mode": load_mode,
+            "peak_rss_mb": peak_rss_mb(),
+            "children_peak_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if resource and options["processes"] > 1 else None
+        })
+        print(f"  {stage.name}: {rows} rows in {seconds:.2f} seconds ({rows / seconds if seconds else 0:.0f} rows/s, "
+              f"generation {generation_seconds:.2f}s, insert {insert_seconds:.2f}s)")
+
+    total_seconds = time.perf_counter() - start
+    total_rows = sum(result["rows"] for result in results)
+    return {
+        "customers": num_customer,
+        "rows": total_rows,
+        "seconds": round(total_seconds, 4),
+        "rows_per_second": round(total_rows / total_seconds, 1) if total_seconds else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": results
+    }
+
+def database_factory(backend, path):
+    """Retorna a função que cria o Database de cada estágio e a conexão que mantém o banco vivo (se houver)."""
+    if backend == "mysql":
+        return Database, None
+
+    if backend == "sqlite" and os.path.exists(path):
+        os.remove(path)
+
+    template = SQLiteDatabase(path if backend == "sqlite" else None)
+    keeper = template.keep_alive()
+    template.create_schema(load_config())
+    return (lambda: SQLiteDatabase(template.path)), keeper
+
+def compare(results, baseline_path):
+    """Imprime a variação de rows/s de cada estágio em relação a um resultado anterior."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    previous = {
+        (scale["customers"], stage["stage"]): stage["rows_per_second"]
+        for scale in baseline["scales"] for stage in scale["stages"]
+    }
+
+    print(f"comparison with {baseline_path} ({baseline.get('revision')}):")
+    for scale in results["scales"]:
+        for stage in scale["stages"]:
+            before = previous.get((scale["customers"], stage["stage"]))
+            if before and stage["rows_per_second"]:
+                change = (stage["rows_per_second"] - before) / before * 100
+                print(f"  {scale['customers']} {stage['stage']}: {before:.0f} -> {stage['rows_per_second']:.0f} rows/s ({change:+.1f}%)")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mede a geração e a inserção de cada estágio em várias escalas.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES,
+                        help=f"Quantidades de clientes separadas por vírgula (padrão: {DEFAULT_SCALES})")
+    parser.add_argument("--backend", choices=["memory", "sqlite", "mysql"], default="memory",
+                        help="Banco usado: SQLite em memória, arquivo SQLite ou o MySQL do .env (padrão: memory)")
+    parser.add_argument("--db-path", default="benchmark.sqlite",
+                        help="Arquivo do banco com --backend sqlite, recriado a cada escala (padrão: benchmark.sqlite)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Quantidade de processos que geram as linhas de cada estágio (padrão: 1)")
+    parser.add_argument("--seed", type=int, default=1,
+                        help="Semente mestre; fixa por padrão para que as execuções gerem os mesmos dados (padrão: 1)")
+    parser.add_argument("--output", default="benchmark_results.json",
+                        help="Arquivo JSON com os resultados (padrão: benchmark_results.json)")
+    parser.add_argument("--load-indexes", choices=LOAD_INDEX_MODES, default=LOAD_INDEXES,
+                        help="Índices das tabelas de fatos durante a carga (padrão: LOAD_INDEXES do .env)")
+    parser.add_argument("--graph", action="store_true",
+                        help="Mede o estágio único do grafo de cada cliente em vez dos estágios por tabela")
+    parser.add_argument("--baseline", default=None,
+                        help="Resultado JSON anterior para comparar rows/s por estágio")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    config = load_config()
+    scales = sorted(int(scale) for scale in args.scales.split(","))
+    options = {"processes": args.processes, "seed": args.seed, "load_indexes": args.load_indexes}
+
+    results = {
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "backend": args.backend,
+        "processes": args.processes,
+        "seed": args.seed,
+        "sampling_backend": SAMPLING_BACKEND,
+        "faker_pool_size": FAKER_POOL_SIZE,
+        "load_indexes": args.load_indexes,
+        "graph": args.graph,
+        "scales": []
+    }
+
+    # O pico de memória do processo só cresce, então as escalas rodam da menor para a maior
+    for num_customer in scales:
+        print(f"{num_customer} customers ({args.backend}):")
+        database, keeper = database_factory(args.backend, args.db_path)
+        try:
+            results["scales"].append(run_scale(config, num_customer, database, options, args.graph))
+        finally:
+            if keeper is not None:
+                keeper.close()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"results: {args.output}")
+
+    if args.baseline:
+        compare(results, args.baseline)
+
+if __name__ == "__main__":
+    main()
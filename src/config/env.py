@@ -6,4 +6,49 @@ load_dotenv(override=True)
 DB_HOST = os.getenv("DB_HOST")
 DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
\ No newline at end of file
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+
+# Backend dos sorteios ponderados: "choices", "alias" ou "numpy"
+SAMPLING_BACKEND = os.getenv("SAMPLING_BACKEND") or "choices"
+
+# Quantidade de linhas enviadas e confirmadas (commit) por lote nos inserts
+INSERT_BATCH_SIZE = int(os.getenv("INSERT_BATCH_SIZE") or 5000)
+
+# Carga em massa (LOAD DATA LOCAL INFILE) das tabelas de fatos: pedidos, itens e solicitações
+BULK_LOAD = (os.getenv("BULK_LOAD") or "false").lower() in ("1", "true", "yes")
+BULK_LOAD_BATCH_SIZE = int(os.getenv("BULK_LOAD_BATCH_SIZE") or 50000)
+MULTI_ROW_INSERT_SIZE = int(os.getenv("MULTI_ROW_INSERT_SIZE") or 1000)
+
+# Pool de conexões e configurações de sessão
+DB_PORT = int(os.getenv("DB_PORT") or 0) or None
+DB_POOL = (os.getenv("DB_POOL") or "true").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or 8)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT") or 30)
+DB_AUTOCOMMIT = (os.getenv("DB_AUTOCOMMIT") or "false").lower() in ("1", "true", "yes")
+# Desliga unique_checks e foreign_key_checks nas sessões de carga
+DB_DISABLE_CHECKS = (os.getenv("DB_DISABLE_CHECKS") or "false").lower() in ("1", "true", "yes")
+DB_PREPARED_STATEMENTS = (os.getenv("DB_PREPARED_STATEMENTS") or "false").lower() in ("1", "true", "yes")
+
+# Quantidade de valores distintos pré-gerados por campo do Faker (0 desliga os pools)
+FAKER_POOL_SIZE = int(os.getenv("FAKER_POOL_SIZE") or 0)
+
+# Entidades por shard; cada shard tem a sua semente, então a mesma semente e o mesmo SHARD_SIZE geram os mesmos dados
+SHARD_SIZE = int(os.getenv("SHARD_SIZE") or 2000)
+
+# Buscas: valores por lista IN (acima disso, a busca é feita em partes ou com uma tabela temporária)
+# e linhas lidas por vez nas buscas em stream
+SEARCH_IN_LIST_SIZE = int(os.getenv("SEARCH_IN_LIST_SIZE") or 1000)
+SEARCH_FETCH_SIZE = int(os.getenv("SEARCH_FETCH_SIZE") or 10000)
+
+# Lotes gerados em outra thread à frente da gravação, enquanto o lote anterior é gravado (0 desliga)
+WRITE_PREFETCH = int(os.getenv("WRITE_PREFETCH") or 4)
+
+# Índices e chaves estrangeiras das tabelas de fatos durante a carga: "keep" (mantém), "disable"
+# (desliga as verificações da sessão) ou "drop" (remove e recria no fim); a integridade é verificada no fim
+LOAD_INDEXES = (os.getenv("LOAD_INDEXES") or "keep").lower()
+
+# Orçamento de memória da execução em MB (0 ou vazio: a memória física da máquina); acima dele a execução é recusada
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB") or 0)
+
+# Tamanho máximo em MB do cache de snapshots (--snapshot); acima dele, os usados há mais tempo são removidos
+SNAPSHOT_CACHE_MB = float(os.getenv("SNAPSHOT_CACHE_MB") or 2048)
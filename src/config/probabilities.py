@@ -1,6 +1,193 @@
+import copy
 import json
+import os
+import re
+import time
+from collections import Counter
+from datetime import datetime
+from utils.sampling import WeightedSampler
 
-def getConfig(probability):
-    with open('src/config/probabilities.json', 'r') as f:
-        config = json.load(f)
-        return config[probability]
\ No newline at end of file
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "probabilities.json")
+
+# Tabelas de probabilidades sorteadas pelos geradores
+WEIGHTED_TABLES = [
+    "state_probabilities",
+    "city_probabilities",
+    "active_customer_order_probabilities",
+    "active_customer_request_probabilities",
+    "specie_probabilities",
+    "quantity_pets_probabilities",
+    "quantity_order_item_probabilities",
+    "status_order_probabilities",
+    "quantity_order_items_probabilities",
+    "status_request_probabilities"
+]
+
+# Tabelas cujos valores são intervalos no formato "(min, max)"
+RANGE_TABLES = [
+    "range_of_orders_per_customer",
+    "range_of_requests_per_customer"
+]
+
+RANGE_PATTERN = re.compile(r'^\(\s*\d+\s*,\s*\d+\s*\)$')
+
+def parse_range(range_str):
+    """Converte uma string no formato "(12, 25)" em uma tupla (12, 25)."""
+    if not RANGE_PATTERN.match(range_str):
+        raise ValueError(f"Intervalo inválido: {range_str!r}")
+
+    start, end = map(int, re.findall(r'\d+', range_str))
+    if start > end:
+        raise ValueError(f"Intervalo inválido: {range_str!r}")
+
+    return start, end
+
+class WeightedTable:
+    """Tabela de probabilidades pré-compilada, pronta para sorteio."""
+
+    def __init__(self, name, probabilities):
+        if not isinstance(probabilities, dict) or not probabilities:
+            raise ValueError(f"A tabela '{name}' deve ser um objeto não vazio")
+
+        for key, weight in probabilities.items():
+            if not isinstance(weight, (int, float)) or weight < 0:
+                raise ValueError(f"Peso inválido em '{name}': {key!r} = {weight!r}")
+
+        if sum(probabilities.values()) <= 0:
+            raise ValueError(f"A tabela '{name}' precisa de ao menos um peso positivo")
+
+        self.name = name
+        self.sampler = WeightedSampler(probabilities.keys(), probabilities.values())
+        self.keys = self.sampler.keys
+        self.weights = self.sampler.weights
+        self.cum_weights = self.sampler.cum_weights
+        self.total = self.cum_weights[-1]
+
+        # Chaves no formato "(min, max)" já ficam convertidas em tuplas
+        if all(RANGE_PATTERN.match(key) for key in self.keys):
+            self.ranges = {key: parse_range(key) for key in self.keys}
+        else:
+            self.ranges = None
+
+    def sample(self, k, rng=None):
+        """Sorteia k chaves de uma só vez."""
+        return self.sampler.sample(k, rng)
+
+    def stream(self, rng=None):
+        """Fluxo contínuo de sorteios, calculados em lotes."""
+        return self.sampler.stream(rng=rng)
+
+    def __repr__(self):
+        return f"WeightedTable({self.name!r}, keys={self.keys!r})"
+
+def validate_config(config):
+    """Valida a estrutura do arquivo de configuração."""
+    required = ["start_date", "end_date", "number_customer", "temperature_periods", "products_order_item_probabilities"]
+    missing = [key for key in required + WEIGHTED_TABLES + RANGE_TABLES if key not in config]
+    if missing:
+        raise ValueError(f"Chaves ausentes na configuração: {', '.join(missing)}")
+
+    if not isinstance(config["number_customer"], int) or config["number_customer"] < 0:
+        raise ValueError("'number_customer' deve ser um inteiro não negativo")
+
+    start_date = datetime.strptime(config["start_date"], "%Y-%m-%d")
+    end_date = datetime.strptime(config["end_date"], "%Y-%m-%d")
+    # Com o período vazio, with_window não teria como calcular a escala das atividades
+    if start_date >= end_date:
+        raise ValueError("'start_date' deve ser anterior a 'end_date'")
+
+    for name in RANGE_TABLES:
+        for key in ("active", "inactive"):
+            if key not in config[name]:
+                raise ValueError(f"A tabela '{name}' precisa da chave '{key}'")
+
+    for period in ("warm_period", "cold_period"):
+        period_config = config["temperature_periods"].get(period)
+        if not period_config or "start_month_day" not in period_config or "end_month_day" not in period_config:
+            raise ValueError(f"Período de temperatura '{period}' inválido")
+
+class Config:
+    """Configuração carregada uma única vez, validada e pré-compilada."""
+
+    def __init__(self, path=CONFIG_PATH):
+        start_time = time.perf_counter()
+
+        with open(path, 'r') as f:
+            self.raw = json.load(f)
+
+        validate_config(self.raw)
+
+        self.path = path
+        self.start_date = datetime.strptime(self.raw["start_date"], "%Y-%m-%d")
+        self.end_date = datetime.strptime(self.raw["end_date"], "%Y-%m-%d")
+        self.number_customer = self.raw["number_customer"]
+        self.temperature_periods = self.raw["temperature_periods"]
+
+        # Janela de datas das atividades (pedidos e solicitações) e a sua fração do período do config
+        self.window = None
+        self.activity_scale = 1.0
+
+        self.tables = {name: WeightedTable(name, self.raw[name]) for name in WEIGHTED_TABLES}
+        self.product_tables = {
+            period: WeightedTable(f"products_order_item_probabilities.{period}", probabilities)
+            for period, probabilities in self.raw["products_order_item_probabilities"].items()
+        }
+        self.ranges = {
+            name: {key: parse_range(value) for key, value in self.raw[name].items()}
+            for name in RANGE_TABLES
+        }
+
+        self.load_time = time.perf_counter() - start_time
+        self.calls = Counter()
+
+    def get(self, key):
+        """Retorna o valor bruto de uma chave da configuração."""
+        self.calls[key] += 1
+        return self.raw[key]
+
+    def table(self, name):
+        """Retorna a tabela de probabilidades pré-compilada."""
+        self.calls[name] += 1
+        return self.tables[name]
+
+    def product_table(self, period):
+        """Retorna a tabela de tipos de produto para o período ("warm" ou "cold")."""
+        self.calls["products_order_item_probabilities"] += 1
+        return self.product_tables[period]
+
+    def range(self, name, key):
+        """Retorna o intervalo (min, max) já convertido para a chave informada."""
+        self.calls[name] += 1
+        return self.ranges[name][key]
+
+    def with_window(self, start_date, end_date):
+        """Cópia do config com as atividades restritas a [start_date, end_date].
+
+        As quantidades de pedidos e solicitações por cliente passam a ser proporcionais ao tamanho
+        da janela em relação ao período do config (activity_scale)."""
+        if end_date < start_date:
+            raise ValueError("A data final da janela deve ser posterior à inicial")
+
+        window = copy.copy(self)
+        window.window = (start_date, end_date)
+        window.start_date = start_date
+        window.end_date = end_date
+        window.activity_scale = (end_date - start_date) / (self.end_date - self.start_date)
+        return window
+
+    def stats(self):
+        """Retorna o tempo de carga e a contagem de acessos por chave."""
+        return {
+            "load_time": self.load_time,
+            "calls": dict(self.calls),
+            "total_calls": sum(self.calls.values())
+        }
+
+_config = None
+
+def load_config(path=CONFIG_PATH, reload=False):
+    """Retorna a configuração compartilhada, carregando o arquivo apenas na primeira chamada."""
+    global _config
+    if _config is None or reload:
+        _config = Config(path)
+    return _config
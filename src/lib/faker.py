@@ -1,130 +1,114 @@
 from faker import Faker
+from lib.faker_pool import FakerPool, date_of_birth
 from utils.utils import clean_phone_number
-from config.probabilities import getConfig
-from datetime import datetime, timedelta
+from utils.rng import derive_seed
+from utils.metrics import metrics
+from utils.timeline import Timeline, SECONDS_PER_DAY
+from config.probabilities import load_config
+from config.env import FAKER_POOL_SIZE
 import random
 
+COMPLEMENT_TYPES = [None, "Apto", "Bloco", "Casa", "Conjunto"]
+
 class FakeDataGenerator:
-    def __init__(self):
+    def __init__(self, config=None, pool_size=None, seed=None):
         self.faker = Faker("pt_BR")
+        self.config = config or load_config()
+
+        # Sorteios das linhas (raças, cidades, complementos...) usam este gerador, nunca o random global
+        self.rng = random.Random()
+        if seed is not None:
+            self.reseed(seed)
+
+        # Com pool_size > 0 os valores vêm de pools pré-gerados em vez de uma chamada ao Faker por linha
+        pool_size = FAKER_POOL_SIZE if pool_size is None else pool_size
+        self.pool = FakerPool(pool_size, self.config.end_date, seed) if pool_size else None
+
+        # Datas de pedidos e solicitações, sorteadas como instantes da linha do tempo do config
+        self.timeline = Timeline(self.config)
+
+    def reseed(self, seed):
+        """Reinicia os sorteios próprios e os do Faker a partir da semente (de um estágio ou shard)."""
+        self.rng.seed(seed)
+        self.faker.seed_instance(derive_seed(seed, "faker"))
+
+    @metrics.timed("faker.generate_customer")
+    def generate_customer(self, index):
+        """Gera dados falsos para um cliente.
+
+        Com o pool ativo, o índice do cliente (ver DataGenerator.customer_indexes) entra no e-mail para garantir que seja único."""
+        if self.pool:
+            first_name = self.pool.pick("first_name", self.rng)
+            last_name = self.pool.pick("last_name", self.rng)
+
+            return {
+                "name": f"{first_name} {last_name}",
+                "email": self.pool.email(first_name, last_name, index, self.rng),
+                "phone": self.pool.pick("phone", self.rng)
+            }
 
-    def generate_customer(self):
-        """Gera dados falsos para um cliente."""
         return {
             "name": self.faker.name(),
             "email": self.faker.email(),
-            "phone": clean_phone_number(self.faker.phone_number())
+            "phone": clean_phone_number(self.faker.phone_number(), self.rng)
         }
     
+    @metrics.timed("faker.generate_pet")
     def generate_pet(self, breed_ids, size_ids, customer_id):
         """Gera dados falsos para um pet."""
 
         return {
-            "name": self.faker.first_name(),
-            "date_birth": self.faker.date_of_birth(minimum_age=0, maximum_age=20).strftime("%Y-%m-%d"),
-            "breed_id": random.choice(breed_ids)["ID"],
-            "size_id": random.choice(size_ids)["ID"],
+            "name": self.pool.pick("first_name", self.rng) if self.pool else self.faker.first_name(),
+            "date_birth": self.pool.pick("date_birth", self.rng) if self.pool else date_of_birth(self.config.end_date, self.rng),
+            "breed_id": self.rng.choice(breed_ids)["ID"],
+            "size_id": self.rng.choice(size_ids)["ID"],
             "customer_id": customer_id["ID"]
         }
     
+    @metrics.timed("faker.generate_address")
     def generate_address(self, city_ids):
         """Gera dados falsos para um endereço."""
 
-        complements = [
-            None,
-            f"Apto {self.faker.building_number()}",
-            f"Bloco {self.faker.building_number()}",
-            f"Casa {self.faker.building_number()}",
-            f"Conjunto {self.faker.building_number()}"
-        ]
+        # Sorteia o tipo do complemento antes, para gerar só o número que será usado
+        complement_type = self.rng.choice(COMPLEMENT_TYPES)
+
+        if self.pool:
+            complement = f"{complement_type} {self.pool.pick('building_number', self.rng)}" if complement_type else None
+
+            return {
+                "postal_code": self.pool.pick("postcode", self.rng),
+                "street": self.pool.pick("street", self.rng),
+                "number": self.pool.pick("building_number", self.rng),
+                "complement": complement,
+                "neighborhood": self.pool.pick("neighborhood", self.rng),
+                "city_id": self.rng.choice(city_ids)["ID"],
+                "address_type_id": 1
+            }
+
+        complement = f"{complement_type} {self.faker.building_number()}" if complement_type else None
 
         return {
             "postal_code": self.faker.postcode()[:8],
             "street": self.faker.street_name(),
             "number": self.faker.building_number(),
-            "complement": random.choice(complements),
+            "complement": complement,
             "neighborhood": self.faker.bairro(),
-            "city_id": random.choice(city_ids)["ID"],
+            "city_id": self.rng.choice(city_ids)["ID"],
             "address_type_id": 1
         }
     
-    def generate_order(self, customer_id, address_id):
-        """Gera dados falsos para um pedido."""
-
-        start_date_str = getConfig("start_date")
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-
-        end_date_str = getConfig("end_date")
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-
-        status_order_probabilities = getConfig("status_order_probabilities")
-
-        status = random.choices(
-            list(status_order_probabilities.keys()), 
-            weights=list(status_order_probabilities.values())
-        )[0]
-
-        return {
-            "customer_id": customer_id,
-            "order_date": self.faker.date_time_between(start_date=start_date, end_date=end_date).strftime("%Y-%m-%d %H:%M:%S"),
-            "status_id": status,
-            "address_id": address_id
-        }
-    
-    def generate_order_item(self, product_id, order_id):
-        """Gera dados falsos de associação entre produto e pedido."""
-
-        quantity_order_items_probabilities = getConfig("quantity_order_items_probabilities")
-
-        quantity = random.choices(
-            list(quantity_order_items_probabilities.keys()), 
-            weights=list(quantity_order_items_probabilities.values())
-        )[0]
-
-        return {
-            "order_id": order_id,
-            "product_id": product_id,
-            "quantity": quantity
-        }
-    
-    def generate_request(self, service_id, pet_id, address_id):
-        """Gera dados falsos de solicitação."""
-
-        start_date_str = getConfig("start_date")
-        start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
-        
-        end_date_str = getConfig("end_date")
-        end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
-
-        status_request_probabilities = getConfig("status_request_probabilities")
-
-        status = random.choices(
-            list(status_request_probabilities.keys()), 
-            weights=list(status_request_probabilities.values())
-        )[0]
-
-        request_date = self.faker.date_time_between(start_date=start_date, end_date=end_date)
-        request_datetime = datetime.strptime(request_date.strftime("%Y-%m-%d"), "%Y-%m-%d")
+    def service_date(self, timestamp):
+        """Data do serviço: de 1 a 30 dias depois da solicitação (instante timestamp), entre 9h e 18h."""
 
         # Calcule o intervalo de tempo para adicionar à request_date
         min_days = 1
         max_days = 30 
-        days_to_add = random.randint(min_days, max_days)
-        service_date = request_datetime + timedelta(days=days_to_add)
+        days_to_add = self.rng.randint(min_days, max_days)
+        service_day = self.timeline.day(timestamp // SECONDS_PER_DAY + days_to_add)
 
         # Gerar uma hora aleatória entre 9h e 18h
-        service_hour = random.randint(9, 18)
-        service_minute = random.randint(0, 59)
-        service_second = random.randint(0, 59)
-
-        # Ajustar a hora da service_date para o intervalo entre 9h e 18h
-        service_date = service_date.replace(hour=service_hour, minute=service_minute, second=service_second)
+        service_hour = self.rng.randint(9, 18)
+        service_minute = self.rng.randint(0, 59)
+        service_second = self.rng.randint(0, 59)
 
-        return {
-            "service_id": service_id,
-            "pet_id": pet_id,
-            "request_date": request_date.strftime("%Y-%m-%d %H:%M:%S"),
-            "status_id": status,
-            "service_date": service_date.strftime("%Y-%m-%d %H:%M:%S"),
-            "address_id": address_id
-        }
\ No newline at end of file
+        return f"{service_day} {service_hour:02d}:{service_minute:02d}:{service_second:02d}"
\ No newline at end of file
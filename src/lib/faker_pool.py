@@ -0,0 +1,83 @@
+import random
+import re
+import unicodedata
+from datetime import timedelta
+from faker import Faker
+from utils.utils import clean_phone_number
+from utils.rng import derive_seed
+from utils.metrics import metrics
+
+# Quantas tentativas por valor para completar o pool com valores distintos
+MAX_ATTEMPTS_PER_VALUE = 10
+
+# Idade máxima de um pet, em dias, na data final do config
+MAX_PET_AGE_DAYS = round(20 * 365.25)
+
+def slugify(text):
+    """Remove acentos e caracteres especiais para usar o texto em um e-mail."""
+    ascii_text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^a-z0-9]", "", ascii_text.lower())
+
+def date_of_birth(end_date, rng=None):
+    """Sorteia a data de nascimento de um pet de 0 a 20 anos em end_date (a data final do config).
+
+    A janela não depende da data de hoje, então a mesma semente gera as mesmas datas em qualquer dia."""
+    days = (rng or random).randint(0, MAX_PET_AGE_DAYS)
+    return (end_date - timedelta(days=days)).strftime("%Y-%m-%d")
+
+class FakerPool:
+    """Valores do Faker pt_BR sorteados uma única vez por campo.
+
+    As linhas passam a ser montadas combinando valores dos pools por índice, o que é bem mais
+    rápido que chamar o Faker a cada linha. O tamanho do pool troca realismo por velocidade.
+
+    Os pools usam um Faker próprio; com seed, cada campo é sorteado com uma semente derivada do
+    nome do campo, então os pools são os mesmos em todo estágio, shard e processo."""
+
+    # Campo do pool -> função que gera um valor com o Faker
+    FIELDS = {
+        "first_name": lambda faker: faker.first_name(),
+        "last_name": lambda faker: faker.last_name(),
+        "phone": lambda faker: clean_phone_number(faker.phone_number(), faker.random),
+        "email_domain": lambda faker: faker.free_email_domain(),
+        "postcode": lambda faker: faker.postcode()[:8],
+        "street": lambda faker: faker.street_name(),
+        "building_number": lambda faker: faker.building_number(),
+        "neighborhood": lambda faker: faker.bairro()
+    }
+
+    def __init__(self, size, end_date, seed=None):
+        if size <= 0:
+            raise ValueError("O tamanho do pool deve ser positivo")
+
+        self.faker = Faker("pt_BR")
+        self.fields = dict(self.FIELDS, date_birth=lambda faker: date_of_birth(end_date, faker.random))
+        self.size = size
+        self.seed = seed
+        self.pools = {}
+
+    def values(self, field):
+        """Retorna o pool do campo, sorteando até size valores distintos no primeiro acesso."""
+        pool = self.pools.get(field)
+        if pool is None:
+            with metrics.timer("faker.pool_fill"):
+                make_value = self.fields[field]
+                if self.seed is not None:
+                    self.faker.seed_instance(derive_seed(self.seed, "faker_pool", field))
+                distinct = {}
+                for _ in range(self.size * MAX_ATTEMPTS_PER_VALUE):
+                    distinct.setdefault(make_value(self.faker), None)
+                    if len(distinct) >= self.size:
+                        break
+                pool = list(distinct)
+                self.pools[field] = pool
+        return pool
+
+    def pick(self, field, rng=None):
+        """Sorteia um valor do pool do campo."""
+        pool = self.values(field)
+        return pool[int((rng or random).random() * len(pool))]
+
+    def email(self, first_name, last_name, index, rng=None):
+        """Monta um e-mail a partir do nome; o índice do cliente no final (único entre as execuções, ver DataGenerator.customer_indexes) garante que não se repita."""
+        return f"{slugify(first_name)}.{slugify(last_name)}{index}@{self.pick('email_domain', rng)}"
@@ -1,46 +1,299 @@
 from service.generator import DataGenerator
-from config.probabilities import getConfig
-import time
+from service.cache import EntityCache, WATERMARK_TABLES
+from service.database import Database
+from service.scheduler import Stage, StageScheduler
+from service.profiling import StageProfiler, PROFILERS
+from service.report import RunReport
+from service.file_database import FileSink, FORMATS, dump_seeds
+from service.manifest import RunManifest
+from service.load_indexes import LOAD_INDEX_MODES
+from service.planner import VolumePlan, PRESETS, load_throughput, physical_memory_mb
+from service.snapshot import SnapshotCache, fingerprint, fingerprint_inputs
+from config.probabilities import load_config
+from config.env import SHARD_SIZE, MEMORY_BUDGET_MB, SNAPSHOT_CACHE_MB
+from utils.rng import new_master_seed
+from utils.metrics import metrics
+from datetime import datetime
+import argparse
+
+# Manifesto de --manifest sem caminho e de --resume
+DEFAULT_MANIFEST = "run_manifest.json"
+
+# Estágios que geram atividades (pedidos, itens e solicitações) para clientes e pets já existentes
+ACTIVITY_STAGES = ["generate_and_insert_order", "generate_and_insert_order_item", "generate_and_insert_request"]
+
+def make_stage(config, cache, options, stage_name, *args, generator_class=DataGenerator):
+    """Cria a função de um estágio: cada execução usa o seu próprio gerador e a sua própria conexão.
+
+    Com um manifesto nas opções, os estágios concluídos em uma execução anterior são pulados."""
+    manifest = options.get("manifest")
+
+    def run():
+        if manifest and manifest.stage_done(stage_name):
+            return "done in a previous run"
+
+        # As métricas registradas nesta thread ficam associadas ao estágio
+        metrics.stage = stage_name
+        generator = generator_class(config, cache, **options)
+        getattr(generator, stage_name)(*args)
+        if manifest:
+            manifest.finish_stage(stage_name, generator.db.load_mode)
+        return generator.db.load_mode
+    return run
+
+# Tabelas gravadas pelo estágio único do grafo de cada cliente (--graph)
+GRAPH_OUTPUTS = ["CUSTOMER", "ADDRESS", "CUSTOMER_ADDRESS", "PET", "CUSTOMER_ORDER", "ORDER_ITEM", "REQUEST"]
+
+def build_stages(config, cache, num_customer, options, generator_class=DataGenerator, activity_only=False, graph=False):
+    """Declara os estágios do pipeline com as tabelas que cada um lê e grava.
+
+    Com activity_only, ficam só os estágios de atividades, que leem os clientes e pets existentes.
+    Com graph, um único estágio gera cada cliente com todas as suas entidades."""
+    def stage(stage_name, *args):
+        return make_stage(config, cache, options, stage_name, *args, generator_class=generator_class)
+
+    if graph:
+        return [Stage("generate_and_insert_graph", stage("generate_and_insert_graph", num_customer), outputs=GRAPH_OUTPUTS)]
+
+    stages = [
+        Stage("generate_and_insert_customers", stage("generate_and_insert_customers", num_customer),
+              outputs=["CUSTOMER"]),
+        Stage("generate_and_insert_address", stage("generate_and_insert_address", num_customer),
+              outputs=["ADDRESS"]),
+        Stage("generate_and_insert_pets", stage("generate_and_insert_pets"),
+              inputs=["CUSTOMER"], outputs=["PET"]),
+        Stage("generate_and_insert_customer_address", stage("generate_and_insert_customer_address"),
+              inputs=["CUSTOMER", "ADDRESS"], outputs=["CUSTOMER_ADDRESS"]),
+        Stage("generate_and_insert_order", stage("generate_and_insert_order"),
+              inputs=["CUSTOMER_ADDRESS"], outputs=["CUSTOMER_ORDER"]),
+        Stage("generate_and_insert_order_item", stage("generate_and_insert_order_item"),
+              inputs=["CUSTOMER_ORDER", "PET"], outputs=["ORDER_ITEM"]),
+        Stage("generate_and_insert_request", stage("generate_and_insert_request"),
+              inputs=["PET", "CUSTOMER_ADDRESS"], outputs=["REQUEST"])
+    ]
+
+    if activity_only:
+        return [stage for stage in stages if stage.name in ACTIVITY_STAGES]
+    return stages
+
+def parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d")
+
+def format_date(value):
+    return value.strftime("%Y-%m-%d") if value else None
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Popula o banco do petshop com dados falsos.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Quantidade de estágios independentes executados ao mesmo tempo (padrão: 1, sequencial)")
+    parser.add_argument("--processes", type=int, default=1,
+                        help="Quantidade de processos que geram as linhas de cada estágio (padrão: 1)")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="Semente mestre de todos os sorteios; a mesma semente gera os mesmos dados, com qualquer --workers e --processes")
+    parser.add_argument("--customers", type=int, default=None,
+                        help="Quantidade de clientes novos (padrão: number_customer do config)")
+    parser.add_argument("--preset", choices=PRESETS, default=None,
+                        help=f"Escala nomeada ({', '.join(f'{name}: {customers:,} clientes' for name, customers in PRESETS.items())}); --customers tem precedência")
+    parser.add_argument("--activity-only", action="store_true",
+                        help="Só gera pedidos, itens e solicitações novos para os clientes e pets já existentes")
+    parser.add_argument("--graph", action="store_true",
+                        help="Gera cada cliente com endereço, pets, pedidos, itens e solicitações de uma vez, em um único estágio, "
+                             "sem ler de volta as tabelas geradas")
+    parser.add_argument("--start-date", type=parse_date, default=None,
+                        help="Início (AAAA-MM-DD) da janela dos pedidos e solicitações; as quantidades são proporcionais à janela")
+    parser.add_argument("--end-date", type=parse_date, default=None,
+                        help="Fim (AAAA-MM-DD) da janela dos pedidos e solicitações")
+    parser.add_argument("--instrument", action="store_true",
+                        help="Mede buscas, inserts, commits, chamadas do Faker e sorteios de cada estágio")
+    parser.add_argument("--profile", choices=PROFILERS, default=None,
+                        help="Perfila cada estágio com cProfile ou pyinstrument (roda os estágios em sequência)")
+    parser.add_argument("--profile-dir", default="profiles",
+                        help="Diretório dos perfis de cada estágio (padrão: profiles)")
+    parser.add_argument("--report", default=None,
+                        help="Arquivo JSON com o relatório da execução (estágios, métricas, config e perfis)")
+    parser.add_argument("--export", choices=FORMATS, default=None,
+                        help="Gera os dados em arquivos (CSV gzip, Parquet ou dump SQL) em vez de inserir no banco")
+    parser.add_argument("--output-dir", default="export",
+                        help="Diretório dos arquivos gerados com --export (padrão: export)")
+    parser.add_argument("--seed-dir", default=None,
+                        help="Diretório com as tabelas de referência (TABELA.csv) usadas com --export; sem ele, usa dados sintéticos")
+    parser.add_argument("--no-compress", action="store_true",
+                        help="Não compacta com gzip os arquivos CSV e SQL do --export")
+    parser.add_argument("--dump-seeds", default=None,
+                        help="Grava as tabelas de referência do banco no diretório informado, para uso com --seed-dir, e sai")
+    parser.add_argument("--manifest", nargs="?", const=DEFAULT_MANIFEST, default=None,
+                        help=f"Grava um manifesto com os estágios e shards concluídos, para que a execução possa ser retomada com "
+                             f"--resume (sem caminho: {DEFAULT_MANIFEST}); sem ele, a execução não pode ser retomada")
+    parser.add_argument("--no-pipeline", action="store_true",
+                        help="Gera e grava cada lote em sequência, sem gerar os próximos lotes enquanto o anterior é gravado")
+    parser.add_argument("--load-indexes", choices=LOAD_INDEX_MODES, default=None,
+                        help="Índices das tabelas de fatos durante a carga: keep, disable (sem verificações) ou drop "
+                             "(remove e recria no fim); a integridade referencial é verificada no fim (padrão: LOAD_INDEXES do .env)")
+    parser.add_argument("--plan", action="store_true",
+                        help="Só imprime a estimativa de linhas, bytes, tempo e memória de cada tabela e sai")
+    parser.add_argument("--benchmark-results", default="benchmark_results.json",
+                        help="Resultado do benchmark.py usado para estimar o tempo de cada tabela (padrão: benchmark_results.json)")
+    parser.add_argument("--force", action="store_true",
+                        help="Executa mesmo se a memória estimada passar do orçamento (MEMORY_BUDGET_MB)")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Restaura os dados do cache de snapshots se já foram gerados com as mesmas opções, config e "
+                             "tabelas de referência; senão gera e grava o snapshot (precisa de --seed)")
+    parser.add_argument("--snapshot-dir", default="snapshots",
+                        help="Diretório do cache de snapshots, limitado a SNAPSHOT_CACHE_MB do .env (padrão: snapshots)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Retoma a execução interrompida do manifesto, com as mesmas opções, a partir do último shard gravado")
+    return parser.parse_args()
 
 def main():
-    num_customer = getConfig("number_customer")
-    
-    generator = DataGenerator()
-
-    start_time = time.time()
-    generator.generate_and_insert_customers(num_customer)
-    end_time = time.time()
-    print(f"generate_and_insert_customers: {end_time - start_time:.2f} seconds")
-
-    start_time = time.time()
-    generator.generate_and_insert_address(num_customer)
-    end_time = time.time()
-    print(f"generate_and_insert_address: {end_time - start_time:.2f} seconds")
-
-    start_time = time.time()
-    generator.generate_and_insert_pets()
-    end_time = time.time()
-    print(f"generate_and_insert_pets: {end_time - start_time:.2f} seconds")
-
-    start_time = time.time()
-    generator.generate_and_insert_customer_address()
-    end_time = time.time()
-    print(f"generate_and_insert_customer_address: {end_time - start_time:.2f} seconds")
-
-    start_time = time.time()
-    generator.generate_and_insert_order()
-    end_time = time.time()
-    print(f"generate_and_insert_order: {end_time - start_time:.2f} seconds")
-
-    start_time = time.time()
-    generator.generate_and_insert_order_item()
-    end_time = time.time()
-    print(f"generate_and_insert_order_item: {end_time - start_time:.2f} seconds")
-
-    start_time = time.time()
-    generator.generate_and_insert_request()
-    end_time = time.time()
-    print(f"generate_and_insert_request: {end_time - start_time:.2f} seconds")
+    args = parse_args()
+    config = load_config()
+    if args.graph and args.activity_only:
+        raise ValueError("--graph gera os clientes junto com as atividades e não pode ser usado com --activity-only")
+    if args.snapshot and (args.export or args.activity_only or args.resume):
+        raise ValueError("--snapshot não pode ser usado com --export, --activity-only ou --resume")
+    if args.snapshot and args.seed is None:
+        raise ValueError("--snapshot precisa de --seed: sem ela, cada execução gera dados diferentes")
+
+    if args.dump_seeds:
+        dump_seeds(args.dump_seeds)
+        return
+
+    # Ao retomar, as opções que definem os dados vêm do manifesto da execução interrompida
+    manifest = None
+    if args.resume:
+        args.manifest = args.manifest or DEFAULT_MANIFEST
+        manifest = RunManifest.load(args.manifest)
+        if manifest is None:
+            raise ValueError(f"Manifesto {args.manifest} não encontrado: não há execução para retomar")
+        if manifest.finished:
+            print(f"{args.manifest}: the run is already complete")
+            return
+        if manifest.options["shard_size"] != SHARD_SIZE:
+            raise ValueError(f"SHARD_SIZE mudou desde a execução interrompida ({manifest.options['shard_size']} -> {SHARD_SIZE})")
+
+        resumed = manifest.options
+        args.seed, args.customers, args.activity_only = resumed["seed"], resumed["customers"], resumed["activity_only"]
+        args.start_date = parse_date(resumed["start_date"]) if resumed["start_date"] else None
+        args.end_date = parse_date(resumed["end_date"]) if resumed["end_date"] else None
+        args.graph = resumed.get("graph", False)
+        print(f"resuming {args.manifest} (started {manifest.data['created']})")
+
+    if args.customers is None and args.preset:
+        args.customers = PRESETS[args.preset]
+    num_customer = config.number_customer if args.customers is None else args.customers
+    if args.start_date or args.end_date:
+        config = config.with_window(args.start_date or config.start_date, args.end_date or config.end_date)
+
+    # Estimativa antes de rodar; com --activity-only, as atividades são dos clientes existentes
+    planned_customers = num_customer
+    if args.activity_only and not args.export:
+        with Database() as db:
+            planned_customers = db.search(table_name="CUSTOMER", columns=["COUNT(*) AS TOTAL"])[0]["TOTAL"]
+    plan = VolumePlan(config, planned_customers, args.activity_only, *load_throughput(args.benchmark_results), graph=args.graph)
+    print(plan.summary())
+    if args.plan:
+        return
+
+    # Com --snapshot, os dados de uma execução com a mesma impressão digital são restaurados do cache em vez de gerados
+    snapshots = None
+    if args.snapshot:
+        snapshots = SnapshotCache(args.snapshot_dir, SNAPSHOT_CACHE_MB * 1024 * 1024)
+        with Database() as db:
+            snapshot_inputs = fingerprint_inputs(db, config, {
+                "seed": args.seed,
+                "customers": num_customer,
+                "graph": args.graph,
+                "start_date": format_date(args.start_date),
+                "end_date": format_date(args.end_date)
+            })
+        snapshot_key = fingerprint(snapshot_inputs)
+        if snapshots.find(snapshot_key):
+            with Database(bulk_load=True) as db:
+                snapshots.restore(db, snapshot_key)
+            return
+        print(f"snapshot {snapshot_key[:16]} not in {args.snapshot_dir}, generating")
+
+    plan.check_memory(MEMORY_BUDGET_MB or physical_memory_mb(), force=args.force)
+
+    # Sem --seed, a semente sorteada é impressa para que a execução possa ser reproduzida
+    seed = new_master_seed() if args.seed is None else args.seed
+    options = {"processes": args.processes, "seed": seed}
+    # O profiler só enxerga a thread do estágio, então a geração não pode ir para a thread do pipeline
+    if args.no_pipeline or args.profile:
+        options["prefetch"] = 0
+    if args.load_indexes:
+        options["load_indexes"] = args.load_indexes
+    print(f"processes: {args.processes}, seed: {seed}")
+
+    # Com --export, cada estágio grava em arquivos e as chaves são atribuídas no processo
+    sink = None
+    if args.export:
+        sink = FileSink(args.output_dir, args.export, args.seed_dir, compress=not args.no_compress, config=config)
+        options["database"] = sink.database
+        options["load_indexes"] = "keep"
+
+    # As leituras no banco só enxergam as linhas acima das marcas d'água, então o custo é proporcional
+    # ao que é gerado agora. Com --activity-only, clientes e pets existentes continuam visíveis.
+    # Ao retomar, valem as marcas do início da execução interrompida, então as linhas já gravadas continuam visíveis.
+    if manifest:
+        cache = EntityCache(manifest.watermarks)
+        watermarks = cache.watermarks
+    else:
+        cache = EntityCache()
+        with options.get("database", Database)() as db:
+            watermarks = cache.load_watermarks(db, ["CUSTOMER_ORDER"] if args.activity_only else WATERMARK_TABLES)
+    print(f"watermarks: {watermarks}")
+
+    # Com --manifest (e sem --export), cada shard gravado é registrado no manifesto
+    if manifest is None and not sink and args.manifest:
+        previous = RunManifest.load(args.manifest)
+        if previous and not previous.finished:
+            raise ValueError(f"O manifesto {args.manifest} é de uma execução inacabada: use --resume para continuá-la ou apague o arquivo")
+
+        manifest = RunManifest.create(args.manifest, {
+            "seed": seed,
+            "customers": num_customer,
+            "activity_only": args.activity_only,
+            "graph": args.graph,
+            "start_date": format_date(args.start_date),
+            "end_date": format_date(args.end_date),
+            "shard_size": SHARD_SIZE,
+            "config": config.path
+        }, watermarks)
+        print(f"manifest: {args.manifest} (if interrupted, continue with --resume --manifest {args.manifest})")
+    if manifest:
+        options["manifest"] = manifest
+
+    metrics.enabled = args.instrument
+    stages = build_stages(config, cache, num_customer, options, activity_only=args.activity_only, graph=args.graph)
+
+    # Só um profiler pode estar ativo por vez, então os estágios perfilados rodam em sequência
+    profiler = None
+    workers = args.workers
+    if args.profile:
+        profiler = StageProfiler(args.profile, args.profile_dir)
+        stages = [profiler.wrap(stage) for stage in stages]
+        workers = 1
+
+    scheduler = StageScheduler(stages, max_workers=workers)
+    try:
+        scheduler.run()
+    finally:
+        if sink:
+            for table_name, rows in sink.close().items():
+                print(f"{sink.path(table_name)}: {rows} rows")
+    if manifest:
+        manifest.finish()
+        print(f"manifest: {args.manifest}")
+    if snapshots:
+        with Database() as db:
+            snapshots.save(db, snapshot_key, snapshot_inputs)
+
+    report = RunReport(dict(vars(args), seed=seed, watermarks=watermarks), scheduler, config, profiler)
+    print(report.summary())
+    if args.report:
+        report.write(args.report)
+        print(f"report: {args.report}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,214 @@
+# Consultas das tabelas de referência, carregadas uma única vez por execução
+REFERENCE_QUERIES = {
+    "BREED": {
+        "table_name": "BREED",
+        "columns": ["ID", "SPECIE_ID"]
+    },
+    "SIZE": {
+        "table_name": "SIZE",
+        "columns": ["ID"]
+    },
+    "SPECIE": {
+        "table_name": "SPECIE",
+        "columns": ["ID", "NAME"]
+    },
+    "CITY": {
+        "table_name": "CITY c",
+        "columns": ["c.ID", "c.STATE_ID"],
+        "join": "JOIN STATE s ON c.STATE_ID = s.ID"
+    },
+    "STORE_STATE": {
+        "table_name": "ADDRESS a",
+        "columns": ["DISTINCT c.STATE_ID"],
+        "join": "JOIN city c ON a.CITY_ID = c.ID",
+        "where": "a.ADDRESS_TYPE_ID = 2"
+    },
+    "STORE": {
+        "table_name": "STORE s",
+        "columns": ["s.ID", "s.ADDRESS_ID", "a.CITY_ID", "c.STATE_ID"],
+        "join": "JOIN address a ON a.ID = s.ADDRESS_ID JOIN city c ON c.ID = a.CITY_ID"
+    },
+    "SERVICE": {
+        "table_name": "SERVICE s",
+        "columns": ["s.ID", "ss.STORE_ID", "a.CITY_ID", "st.ADDRESS_ID"],
+        "join": "JOIN STORE_SERVICE ss ON ss.SERVICE_ID = s.ID JOIN STORE st ON st.ID = ss.STORE_ID JOIN ADDRESS a ON a.ID = st.ADDRESS_ID"
+    },
+    "PRODUCT": {
+        "table_name": "PRODUCT p",
+        "columns": ["p.ID", "p.NAME", "p.DESCRIPTION", "p.SKU", "p.STORE_ID"]
+    }
+}
+
+# Tabelas cujas leituras no banco são limitadas pela marca d'água (ID > marca)
+WATERMARK_TABLES = ["CUSTOMER", "ADDRESS", "PET", "CUSTOMER_ORDER"]
+
+class EntityCache:
+    """Cache da execução: tabelas de referência e chaves geradas por cada estágio.
+
+    Os estágios seguintes leem daqui em vez de refazer as buscas com joins no banco. Quando uma
+    entidade não foi gerada nesta execução (estágio rodado isoladamente, ou carga via LOAD DATA,
+    que não devolve os IDs), a leitura cai para a busca no banco, limitada às linhas acima da
+    marca d'água da tabela: o maior ID existente antes da execução. Sem marcas, lê a tabela toda."""
+
+    def __init__(self, watermarks=None):
+        self.references = {}
+        self.generated = {}
+        self.customer_addresses = None
+        self.watermarks = dict(watermarks or {})
+
+    def load_watermarks(self, db, tables=WATERMARK_TABLES):
+        """Guarda o maior ID atual de cada tabela: as próximas leituras só enxergam as linhas novas."""
+        for table_name in tables:
+            self.watermarks[table_name] = db.search(table_name=table_name, columns=["COALESCE(MAX(ID), 0) AS ID"])[0]["ID"]
+        return self.watermarks
+
+    def watermark(self, table_name):
+        """Filtro com a marca d'água da tabela (ID acima do qual as linhas são desta execução)."""
+        return int(self.watermarks.get(table_name, 0))
+
+    def reference(self, db, name):
+        """Retorna as linhas de uma tabela de referência, buscando no banco apenas na primeira vez (ordenadas, para sorteios reprodutíveis)."""
+        if name not in self.references:
+            self.references[name] = db.search(**REFERENCE_QUERIES[name], order_by="1")
+        return self.references[name]
+
+    def recorder(self, name, columns, fields):
+        """Retorna a função (on_insert) que guarda o ID gerado e as colunas fields das linhas inseridas em name."""
+        rows_cache = []
+        self.generated[name] = rows_cache
+
+        def record(rows, ids):
+            if ids is None:
+                # IDs desconhecidos: a entidade passa a ser lida do banco
+                self.generated.pop(name, None)
+                rows_cache.clear()
+                return
+
+            # rows é um ColumnBuffer: os campos são lidos das colunas, sem montar as linhas
+            for generated_id, *values in zip(ids, *(rows.column(field) for field in fields)):
+                entry = {"ID": generated_id}
+                entry.update(zip(fields, values))
+                rows_cache.append(entry)
+
+        return record
+
+    def forget(self, name):
+        """Descarta as linhas guardadas de name: as leituras seguintes vão ao banco (ex.: estágio retomado no meio)."""
+        self.generated.pop(name, None)
+
+    def city_state(self, db):
+        """Mapa CITY_ID -> STATE_ID."""
+        return {city["ID"]: city["STATE_ID"] for city in self.reference(db, "CITY")}
+
+    def customers(self, db):
+        """IDs dos clientes."""
+        if "CUSTOMER" in self.generated:
+            return self.generated["CUSTOMER"]
+        return db.search(table_name="CUSTOMER", columns=["ID"], where=f"ID > {self.watermark('CUSTOMER')}", order_by="ID")
+
+    def customer_address_ids(self, db):
+        """IDs dos endereços de clientes."""
+        if "ADDRESS" in self.generated:
+            return self.generated["ADDRESS"]
+        return db.search(table_name="ADDRESS", columns=["ID"], where=f"ADDRESS_TYPE_ID = %s AND ID > {self.watermark('ADDRESS')}",
+                         where_params=("1",), order_by="ID")
+
+    def customer_address(self, db):
+        """Associações entre cliente e endereço."""
+        if self.customer_addresses is not None:
+            return self.customer_addresses
+        return db.search(
+            table_name="CUSTOMER_ADDRESS ca",
+            columns=["ca.CUSTOMER_ID", "ca.ADDRESS_ID"],
+            join="JOIN ADDRESS a ON ca.ADDRESS_ID = a.ID JOIN CITY c ON a.CITY_ID = c.ID",
+            where=f"ca.CUSTOMER_ID > {self.watermark('CUSTOMER')}",
+            order_by="ca.CUSTOMER_ID, ca.ADDRESS_ID"
+        )
+
+    def set_customer_address(self, customer_addresses):
+        """Guarda as associações entre cliente e endereço inseridas nesta execução."""
+        self.customer_addresses = [
+            {"CUSTOMER_ID": customer_id, "ADDRESS_ID": address_id}
+            for customer_id, address_id in customer_addresses
+        ]
+
+    def species_per_customer(self, db):
+        """Nomes das espécies dos pets de cada cliente (no banco, só dos clientes com pedidos novos, lidos em stream)."""
+        if "PET" not in self.generated:
+            return db.search(
+                table_name="PET p",
+                columns=["p.CUSTOMER_ID", "s.NAME"],
+                join="JOIN BREED b ON b.ID = p.BREED_ID JOIN SPECIE s ON s.ID = b.SPECIE_ID",
+                where=f"p.CUSTOMER_ID IN (SELECT CUSTOMER_ID FROM CUSTOMER_ORDER WHERE ID > {self.watermark('CUSTOMER_ORDER')})",
+                order_by="p.ID",
+                stream=True
+            )
+
+        specie_per_breed = {breed["ID"]: breed["SPECIE_ID"] for breed in self.reference(db, "BREED")}
+        specie_names = {specie["ID"]: specie["NAME"] for specie in self.reference(db, "SPECIE")}
+
+        return [
+            {"CUSTOMER_ID": pet["CUSTOMER_ID"], "NAME": specie_names[specie_per_breed[pet["BREED_ID"]]]}
+            for pet in self.generated["PET"]
+        ]
+
+    def pets_for_request(self, db, excluded_specie_id):
+        """Pets com espécie, endereço e cidade do dono, exceto a espécie excluded_specie_id."""
+        if "PET" not in self.generated or "ADDRESS" not in self.generated or self.customer_addresses is None:
+            return db.search(
+                table_name="PET p",
+                columns=["p.ID", "b.SPECIE_ID", "ca.ADDRESS_ID", "a.CITY_ID"],
+                join="JOIN CUSTOMER_ADDRESS ca ON ca.CUSTOMER_ID = p.CUSTOMER_ID JOIN ADDRESS a ON a.ID = ca.ADDRESS_ID JOIN BREED b ON b.ID = p.BREED_ID",
+                where=f"b.SPECIE_ID != %s AND p.ID > {self.watermark('PET')}",
+                where_params=(excluded_specie_id,),
+                order_by="p.ID, ca.ADDRESS_ID"
+            )
+
+        specie_per_breed = {breed["ID"]: breed["SPECIE_ID"] for breed in self.reference(db, "BREED")}
+        city_per_address = {address["ID"]: address["CITY_ID"] for address in self.generated["ADDRESS"]}
+        addresses_per_customer = {}
+        for customer_address in self.customer_addresses:
+            addresses_per_customer.setdefault(customer_address["CUSTOMER_ID"], []).append(customer_address["ADDRESS_ID"])
+
+        pets = []
+        for pet in self.generated["PET"]:
+            specie_id = specie_per_breed[pet["BREED_ID"]]
+            if specie_id == excluded_specie_id:
+                continue
+
+            for address_id in addresses_per_customer.get(pet["CUSTOMER_ID"], []):
+                pets.append({
+                    "ID": pet["ID"],
+                    "SPECIE_ID": specie_id,
+                    "ADDRESS_ID": address_id,
+                    "CITY_ID": city_per_address[address_id]
+                })
+
+        return pets
+
+    def orders(self, db):
+        """Pedidos com data (texto, se gerados nesta execução, ou datetime, se lidos do banco), cliente, cidade e estado do endereço de entrega."""
+        if "CUSTOMER_ORDER" not in self.generated or "ADDRESS" not in self.generated or self.customer_addresses is None:
+            return db.search(
+                table_name="CUSTOMER_ORDER co",
+                columns=["co.ID", "co.ORDER_DATE", "co.CUSTOMER_ID", "a.CITY_ID", "ct.STATE_ID"],
+                join="JOIN address a ON a.ID = co.ADDRESS_ID JOIN city ct ON ct.ID = a.CITY_ID",
+                where=f"co.ID > {self.watermark('CUSTOMER_ORDER')}",
+                order_by="co.ID"
+            )
+
+        city_state = self.city_state(db)
+        city_per_address = {address["ID"]: address["CITY_ID"] for address in self.generated["ADDRESS"]}
+
+        orders = []
+        for order in self.generated["CUSTOMER_ORDER"]:
+            city_id = city_per_address[order["ADDRESS_ID"]]
+            orders.append({
+                "ID": order["ID"],
+                "ORDER_DATE": order["ORDER_DATE"],
+                "CUSTOMER_ID": order["CUSTOMER_ID"],
+                "CITY_ID": city_id,
+                "STATE_ID": city_state[city_id]
+            })
+
+        return orders
@@ -1,66 +1,605 @@
+import itertools
+import os
+import tempfile
+import threading
+import time
 import mysql.connector
-from config.env import DB_HOST, DB_NAME, DB_PASSWORD, DB_USER
+from mysql.connector import errorcode
+from mysql.connector.pooling import MySQLConnectionPool, CNX_POOL_MAXSIZE
+from mysql.connector.errors import PoolError
+from config.env import (
+    DB_HOST, DB_PORT, DB_NAME, DB_PASSWORD, DB_USER, DB_POOL, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_AUTOCOMMIT,
+    DB_DISABLE_CHECKS, DB_PREPARED_STATEMENTS, INSERT_BATCH_SIZE, BULK_LOAD, BULK_LOAD_BATCH_SIZE, MULTI_ROW_INSERT_SIZE,
+    SEARCH_IN_LIST_SIZE, SEARCH_FETCH_SIZE, WRITE_PREFETCH
+)
+from array import array
+from utils.utils import chunked
+from utils.row_buffer import buffer_chunks
+from utils.pipeline import Prefetcher
+from utils.metrics import metrics
+
+# Erros devolvidos quando o servidor ou o cliente não permitem LOAD DATA LOCAL INFILE
+LOCAL_INFILE_ERRORS = {
+    errorcode.ER_NOT_ALLOWED_COMMAND,
+    errorcode.ER_CLIENT_LOCAL_FILES_DISABLED,
+    errorcode.CR_LOAD_DATA_LOCAL_INFILE_REJECTED
+}
+
+# Um pool por conjunto de opções de conexão, compartilhado por todas as instâncias de Database
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Textos dos comandos já montados, por (tipo, tabela, colunas, linhas)
+_statements = {}
+
+# Formatos das linhas devolvidas por search()
+ROW_FORMATS = ("dict", "tuple", "columns")
+
+# Quando um bloco de IDs reservado acaba, a extensão cabe esta quantidade de pedidos do tamanho do atual
+ID_BLOCK_GROWTH = 16
+
+# Numeração das tabelas temporárias das listas IN grandes
+_temporary_tables = itertools.count()
+
+def connection_settings():
+    """Opções de conexão lidas do .env."""
+    settings = {
+        "host": DB_HOST,
+        "user": DB_USER,
+        "password": DB_PASSWORD,
+        "database": DB_NAME
+    }
+    if DB_PORT:
+        settings["port"] = DB_PORT
+    return settings
+
+def get_pool(options):
+    """Retorna o pool de conexões para as opções informadas, criando-o na primeira chamada."""
+    key = tuple(sorted(options.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = MySQLConnectionPool(
+                pool_name=f"petshop_{len(_pools)}",
+                pool_size=min(DB_POOL_SIZE, CNX_POOL_MAXSIZE),
+                pool_reset_session=True,
+                **options
+            )
+        return _pools[key]
+
+def get_pooled_connection(options, timeout=None):
+    """Pega uma conexão do pool, aguardando até timeout segundos se todas estiverem em uso."""
+    pool = get_pool(options)
+    deadline = time.monotonic() + (DB_POOL_TIMEOUT if timeout is None else timeout)
+    while True:
+        try:
+            return pool.get_connection()
+        except PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
+
+def insert_statement(table_name, columns, rows=1):
+    """Monta (uma única vez) o INSERT com rows grupos de placeholders."""
+    key = ("insert", table_name, tuple(columns), rows)
+    statement = _statements.get(key)
+    if statement is None:
+        row_placeholders = f"({', '.join(['%s'] * len(columns))})"
+        statement = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES {', '.join([row_placeholders] * rows)}"
+        _statements[key] = statement
+    return statement
+
+def format_load_value(value):
+    """Formata um valor no formato padrão do LOAD DATA (tab como separador, \\N para nulo)."""
+    if value is None:
+        return "\\N"
+
+    text = value if isinstance(value, str) else str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
 
 class Database:
-    def __init__(self):
+    def __init__(self, batch_size=None, bulk_load=None, settings=None, pooled=None, autocommit=None,
+                 disable_checks=None, session=None, prepared=None, prefetch=None):
         self.conn = None
+        self.batch_size = batch_size or INSERT_BATCH_SIZE
+        self.bulk_load = BULK_LOAD if bulk_load is None else bulk_load
+        self.settings = settings or connection_settings()
+        self.pooled = DB_POOL if pooled is None else pooled
+        self.autocommit = DB_AUTOCOMMIT if autocommit is None else autocommit
+        self.prepared = DB_PREPARED_STATEMENTS if prepared is None else prepared
+        # Lotes gerados em outra thread enquanto o anterior é gravado (0: gera e grava em sequência)
+        self.prefetch = WRITE_PREFETCH if prefetch is None else prefetch
+        # Tempo que a gravação ficou esperando os lotes gerados
+        self.wait_seconds = 0.0
+
+        # Variáveis de sessão aplicadas a cada conexão aberta
+        self.session = dict(session or {})
+        if DB_DISABLE_CHECKS if disable_checks is None else disable_checks:
+            self.session.setdefault("unique_checks", 0)
+            self.session.setdefault("foreign_key_checks", 0)
+        # Fica False quando o servidor recusa LOAD DATA LOCAL INFILE
+        self.local_infile = True
+        self.load_mode = None
+        self.auto_increment_step = None
+        # Bloco de IDs reservado por tabela: [próximo ID a entregar, fim do bloco] (reserve_ids)
+        self.id_blocks = {}
+
+    def __enter__(self):
+        self.open_conn()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_conn()
 
     def open_conn(self):
-        """Abre a conexão com o banco de dados."""
+        """Abre a conexão com o banco de dados (do pool, quando habilitado) e aplica as configurações de sessão."""
         if self.conn is None:
-            self.conn = mysql.connector.connect(
-                host=DB_HOST,
-                user=DB_USER,
-                password=DB_PASSWORD,
-                database=DB_NAME
-            )
+            options = dict(self.settings)
+            if self.bulk_load:
+                # Libera LOAD DATA LOCAL apenas para os arquivos do diretório temporário
+                options["allow_local_infile_in_path"] = tempfile.gettempdir()
+
+            if self.pooled:
+                self.conn = get_pooled_connection(options)
+            else:
+                self.conn = mysql.connector.connect(**options)
+
+            self.conn.autocommit = self.autocommit
+            self.apply_session()
         else:
             print("Conexão já está aberta.")
 
-    def insert(self, table_name, columns, data):
-        """Insere dados na tabela especificada."""
+    def apply_session(self):
+        """Aplica as variáveis de sessão (ex.: unique_checks e foreign_key_checks desligados durante a carga)."""
+        if not self.session:
+            return
+
+        assignments = ", ".join(f"{name} = %s" for name in self.session)
+        cursor = self.conn.cursor()
+        cursor.execute(f"SET SESSION {assignments}", tuple(self.session.values()))
+        cursor.close()
+
+    def set_session(self, **variables):
+        """Muda variáveis de sessão da conexão aberta (e das próximas conexões deste Database)."""
+        self.session.update(variables)
+        if self.conn is not None:
+            self.apply_session()
+
+    def get_session(self, *names):
+        """Valores atuais das variáveis de sessão da conexão aberta."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"SELECT {', '.join(f'@@SESSION.{name}' for name in names)}")
+            values = cursor.fetchall()[0]
+        finally:
+            cursor.close()
+        return {name: int(value) for name, value in zip(names, values)}
+
+    def insert(self, table_name, columns, data, batch_size=None, on_insert=None):
+        """Insere dados na tabela especificada, consumindo qualquer iterável em lotes e confirmando cada lote.
+
+        data pode ter linhas (dicionários ou tuplas) ou ColumnBuffers com as colunas geradas.
+        Retorna a quantidade de linhas inseridas. Em caso de erro apenas o lote corrente é desfeito.
+        Se on_insert for informado, é chamado com (linhas, ids) a cada comando, com as linhas em um
+        ColumnBuffer e os IDs gerados pelo auto incremento."""
         if self.conn is None:
             raise Exception("Conexão não está aberta. Use open_conn() para abrir a conexão.")
-        
-        placeholders = ", ".join(["%s"] * len(columns))
-        columns_str = ", ".join(columns)
-        query = f"INSERT INTO {table_name} ({columns_str}) VALUES ({placeholders})"
-
-        if isinstance(data[0], dict):
-            data = [tuple(item[col.lower()] for col in columns) for item in data]
-        
+
+        query = insert_statement(table_name, columns)
+
+        total = 0
         cursor = self.conn.cursor()
-        cursor.executemany(query, data)
-        self.conn.commit()
-        cursor.close()
+        batches = self.batches(data, columns, batch_size or self.batch_size)
+        try:
+            for chunk in batches:
+                if on_insert:
+                    self.multi_row_insert(table_name, columns, chunk, on_insert)
+                else:
+                    with metrics.timer("db.insert"):
+                        cursor.executemany(query, list(chunk.rows()))
+                self.commit()
+                metrics.increment("db.rows_inserted", len(chunk))
+                total += len(chunk)
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.close_batches(batches)
+            cursor.close()
+
+        self.load_mode = "multi-row insert" if on_insert else "executemany"
+        return total
+
+    def load(self, table_name, columns, data, on_insert=None):
+        """Insere dados pelo caminho mais rápido disponível: LOAD DATA quando o modo bulk está ativo, senão insert()."""
+        if self.bulk_load:
+            return self.bulk_insert(table_name, columns, data, on_insert=on_insert)
+        return self.insert(table_name, columns, data, on_insert=on_insert)
+
+    def bulk_insert(self, table_name, columns, data, batch_size=None, on_insert=None):
+        """Carrega dados com LOAD DATA LOCAL INFILE, gravando cada lote em um arquivo temporário.
+
+        Se o servidor não permitir arquivos locais, passa a usar INSERTs com várias linhas por comando.
+        O LOAD DATA não informa os IDs gerados, então on_insert recebe ids=None nesse caso."""
+        if self.conn is None:
+            raise Exception("Conexão não está aberta. Use open_conn() para abrir a conexão.")
+
+        total = 0
+        cursor = self.conn.cursor()
+        batches = self.batches(data, columns, batch_size or BULK_LOAD_BATCH_SIZE)
+        try:
+            for chunk in batches:
+                if self.local_infile:
+                    try:
+                        self.load_data_infile(cursor, table_name, columns, chunk)
+                        if on_insert:
+                            on_insert(chunk, None)
+                    except mysql.connector.Error as err:
+                        if err.errno not in LOCAL_INFILE_ERRORS:
+                            raise
+                        print(f"LOAD DATA LOCAL INFILE não permitido ({err.errno}), usando INSERT com várias linhas.")
+                        self.local_infile = False
+
+                if not self.local_infile:
+                    self.multi_row_insert(table_name, columns, chunk, on_insert)
+
+                self.commit()
+                metrics.increment("db.rows_inserted", len(chunk))
+                total += len(chunk)
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            self.close_batches(batches)
+            cursor.close()
+
+        self.load_mode = "load data" if self.local_infile else "multi-row insert"
+        return total
+
+    def batches(self, data, columns, size):
+        """Lotes (ColumnBuffers) a gravar; com prefetch, gerados em outra thread enquanto os anteriores são gravados."""
+        return Prefetcher(buffer_chunks(data, columns, size), self.prefetch)
+
+    def close_batches(self, batches):
+        """Para a geração dos lotes (se a gravação parou antes do fim) e soma o tempo de espera."""
+        batches.close()
+        self.wait_seconds += batches.wait_seconds
+        if metrics.enabled:
+            metrics.add_time("db.wait_rows", batches.wait_seconds)
+
+    def commit(self):
+        """Confirma a transação corrente."""
+        with metrics.timer("db.commit"):
+            self.conn.commit()
+
+    @metrics.timed("db.load_data")
+    def load_data_infile(self, cursor, table_name, columns, rows):
+        """Grava as linhas (um ColumnBuffer) em um arquivo temporário e o carrega com LOAD DATA LOCAL INFILE.
+
+        Os valores são formatados coluna a coluna; colunas inteiras (array) só precisam de str()."""
+        formatted = [
+            list(map(str, values)) if isinstance(values, array) else [format_load_value(value) for value in values]
+            for values in rows.data
+        ]
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".tsv", delete=False) as f:
+            f.writelines(f"{line}\n" for line in map("\t".join, zip(*formatted)))
+            path = f.name
 
-    def search(self, table_name, columns="*", where=None, where_params=None, join=None):
-        """Faz buscas no banco de dados e retorna os resultados."""
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE '{path.replace(os.sep, '/')}' INTO TABLE {table_name} "
+                f"CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(columns)})"
+            )
+        finally:
+            os.remove(path)
+
+    def multi_row_insert(self, table_name, columns, rows, on_insert=None):
+        """Insere as linhas (um ColumnBuffer) com comandos INSERT ... VALUES (...), (...) de até MULTI_ROW_INSERT_SIZE linhas.
+
+        Um INSERT simples com várias linhas recebe IDs consecutivos a partir de lastrowid, que são repassados a on_insert.
+        Com prepared statements, cada formato de comando é preparado uma vez e reaproveitado entre os grupos."""
+        step = self.get_auto_increment_step() if on_insert else 1
+
+        cursor = self.conn.cursor(prepared=True) if self.prepared else self.conn.cursor()
+        try:
+            for start in range(0, len(rows), MULTI_ROW_INSERT_SIZE):
+                group = rows.slice(start, start + MULTI_ROW_INSERT_SIZE)
+                with metrics.timer("db.insert"):
+                    cursor.execute(insert_statement(table_name, columns, len(group)), list(group.values()))
+
+                if on_insert:
+                    first_id = cursor.lastrowid
+                    on_insert(group, range(first_id, first_id + len(group) * step, step))
+        finally:
+            cursor.close()
+
+    def get_auto_increment_step(self):
+        """Retorna o incremento do auto incremento da sessão (auto_increment_increment)."""
+        if self.auto_increment_step is None:
+            cursor = self.conn.cursor()
+            cursor.execute("SELECT @@SESSION.auto_increment_increment")
+            self.auto_increment_step = int(cursor.fetchall()[0][0])
+            cursor.close()
+        return self.auto_increment_step
+
+    def reserve_id_blocks(self, counts):
+        """Reserva de uma vez um bloco de IDs por tabela (counts: tabela -> quantidade), de onde reserve_ids entrega os IDs.
+
+        Mover o auto incremento é DDL no InnoDB (commit implícito e trava de metadados), então é feito
+        uma vez por tabela e não a cada shard."""
+        for table_name, count in counts.items():
+            self.extend_id_block(table_name, count)
+
+    def reserve_ids(self, table_name, count):
+        """Entrega count IDs consecutivos da tabela, para linhas inseridas com o ID informado, e retorna o primeiro.
+
+        Os IDs saem do bloco reservado da tabela; se não couberem, o bloco é estendido (ou um novo é
+        reservado) com espaço para ID_BLOCK_GROWTH vezes count."""
+        block = self.id_blocks.get(table_name)
+        if block is None or block[0] + count > block[1]:
+            block = self.extend_id_block(table_name, count * ID_BLOCK_GROWTH)
+        first_id = block[0]
+        block[0] += count
+        return first_id
+
+    def extend_id_block(self, table_name, count):
+        """Reserva count IDs depois do maior ID da tabela (e do bloco atual) e passa o auto incremento para depois
+        deles, então inserts de outras conexões não os usam. Sem inserts de outras conexões no meio, o bloco
+        atual só é estendido, e os IDs entregues continuam consecutivos."""
+        current = self.search(table_name=table_name, columns=["COALESCE(MAX(ID), 0) AS ID"])[0]["ID"]
+        block = self.id_blocks.get(table_name)
+        first_id = max(int(current) + 1, block[1] if block else 1)
+        if block and first_id == block[1]:
+            block[1] += count
+        else:
+            block = self.id_blocks[table_name] = [first_id, first_id + count]
+        self.move_auto_increment(table_name, block[1])
+        return block
+
+    def release_ids(self):
+        """Devolve os IDs reservados e não entregues: o auto incremento volta para o primeiro deles.
+
+        O InnoDB não deixa o auto incremento abaixo do maior ID da tabela, então os IDs usados
+        por outras conexões depois do bloco continuam protegidos."""
+        for table_name, (next_id, end) in self.id_blocks.items():
+            if next_id < end:
+                self.move_auto_increment(table_name, next_id)
+        self.id_blocks = {}
+
+    def move_auto_increment(self, table_name, next_id):
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"ALTER TABLE {table_name} AUTO_INCREMENT = {int(next_id)}")
+        finally:
+            cursor.close()
+
+    def search(self, table_name, columns="*", where=None, where_params=None, join=None, order_by=None,
+               row_format="dict", stream=False):
+        """Faz buscas no banco de dados e retorna os resultados.
+
+        Se where tem um único %s e where_params é uma lista, o %s vira a lista de um IN (ex.: "ID IN (%s)"):
+        os valores repetidos são descartados e, acima de SEARCH_IN_LIST_SIZE valores, a busca é feita
+        em partes (sem order_by) ou com os valores em uma tabela temporária (com order_by).
+
+        row_format: "dict" (padrão), "tuple" ou "columns" (dicionário coluna -> lista de valores).
+        Com stream, retorna um iterador que lê SEARCH_FETCH_SIZE linhas por vez (em "columns", um
+        dicionário por bloco), sem guardar o resultado inteiro; a conexão fica ocupada até o fim da leitura."""
         if self.conn is None:
             raise Exception("Conexão não está aberta. Use open_conn() para abrir a conexão.")
-        
-        query = f"SELECT {', '.join(columns) if isinstance(columns, list) else columns} FROM {table_name}"
-        
+        if row_format not in ROW_FORMATS:
+            raise ValueError(f"Formato inválido: {row_format!r}. Use um de {', '.join(ROW_FORMATS)}")
+
+        batches = self.search_batches(table_name, columns, where, where_params, join, order_by, row_format, stream)
+        if stream:
+            return batches if row_format == "columns" else (row for batch in batches for row in batch)
+
+        if row_format == "columns":
+            result = {}
+            for batch in batches:
+                for column, values in batch.items():
+                    result.setdefault(column, []).extend(values)
+            return result
+        return [row for batch in batches for row in batch]
+
+    def search_batches(self, table_name, columns, where, where_params, join, order_by, row_format, stream):
+        """Executa a busca (uma consulta por parte da lista IN) e produz os resultados em blocos no formato row_format."""
+        select = f"SELECT {', '.join(columns) if isinstance(columns, list) else columns} FROM {table_name}"
         if join:
-            query += f" {join}"
-        
-        if where:
-            if isinstance(where_params, (list, tuple)):
-                placeholders = ', '.join(['%s'] * len(where_params))
-                where = where.replace('%s', placeholders)
-            
-            query += f" WHERE {where}"
-
-        cursor = self.conn.cursor(dictionary=True)
-        cursor.execute(query, where_params or ())
-        result = cursor.fetchall()
+            select += f" {join}"
+
+        conditions = [(where, where_params or ())]
+        temporary_table = None
+        if where and isinstance(where_params, (list, tuple)) and where.count("%s") == 1:
+            values = list(dict.fromkeys(where_params))
+            if not values:
+                conditions = [("1 = 0", ())]
+            elif len(values) <= SEARCH_IN_LIST_SIZE:
+                conditions = [(where.replace("%s", ", ".join(["%s"] * len(values))), values)]
+            elif order_by is None:
+                conditions = [
+                    (where.replace("%s", ", ".join(["%s"] * len(chunk))), chunk)
+                    for chunk in chunked(values, SEARCH_IN_LIST_SIZE)
+                ]
+            else:
+                temporary_table = self.stage_values(values)
+                conditions = [(where.replace("%s", f"SELECT ITEM_VALUE FROM {temporary_table}"), ())]
+
+        cursor = self.conn.cursor(dictionary=True) if row_format == "dict" else self.conn.cursor()
+        # Fica True enquanto há linhas da consulta corrente ainda não lidas
+        pending = False
+        try:
+            for condition, params in conditions:
+                query = select
+                if condition:
+                    query += f" WHERE {condition}"
+                if order_by:
+                    query += f" ORDER BY {order_by}"
+
+                with metrics.timer("db.search"):
+                    cursor.execute(query, params)
+                    pending = stream
+                    rows = cursor.fetchmany(SEARCH_FETCH_SIZE) if stream else cursor.fetchall()
+                names = [description[0] for description in cursor.description] if row_format == "columns" else None
+
+                while True:
+                    metrics.increment("db.rows_searched", len(rows))
+                    if row_format == "columns":
+                        yield {name: list(values) for name, values in zip(names, zip(*rows) if rows else [[]] * len(names))}
+                    else:
+                        yield rows
+
+                    if not stream or len(rows) < SEARCH_FETCH_SIZE:
+                        pending = False
+                        break
+                    with metrics.timer("db.fetch"):
+                        rows = cursor.fetchmany(SEARCH_FETCH_SIZE)
+        finally:
+            # Uma leitura interrompida precisa consumir o resto do resultado antes de liberar a conexão,
+            # sem esconder o erro que a interrompeu
+            if pending:
+                try:
+                    cursor.fetchall()
+                except Exception:
+                    pass
+            cursor.close()
+            if temporary_table:
+                self.drop_temporary_table(temporary_table)
+
+    def stage_values(self, values):
+        """Grava os valores de uma lista IN grande em uma tabela temporária da conexão e retorna o nome dela."""
+        name = f"search_values_{next(_temporary_tables)}"
+        value_type = "BIGINT" if all(isinstance(value, int) for value in values) else "VARCHAR(255)"
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"CREATE TEMPORARY TABLE {name} (ITEM_VALUE {value_type} PRIMARY KEY)")
+            for chunk in chunked(values, MULTI_ROW_INSERT_SIZE):
+                cursor.executemany(f"INSERT INTO {name} (ITEM_VALUE) VALUES (%s)", [(value,) for value in chunk])
+        finally:
+            cursor.close()
+        return name
+
+    def drop_temporary_table(self, name):
+        cursor = self.conn.cursor()
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {name}")
         cursor.close()
-        return result
+
+    def delete(self, table_name, where, where_params=None):
+        """Apaga as linhas da tabela que atendem a where, confirma e retorna a quantidade apagada."""
+        if self.conn is None:
+            raise Exception("Conexão não está aberta. Use open_conn() para abrir a conexão.")
+
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(f"DELETE FROM {table_name} WHERE {where}", where_params or ())
+            deleted = cursor.rowcount
+            self.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        return deleted
+
+    def secondary_indexes(self, table_name):
+        """Índices da tabela, exceto a chave primária: nome, colunas (com o prefixo, se houver), único e tipo."""
+        rows = self.search(
+            table_name="information_schema.STATISTICS",
+            columns=["INDEX_NAME", "COLUMN_NAME", "SUB_PART", "NON_UNIQUE", "INDEX_TYPE"],
+            where="TABLE_SCHEMA = DATABASE() AND UPPER(TABLE_NAME) = %s AND INDEX_NAME != 'PRIMARY'",
+            where_params=(table_name.upper(),),
+            order_by="INDEX_NAME, SEQ_IN_INDEX"
+        )
+
+        indexes = {}
+        for row in rows:
+            index = indexes.setdefault(row["INDEX_NAME"], {
+                "name": row["INDEX_NAME"],
+                "columns": [],
+                "unique": not int(row["NON_UNIQUE"]),
+                "type": row["INDEX_TYPE"]
+            })
+            index["columns"].append(f"{row['COLUMN_NAME']}({row['SUB_PART']})" if row["SUB_PART"] else row["COLUMN_NAME"])
+        return list(indexes.values())
+
+    def foreign_keys(self, table_name):
+        """Chaves estrangeiras da tabela: nome, colunas, tabela e colunas referenciadas e regras de ON DELETE/ON UPDATE."""
+        rows = self.search(
+            table_name="information_schema.KEY_COLUMN_USAGE k",
+            columns=["k.CONSTRAINT_NAME", "k.COLUMN_NAME", "k.REFERENCED_TABLE_NAME", "k.REFERENCED_COLUMN_NAME",
+                     "r.DELETE_RULE", "r.UPDATE_RULE"],
+            join="JOIN information_schema.REFERENTIAL_CONSTRAINTS r "
+                 "ON r.CONSTRAINT_SCHEMA = k.CONSTRAINT_SCHEMA AND r.CONSTRAINT_NAME = k.CONSTRAINT_NAME",
+            where="k.TABLE_SCHEMA = DATABASE() AND UPPER(k.TABLE_NAME) = %s AND k.REFERENCED_TABLE_NAME IS NOT NULL",
+            where_params=(table_name.upper(),),
+            order_by="k.CONSTRAINT_NAME, k.ORDINAL_POSITION"
+        )
+
+        foreign_keys = {}
+        for row in rows:
+            foreign_key = foreign_keys.setdefault(row["CONSTRAINT_NAME"], {
+                "name": row["CONSTRAINT_NAME"],
+                "columns": [],
+                "referenced_table": row["REFERENCED_TABLE_NAME"],
+                "referenced_columns": [],
+                "on_delete": row["DELETE_RULE"],
+                "on_update": row["UPDATE_RULE"]
+            })
+            foreign_key["columns"].append(row["COLUMN_NAME"])
+            foreign_key["referenced_columns"].append(row["REFERENCED_COLUMN_NAME"])
+        return list(foreign_keys.values())
+
+    def drop_indexes(self, table_name, indexes, foreign_keys):
+        """Remove as chaves estrangeiras e depois os índices (um índice usado por uma chave não pode sair antes dela)."""
+        for clauses in ([f"DROP FOREIGN KEY {key['name']}" for key in foreign_keys],
+                        [f"DROP INDEX {index['name']}" for index in indexes]):
+            if clauses:
+                self.alter_table(table_name, clauses)
+
+    def add_indexes(self, table_name, indexes, foreign_keys):
+        """Recria os índices e as chaves estrangeiras em um único ALTER TABLE (uma passada pela tabela).
+
+        Com foreign_key_checks desligado na sessão, as chaves voltam sem revalidar as linhas."""
+        clauses = [
+            f"ADD {'UNIQUE ' if index['unique'] else ''}{'FULLTEXT ' if index['type'] == 'FULLTEXT' else ''}"
+            f"INDEX {index['name']} ({', '.join(index['columns'])})"
+            for index in indexes
+        ]
+        clauses += [
+            f"ADD CONSTRAINT {key['name']} FOREIGN KEY ({', '.join(key['columns'])}) "
+            f"REFERENCES {key['referenced_table']} ({', '.join(key['referenced_columns'])}) "
+            f"ON DELETE {key['on_delete']} ON UPDATE {key['on_update']}"
+            for key in foreign_keys
+        ]
+        if clauses:
+            self.alter_table(table_name, clauses)
+
+    def alter_table(self, table_name, clauses):
+        cursor = self.conn.cursor()
+        try:
+            with metrics.timer("db.alter_table"):
+                cursor.execute(f"ALTER TABLE {table_name} {', '.join(clauses)}")
+        finally:
+            cursor.close()
+
+    def count_orphans(self, table_name, foreign_key, first_id=0):
+        """Quantidade de linhas com ID acima de first_id cuja chave estrangeira não encontra a linha referenciada."""
+        join = " AND ".join(
+            f"r.{referenced} = t.{column}" for column, referenced in zip(foreign_key["columns"], foreign_key["referenced_columns"])
+        )
+        not_null = " AND ".join(f"t.{column} IS NOT NULL" for column in foreign_key["columns"])
+        return self.search(
+            table_name=f"{table_name} t",
+            columns=["COUNT(*) AS ORPHANS"],
+            join=f"LEFT JOIN {foreign_key['referenced_table']} r ON {join}",
+            where=f"t.ID > {int(first_id)} AND {not_null} AND r.{foreign_key['referenced_columns'][0]} IS NULL"
+        )[0]["ORPHANS"]
 
     def close_conn(self):
-        """Fecha a conexão com o banco de dados."""
+        """Fecha a conexão com o banco de dados (conexões do pool voltam para o pool, com a sessão reiniciada)."""
         if self.conn is not None:
             self.conn.close()
             self.conn = None
         else:
-            print("Conexão já está fechada.")
\ No newline at end of file
+            print("Conexão já está fechada.")
@@ -0,0 +1,253 @@
+import csv
+import gzip
+import os
+import re
+import threading
+from service.database import Database
+from service.sqlite_database import SQLiteDatabase, SCHEMA
+from config.env import BULK_LOAD_BATCH_SIZE, MULTI_ROW_INSERT_SIZE
+from config.probabilities import load_config
+from utils.utils import chunked
+from utils.metrics import metrics
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+FORMATS = ("csv", "parquet", "sql")
+
+# Tabelas geradas sem coluna ID (as demais recebem chaves substitutas sequenciais)
+TABLES_WITHOUT_ID = {"CUSTOMER_ADDRESS"}
+
+# Tabelas de referência lidas dos arquivos de seed, com as colunas usadas pela geração
+REFERENCE_COLUMNS = {
+    "STATE": ["ID"],
+    "CITY": ["ID", "STATE_ID"],
+    "ADDRESS": ["ID", "CITY_ID", "ADDRESS_TYPE_ID"],
+    "STORE": ["ID", "ADDRESS_ID"],
+    "SPECIE": ["ID", "NAME"],
+    "BREED": ["ID", "SPECIE_ID"],
+    "SIZE": ["ID"],
+    "SERVICE": ["ID"],
+    "STORE_SERVICE": ["STORE_ID", "SERVICE_ID"],
+    "PRODUCT": ["ID", "NAME", "DESCRIPTION", "SKU", "STORE_ID"]
+}
+# Só os endereços das lojas fazem parte da referência
+REFERENCE_WHERE = {"ADDRESS": "ADDRESS_TYPE_ID = 2"}
+
+def column_types():
+    """Tipo (INTEGER, TEXT, DATETIME) de cada coluna de cada tabela, lido do SCHEMA."""
+    types = {}
+    for table_name, body in re.findall(r"CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\);", SCHEMA, re.S):
+        types[table_name] = dict(re.findall(r"(\w+) (INTEGER|TEXT|DATETIME)", body))
+    return types
+
+def format_sql_value(value):
+    """Formata um valor como literal SQL do MySQL."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)):
+        return str(value)
+
+    text = value if isinstance(value, str) else str(value)
+    return "'" + text.replace("\\", "\\\\").replace("'", "\\'").replace("\n", "\\n") + "'"
+
+def dump_seeds(seed_dir, database=None):
+    """Grava as tabelas de referência do banco (o MySQL do .env, por padrão) como arquivos de seed."""
+    os.makedirs(seed_dir, exist_ok=True)
+    with (database or Database()) as db:
+        for table_name, columns in REFERENCE_COLUMNS.items():
+            # Lidas em stream, como tuplas, direto para o arquivo
+            rows = db.search(table_name=table_name, columns=columns, where=REFERENCE_WHERE.get(table_name), order_by="1",
+                             row_format="tuple", stream=True)
+            with open(os.path.join(seed_dir, f"{table_name}.csv"), "w", encoding="utf-8", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                total = 0
+                for chunk in chunked(rows, BULK_LOAD_BATCH_SIZE):
+                    writer.writerows(chunk)
+                    total += len(chunk)
+            print(f"{table_name}: {total} rows")
+
+class TableWriter:
+    """Grava as linhas de uma tabela em um arquivo, lote a lote."""
+
+    def __init__(self, path, table_name, columns, file_format, compress, types):
+        self.path = path
+        self.table_name = table_name
+        self.columns = columns
+        self.format = file_format
+        self.rows = 0
+
+        if file_format == "parquet":
+            fields = [(column, pa.int64() if types.get(column) == "INTEGER" else pa.string()) for column in columns]
+            self.schema = pa.schema(fields)
+            self.file = pq.ParquetWriter(path, self.schema, compression="snappy")
+            return
+
+        self.file = gzip.open(path, "wt", encoding="utf-8", newline="") if compress else open(path, "w", encoding="utf-8", newline="")
+        if file_format == "csv":
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(columns)
+
+    def write(self, rows):
+        """Grava um lote (ColumnBuffer): no Parquet, coluna a coluna; em CSV e SQL, linha a linha."""
+        if self.format == "csv":
+            self.writer.writerows(rows.rows())
+        elif self.format == "sql":
+            statement = f"INSERT INTO {self.table_name} ({', '.join(self.columns)}) VALUES\n"
+            for group in chunked(rows.rows(), MULTI_ROW_INSERT_SIZE):
+                values = ",\n".join("(" + ", ".join(format_sql_value(value) for value in row) + ")" for row in group)
+                self.file.write(f"{statement}{values};\n")
+        else:
+            arrays = [
+                pa.array([None if value is None else str(value) for value in column] if field.type == pa.string() else column, type=field.type)
+                for column, field in zip(rows.data, self.schema)
+            ]
+            self.file.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        self.rows += len(rows)
+
+    def close(self):
+        self.file.close()
+
+class FileSink:
+    """Destino em arquivos para a geração sem banco: um arquivo por tabela, em CSV (gzip), Parquet ou dump SQL.
+
+    As chaves substitutas são atribuídas aqui, em sequência por tabela, e repassadas ao cache como
+    se viessem do auto incremento. As tabelas de referência vêm dos arquivos de seed (TABELA.csv,
+    em seed_dir) ou, sem seed_dir, dos dados sintéticos do SQLiteDatabase, e ficam em um SQLite em
+    memória, onde as buscas do cache continuam funcionando."""
+
+    def __init__(self, output_dir, file_format="csv", seed_dir=None, compress=True, config=None):
+        if file_format not in FORMATS:
+            raise ValueError(f"Formato inválido: {file_format!r}. Use um de {', '.join(FORMATS)}")
+        if file_format == "parquet" and pa is None:
+            raise ValueError("pyarrow não está instalado (pip install pyarrow)")
+
+        self.output_dir = output_dir
+        self.format = file_format
+        self.compress = compress
+        self.types = column_types()
+        self.writers = {}
+        self.next_ids = {}
+        self.lock = threading.RLock()
+        os.makedirs(output_dir, exist_ok=True)
+
+        self.reference = SQLiteDatabase()
+        self.keeper = self.reference.keep_alive()
+        if seed_dir:
+            self.load_seeds(seed_dir)
+        else:
+            self.reference.create_schema(config or load_config())
+
+    def load_seeds(self, seed_dir):
+        """Carrega os arquivos de seed (CSV com cabeçalho, opcionalmente .csv.gz) no SQLite de referência."""
+        self.keeper.executescript(SCHEMA)
+        for table_name in REFERENCE_COLUMNS:
+            path = os.path.join(seed_dir, f"{table_name}.csv")
+            if not os.path.exists(path) and os.path.exists(path + ".gz"):
+                path += ".gz"
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Arquivo de seed da tabela {table_name} não encontrado em {seed_dir}")
+
+            with (gzip.open(path, "rt", encoding="utf-8", newline="") if path.endswith(".gz") else open(path, encoding="utf-8", newline="")) as f:
+                reader = csv.reader(f)
+                columns = next(reader)
+                placeholders = ", ".join("?" * len(columns))
+                self.keeper.executemany(
+                    f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({placeholders})",
+                    ([value if value != "" else None for value in row] for row in reader)
+                )
+        self.keeper.commit()
+
+    def first_id(self, table_name):
+        """Primeiro ID livre da tabela: depois dos IDs de referência (ex.: endereços das lojas)."""
+        cursor = self.keeper.execute(f"SELECT COALESCE(MAX(ID), 0) FROM {table_name}")
+        return cursor.fetchone()[0] + 1
+
+    def reserve(self, table_name, count):
+        """Reserva count IDs consecutivos da tabela e retorna o primeiro."""
+        with self.lock:
+            if table_name not in self.next_ids:
+                self.next_ids[table_name] = self.first_id(table_name)
+            first_id = self.next_ids[table_name]
+            self.next_ids[table_name] += count
+        return first_id
+
+    def write(self, table_name, columns, rows):
+        """Grava as linhas (um ColumnBuffer) e retorna os IDs atribuídos (None para tabelas sem ID ou linhas que já têm ID)."""
+        with self.lock:
+            ids = None
+            if table_name not in TABLES_WITHOUT_ID and "ID" not in rows.columns:
+                first_id = self.reserve(table_name, len(rows))
+                ids = range(first_id, first_id + len(rows))
+                rows = rows.with_column("ID", list(ids))
+                columns = rows.columns
+
+            writer = self.writers.get(table_name)
+            if writer is None:
+                writer = TableWriter(self.path(table_name), table_name, columns, self.format, self.compress, self.types.get(table_name, {}))
+                self.writers[table_name] = writer
+
+        with metrics.timer("file.write"):
+            writer.write(rows)
+        return ids
+
+    def path(self, table_name):
+        extension = {"csv": ".csv", "sql": ".sql", "parquet": ".parquet"}[self.format]
+        if self.compress and self.format != "parquet":
+            extension += ".gz"
+        return os.path.join(self.output_dir, f"{table_name}{extension}")
+
+    def database(self):
+        """Cria o Database de um estágio (use como fábrica do DataGenerator)."""
+        return FileDatabase(self)
+
+    def close(self):
+        """Fecha os arquivos e retorna a quantidade de linhas gravadas por tabela."""
+        totals = {}
+        for table_name, writer in self.writers.items():
+            writer.close()
+            totals[table_name] = writer.rows
+        self.keeper.close()
+        return totals
+
+class FileDatabase(SQLiteDatabase):
+    """Database de um estágio sobre o FileSink: buscas no SQLite de referência, inserts nos arquivos."""
+
+    def __init__(self, sink, batch_size=None):
+        super().__init__(sink.reference.path, batch_size=batch_size or BULK_LOAD_BATCH_SIZE)
+        self.sink = sink
+
+    def insert(self, table_name, columns, data, batch_size=None, on_insert=None):
+        """Grava os dados no arquivo da tabela em lotes, repassando a on_insert os IDs atribuídos."""
+        total = 0
+        batches = self.batches(data, columns, batch_size or self.batch_size)
+        try:
+            for chunk in batches:
+                ids = self.sink.write(table_name, columns, chunk)
+                if on_insert:
+                    on_insert(chunk, ids)
+                metrics.increment("db.rows_inserted", len(chunk))
+                total += len(chunk)
+        finally:
+            self.close_batches(batches)
+
+        self.load_mode = f"file {self.sink.format}"
+        return total
+
+    def load(self, table_name, columns, data, on_insert=None):
+        return self.insert(table_name, columns, data, on_insert=on_insert)
+
+    def reserve_ids(self, table_name, count):
+        """Os IDs dos arquivos são atribuídos pelo FileSink."""
+        return self.sink.reserve(table_name, count)
+
+    def reserve_id_blocks(self, counts):
+        """O FileSink reserva os IDs do shard direto nos seus contadores, sem blocos."""
+
+    def release_ids(self):
+        """Não há blocos a devolver."""
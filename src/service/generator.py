@@ -1,131 +1,286 @@
 from service.database import Database
+from service.cache import EntityCache
+from service.parallel import ShardedGenerator, split_shards, shard_seeds
+from service.load_indexes import DeferredIndexes
+from service.planner import VolumePlan
 from lib.faker import FakeDataGenerator
-from config.probabilities import getConfig
-from utils.utils import classify_product, get_products_for_customer, get_allowed_services, get_period_and_probabilities, select_product_id, get_product_type
-import random
-import re
+from config.probabilities import load_config
+from config.env import LOAD_INDEXES
+from utils.utils import scale_count
+from utils.indexes import ProductIndex, StoreIndex, ServiceIndex
+from utils.rng import stage_rng, new_master_seed
+from utils.metrics import metrics
+from utils.row_buffer import ColumnBuffer
+from utils.pipeline import Prefetcher
+from array import array
+from contextlib import ExitStack
+
+CUSTOMER_COLUMNS = ["NAME", "EMAIL", "PHONE"]
+ADDRESS_COLUMNS = ["POSTAL_CODE", "STREET", "NUMBER", "COMPLEMENT", "NEIGHBORHOOD", "CITY_ID", "ADDRESS_TYPE_ID"]
+CUSTOMER_ADDRESS_COLUMNS = ["CUSTOMER_ID", "ADDRESS_ID"]
+PET_COLUMNS = ["NAME", "DATE_BIRTH", "BREED_ID", "SIZE_ID", "CUSTOMER_ID"]
+
+# Colunas das tabelas de fatos, geradas direto em ColumnBuffers (colunas inteiras em arrays)
+ORDER_COLUMNS = ["CUSTOMER_ID", "ORDER_DATE", "STATUS_ID", "ADDRESS_ID"]
+ORDER_ITEM_COLUMNS = ["ORDER_ID", "PRODUCT_ID", "QUANTITY"]
+REQUEST_COLUMNS = ["SERVICE_ID", "PET_ID", "REQUEST_DATE", "STATUS_ID", "SERVICE_DATE", "ADDRESS_ID"]
+
+# Tabelas do grafo de cada cliente, na ordem de gravação (as referenciadas antes das que as referenciam),
+# com as colunas geradas (sem o ID) e as colunas inteiras
+GRAPH_TABLES = {
+    "CUSTOMER": (CUSTOMER_COLUMNS, ()),
+    "ADDRESS": (ADDRESS_COLUMNS, {"CITY_ID", "ADDRESS_TYPE_ID"}),
+    "CUSTOMER_ADDRESS": (CUSTOMER_ADDRESS_COLUMNS, set(CUSTOMER_ADDRESS_COLUMNS)),
+    "PET": (PET_COLUMNS, {"BREED_ID", "SIZE_ID", "CUSTOMER_ID"}),
+    "CUSTOMER_ORDER": (ORDER_COLUMNS, {"CUSTOMER_ID", "STATUS_ID", "ADDRESS_ID"}),
+    "ORDER_ITEM": (ORDER_ITEM_COLUMNS, set(ORDER_ITEM_COLUMNS)),
+    "REQUEST": (REQUEST_COLUMNS, {"SERVICE_ID", "PET_ID", "STATUS_ID", "ADDRESS_ID"})
+}
+
+# Colunas do grafo com IDs locais do shard, e a tabela a que se referem
+GRAPH_LOCAL_KEYS = {
+    "CUSTOMER_ADDRESS": {"CUSTOMER_ID": "CUSTOMER", "ADDRESS_ID": "ADDRESS"},
+    "PET": {"CUSTOMER_ID": "CUSTOMER"},
+    "CUSTOMER_ORDER": {"CUSTOMER_ID": "CUSTOMER", "ADDRESS_ID": "ADDRESS"},
+    "ORDER_ITEM": {"ORDER_ID": "CUSTOMER_ORDER"},
+    "REQUEST": {"PET_ID": "PET"}
+}
+
+# Tabelas do grafo sem ID: ao retomar, as linhas do shard interrompido são achadas pela coluna que aponta para a tabela dona
+GRAPH_OWNER_KEYS = {"CUSTOMER_ADDRESS": ("CUSTOMER_ID", "CUSTOMER")}
+# Folga do bloco de IDs de cada tabela do grafo sobre as linhas esperadas pelo VolumePlan
+ID_BLOCK_MARGIN = 1.05
+
+class EntityGraph:
+    """Linhas de um shard de clientes com todas as suas entidades, um ColumnBuffer por tabela.
+
+    Os IDs são locais ao shard (a posição da linha no buffer, a partir de 0), então o shard pode ser
+    gerado em outro processo sem conhecer o banco. Na gravação, cada tabela recebe um bloco de IDs
+    reservado e rebase() converte o ID e as chaves locais para os IDs do bloco."""
 
-class DataGenerator:
     def __init__(self):
-        self.db = Database()
-        self.fake_data = FakeDataGenerator()
+        self.buffers = {
+            table_name: ColumnBuffer(columns, int_columns)
+            for table_name, (columns, int_columns) in GRAPH_TABLES.items()
+        }
+
+    def __getitem__(self, table_name):
+        return self.buffers[table_name]
+
+    def rebase(self, table_name, first_ids):
+        """Buffer da tabela com o ID e as chaves locais somados ao primeiro ID do bloco de cada tabela (first_ids)."""
+        buffer = self.buffers[table_name]
+        local_keys = GRAPH_LOCAL_KEYS.get(table_name, {})
+
+        rebased = ColumnBuffer(buffer.columns)
+        rebased.data = [
+            array("q", (value + first_ids[local_keys[column]] for value in values)) if column in local_keys else values
+            for column, values in zip(buffer.columns, buffer.data)
+        ]
+        if table_name in first_ids:
+            first_id = first_ids[table_name]
+            rebased = rebased.with_column("ID", array("q", range(first_id, first_id + len(buffer))))
+        return rebased
+
+class DataGenerator:
+    def __init__(self, config=None, cache=None, processes=1, seed=None, database=None, manifest=None, prefetch=None,
+                 load_indexes=None):
+        self.config = config or load_config()
+        self.cache = cache or EntityCache()
+        # database: função que cria o Database do estágio (ex.: SQLiteDatabase nos benchmarks)
+        self.db = database() if database else Database()
+        # prefetch: lotes gerados à frente da gravação (None: WRITE_PREFETCH do .env; 0: em sequência)
+        if prefetch is not None:
+            self.db.prefetch = prefetch
+        self.seed = new_master_seed() if seed is None else seed
+        self.fake_data = FakeDataGenerator(self.config, seed=self.seed)
+        self.rng = self.fake_data.rng
+        self.processes = processes
+        self.sharded = ShardedGenerator(processes, self.seed, self.config.path, self.config.window) if processes > 1 else None
+        # manifest: RunManifest em que cada shard gravado é registrado, para retomar a execução
+        self.manifest = manifest
+        # load_indexes: índices das tabelas de fatos durante a carga ("keep", "disable" ou "drop")
+        self.load_indexes = LOAD_INDEXES if load_indexes is None else load_indexes
+
+    def generate_rows(self, method_name, columns, items, *shared_args):
+        """Gera as linhas de um estágio com o método iter_* informado, em vários processos quando processes > 1.
+
+        items são as entidades divididas entre os shards (quantidade ou lista); shared_args vão inteiros para todos."""
+        rows = (row for _, shard_rows in self.generate_shards(method_name, columns, items, *shared_args) for row in shard_rows)
+        return metrics.timed_iter("generate_rows", rows)
+
+    def generate_shards(self, method_name, columns, items, *shared_args, start=0):
+        """Como generate_rows, mas separado por shard: retorna (índice, linhas) de cada shard a partir do shard start."""
+        if self.sharded:
+            return self.sharded.generate(method_name, columns, items, shared_args, start)
+        return self.iter_shards(method_name, items, shared_args, start)
+
+    def iter_shards(self, method_name, items, shared_args, start=0):
+        """Gera os shards em sequência, cada um com a mesma semente que teria em um processo separado."""
+        shards = split_shards(items)
+        seeds = shard_seeds(self.seed, method_name, shards)
+        for index in range(start, len(shards)):
+            yield index, self.iter_shard(method_name, seeds[index], shards[index], shared_args)
+
+    def iter_shard(self, method_name, shard_seed, shard, shared_args):
+        self.fake_data.reseed(shard_seed)
+        yield from getattr(self, method_name)(shard, *shared_args)
+
+    def insert_shards(self, table_name, columns, method_name, items, *shared_args, on_insert=None, bulk=False):
+        """Gera e grava as linhas de um estágio (com load(), o caminho mais rápido, quando bulk).
+
+        Com manifesto, cada shard é gravado e confirmado separadamente e registrado como concluído.
+        Uma execução retomada apaga as linhas do shard interrompido e continua do shard seguinte.
+        Nas cargas bulk, os índices da tabela seguem o modo load_indexes (ver DeferredIndexes)."""
+        with DeferredIndexes(self.db, table_name, self.load_indexes if bulk else "keep", self.manifest):
+            return self.write_shards(table_name, columns, method_name, items, *shared_args, on_insert=on_insert, bulk=bulk)
+
+    def write_shards(self, table_name, columns, method_name, items, *shared_args, on_insert=None, bulk=False):
+        write = self.db.load if bulk else self.db.insert
+        if self.manifest is None:
+            return write(table_name, columns, self.generate_rows(method_name, columns, items, *shared_args), on_insert=on_insert)
+
+        start = self.manifest.resume_table(self.db, table_name, len(split_shards(items)))
+        if start:
+            # As linhas dos shards anteriores não estão no cache, então os próximos estágios as leem do banco
+            self.cache.forget(table_name)
+            on_insert = None
+
+        shards = self.generate_shards(method_name, columns, items, *shared_args, start=start)
+        shards = ((index, metrics.timed_iter("generate_rows", rows)) for index, rows in shards)
+        if self.db.prefetch:
+            # Os próximos shards são gerados inteiros enquanto o anterior é gravado
+            shards = ((index, list(rows)) for index, rows in shards)
+
+        total = 0
+        with Prefetcher(shards, self.db.prefetch) as shards:
+            for index, rows in shards:
+                written = write(table_name, columns, rows, on_insert=on_insert)
+                self.manifest.checkpoint(self.db, table_name, index, written)
+                total += written
+        self.db.wait_seconds += shards.wait_seconds
+        return total
 
     def generate_and_insert_customers(self, num_records):
         """Gera e insere dados de clientes no banco de dados."""
         self.db.open_conn()
 
-        customer_data = []
-        for _ in range(num_records):
-            fake_customer = self.fake_data.generate_customer()
-            customer_data.append(fake_customer)
-
-        columns = ["NAME", "EMAIL", "PHONE"]
-        self.db.insert("CUSTOMER", columns, customer_data)
+        columns = CUSTOMER_COLUMNS
+        self.insert_shards("CUSTOMER", columns, "iter_customers", self.customer_indexes(num_records), on_insert=self.cache.recorder("CUSTOMER", columns, []))
         self.db.close_conn()
 
+    def customer_indexes(self, num_records):
+        """Índices dos clientes novos, a partir da marca d'água de CUSTOMER: os e-mails não repetem os das execuções anteriores."""
+        first = self.cache.watermark("CUSTOMER")
+        return range(first, first + num_records)
+
+    def iter_customers(self, num_records):
+        """Gera os clientes sob demanda, sem manter a lista inteira em memória.
+
+        num_records pode ser uma quantidade ou um range de índices (shards), usados para manter os e-mails únicos."""
+        indexes = range(num_records) if isinstance(num_records, int) else num_records
+        for index in indexes:
+            yield self.fake_data.generate_customer(index)
+
     def generate_and_insert_pets(self):
         """Gera e insere dados de pets no banco de dados."""
         self.db.open_conn()
 
-        breed_ids = self.db.search(table_name="BREED", columns=["ID", "SPECIE_ID"])
-        size_ids = self.db.search(table_name="SIZE", columns=["ID"])
-        customer_ids = self.db.search(table_name="CUSTOMER", columns=["ID"])
+        breed_ids = self.cache.reference(self.db, "BREED")
+        size_ids = self.cache.reference(self.db, "SIZE")
+        customer_ids = self.cache.customers(self.db)
+
+        columns = PET_COLUMNS
+        self.insert_shards("PET", columns, "iter_pets", customer_ids, breed_ids, size_ids, on_insert=self.cache.recorder("PET", columns, ["BREED_ID", "CUSTOMER_ID"]))
+        self.db.close_conn()
+
+    def iter_pets(self, customer_ids, breed_ids, size_ids):
+        """Gera os pets dos clientes sob demanda."""
 
         # Maior probabilidade de ser um cachorro ou um gato
-        specie_probabilities = getConfig("specie_probabilities")
-        quantity_pets_probabilities = getConfig("quantity_pets_probabilities")
+        specie_probabilities = self.config.table("specie_probabilities")
+        quantity_pets_probabilities = self.config.table("quantity_pets_probabilities")
 
-        pet_data = []
-        for customer_id in customer_ids:
-            num_pets = random.choices(
-                list(quantity_pets_probabilities.keys()), 
-                weights=list(quantity_pets_probabilities.values())
-            )[0]
+        breed_ids_by_species = {}
+        for breed in breed_ids:
+            breed_ids_by_species.setdefault(breed["SPECIE_ID"], []).append(breed)
 
-            for _ in range(int(num_pets)):
-                specie_id = random.choices(
-                    list(specie_probabilities.keys()), 
-                    weights=list(specie_probabilities.values())
-                )[0]
+        # Sorteia de uma vez a quantidade de pets de cada cliente e a espécie de cada pet
+        pets_per_customer = [int(num_pets) for num_pets in quantity_pets_probabilities.sample(len(customer_ids), self.rng)]
+        species = iter(specie_probabilities.sample(sum(pets_per_customer), self.rng))
 
-                breed_ids_per_species = [breed for breed in breed_ids if breed["SPECIE_ID"] == int(specie_id)]
-                
-                fake_pet = self.fake_data.generate_pet(breed_ids_per_species, size_ids, customer_id)
-                pet_data.append(fake_pet)
+        for customer_id, num_pets in zip(customer_ids, pets_per_customer):
+            for _ in range(num_pets):
+                specie_id = next(species)
 
-        columns = ["NAME", "DATE_BIRTH", "BREED_ID", "SIZE_ID", "CUSTOMER_ID"]
-        self.db.insert("PET", columns, pet_data)
-        self.db.close_conn()
+                breed_ids_per_species = breed_ids_by_species.get(int(specie_id), [])
+                
+                yield self.fake_data.generate_pet(breed_ids_per_species, size_ids, customer_id)
 
     def generate_and_insert_address(self, num_records):
         """Gera e insere dados de endereços no banco de dados."""
         self.db.open_conn()
 
         # Busca os ids dos estados onde tem loja
-        state_ids = self.db.search(
-            table_name="ADDRESS a",
-            columns=["DISTINCT c.STATE_ID"],
-            join="JOIN city c ON a.CITY_ID = c.ID",
-            where="a.ADDRESS_TYPE_ID = 2"
-        )
+        state_ids = self.cache.reference(self.db, "STORE_STATE")
 
         state_store_ids = [state['STATE_ID'] for state in state_ids]
 
         # Buscando cidades dos estados onde existe loja
-        city_ids = self.db.search(
-            table_name="CITY c", 
-            columns=["c.ID", "c.STATE_ID"],
-            join="JOIN STATE s ON c.STATE_ID = s.ID"
-        )
-
-        state_probabilities = getConfig("state_probabilities")
-        city_probabilities = getConfig("city_probabilities")
+        city_ids = self.cache.reference(self.db, "CITY")
+
+        columns = ADDRESS_COLUMNS
+        self.insert_shards("ADDRESS", columns, "iter_addresses", num_records, city_ids, state_store_ids, on_insert=self.cache.recorder("ADDRESS", columns, ["CITY_ID"]))
+        self.db.close_conn()
+
+    def iter_addresses(self, num_records, city_ids, state_store_ids):
+        """Gera os endereços dos clientes sob demanda."""
+        state_probabilities = self.config.table("state_probabilities")
+        city_probabilities = self.config.table("city_probabilities")
         city_store_ids = [city for city in city_ids if city["STATE_ID"] in state_store_ids]
         city_ids = [city for city in city_ids if city["STATE_ID"] not in state_store_ids]
         
-        address_data = []
-        for _ in range(num_records):
-            state = random.choices(
-                list(state_probabilities.keys()), 
-                weights=list(state_probabilities.values())
-            )[0]
-
-            if state != "other" and int(state) == 25:
-                city_id = random.choices(
-                    list(city_probabilities.keys()), 
-                    weights=list(city_probabilities.values())
-                )[0]
-
-                list_city_ids = city_ids if state == "other" else [city for city in city_store_ids if city["ID"] == int(city_id)]
-            else:
-                list_city_ids = city_ids if state == "other" else [city for city in city_store_ids if city["STATE_ID"] == int(state)]
+        states = state_probabilities.sample(num_records if isinstance(num_records, int) else len(num_records), self.rng)
+        cities = iter(city_probabilities.sample(states.count("25"), self.rng))
 
-            fake_address = self.fake_data.generate_address(list_city_ids)
-            address_data.append(fake_address)
+        for state in states:
+            yield self.fake_data.generate_address(self.address_cities(state, cities, city_ids, city_store_ids))
 
-        columns = ["POSTAL_CODE", "STREET", "NUMBER", "COMPLEMENT", "NEIGHBORHOOD", "CITY_ID", "ADDRESS_TYPE_ID"]
-        self.db.insert("ADDRESS", columns, address_data)
-        self.db.close_conn()
+    def address_cities(self, state, cities, city_ids, city_store_ids):
+        """Cidades possíveis do endereço de um cliente do estado sorteado.
+
+        No estado 25 a cidade também é sorteada (o próximo sorteio de cities); em "other", vale qualquer cidade sem loja."""
+        if state == "other":
+            return city_ids
+        if int(state) == 25:
+            city_id = int(next(cities))
+            return [city for city in city_store_ids if city["ID"] == city_id]
+        return [city for city in city_store_ids if city["STATE_ID"] == int(state)]
 
     def generate_and_insert_customer_address(self):
         """Gera e insere dados de associação entre cliente e endereço, garantindo que cada cliente tenha um endereço único e que todos os endereços sejam associados a clientes."""
         self.db.open_conn()
 
         # Obter todos os IDs de clientes e endereços
-        customer_ids = self.db.search(table_name="CUSTOMER", columns=["ID"])
-        address_ids = self.db.search(table_name="ADDRESS", columns=["ID"], where="ADDRESS_TYPE_ID = %s", where_params=("1",))
+        customer_ids = self.cache.customers(self.db)
+        address_ids = list(self.cache.customer_address_ids(self.db))
+
+        # Ao retomar uma execução, descarta as associações gravadas em parte (só os clientes desta execução têm associações novas)
+        if self.manifest:
+            self.db.delete("CUSTOMER_ADDRESS", f"CUSTOMER_ID > {self.cache.watermark('CUSTOMER')}")
 
         # Verificar se o número de endereços é suficiente para os clientes
         if len(address_ids) < len(customer_ids):
             raise ValueError("Número de endereços insuficiente para o número de clientes")
 
         # Embaralhar os endereços e atribuir um endereço único a cada cliente
-        random.shuffle(address_ids)
+        stage_rng(self.seed, "customer_address").shuffle(address_ids)
         customer_address_data = [(customer_id["ID"], address_ids[i]["ID"]) for i, customer_id in enumerate(customer_ids)]
 
         # Inserir os dados na tabela CUSTOMER_ADDRESS
-        columns = ["CUSTOMER_ID", "ADDRESS_ID"]
+        columns = CUSTOMER_ADDRESS_COLUMNS
         self.db.insert("CUSTOMER_ADDRESS", columns, customer_address_data)
+        self.cache.set_customer_address(customer_address_data)
 
         self.db.close_conn()
 
@@ -134,83 +289,58 @@ class DataGenerator:
 
         self.db.open_conn()
 
-        # Busca os ids dos estados onde tem loja
-        state_ids = self.db.search(
-            table_name="ADDRESS a",
-            columns=["DISTINCT c.STATE_ID"],
-            join="JOIN city c ON a.CITY_ID = c.ID",
-            where="a.ADDRESS_TYPE_ID = 2"
-        )
-
-        state_ids = [state['STATE_ID'] for state in state_ids]
-
-        # Busca os ids dos clientes que moram nos estados onde existe loja 
-        customer_address_ids = self.db.search(
-            table_name="CUSTOMER_ADDRESS ca",
-            columns=["ca.CUSTOMER_ID", "ca.ADDRESS_ID"],
-            join="JOIN ADDRESS a ON ca.ADDRESS_ID = a.ID JOIN CITY c ON a.CITY_ID = c.ID",
-        )
-
-        active_inactive_customer_probabilities = getConfig("active_customer_order_probabilities")
-        range_of_orders_per_customer = getConfig("range_of_orders_per_customer")
-
-        order_data = []
-        for customer_address in customer_address_ids:
-            type_customer = random.choices(
-                list(active_inactive_customer_probabilities.keys()), 
-                weights=list(active_inactive_customer_probabilities.values())
-            )[0]
-
-            range_orders_str = range_of_orders_per_customer[type_customer]
-            numbers = re.findall(r'\d+', range_orders_str)
-            range_orders = tuple(map(int, numbers))
-
-            num_orders = random.randint(range_orders[0], range_orders[1])
-            for _ in range(num_orders):
-                fake_order = self.fake_data.generate_order(customer_address["CUSTOMER_ID"], customer_address["ADDRESS_ID"])
-                order_data.append(fake_order)
-
-        columns = ["CUSTOMER_ID", "ORDER_DATE", "STATUS_ID", "ADDRESS_ID"]
-        self.db.insert("CUSTOMER_ORDER", columns, order_data)
+        # Busca os ids dos clientes e seus endereços
+        customer_address_ids = self.cache.customer_address(self.db)
+
+        columns = ORDER_COLUMNS
+        self.insert_shards("CUSTOMER_ORDER", columns, "iter_orders", customer_address_ids, on_insert=self.cache.recorder("CUSTOMER_ORDER", columns, ["CUSTOMER_ID", "ORDER_DATE", "ADDRESS_ID"]), bulk=True)
         self.db.close_conn()
 
-    def generate_and_insert_order_item(self):
-        """Gera e insere itens do pedido no banco de dados."""
+    def iter_orders(self, customer_address_ids):
+        """Gera os pedidos dos clientes em ordem de data, em um ColumnBuffer.
 
-        self.db.open_conn()
+        As datas são sorteadas na linha do tempo como inteiros e ordenadas antes de gerar as linhas,
+        então os pedidos de cada shard saem em ordem cronológica."""
+        active_inactive_customer_probabilities = self.config.table("active_customer_order_probabilities")
+
+        types_customer = active_inactive_customer_probabilities.sample(len(customer_address_ids), self.rng)
+        statuses = self.config.table("status_order_probabilities").stream(self.rng)
 
-        city_probabilities = getConfig("city_probabilities")
+        timeline = self.fake_data.timeline
 
-        (warm_period_start, warm_period_end), (cold_period_start, cold_period_end), product_warm_probabilities, product_cold_probabilities = get_period_and_probabilities()
+        events = []
+        for customer_address, type_customer in zip(customer_address_ids, types_customer):
+            range_orders = self.config.range("range_of_orders_per_customer", type_customer)
 
-        orders = self.db.search(
-            table_name="CUSTOMER_ORDER co",
-            columns=["co.ID", "co.ORDER_DATE", "co.CUSTOMER_ID", "a.CITY_ID", "ct.STATE_ID"],
-            join="JOIN address a ON a.ID = co.ADDRESS_ID JOIN city ct ON ct.ID = a.CITY_ID"
-        )
+            # Na janela de atividades, a quantidade é proporcional ao tamanho da janela
+            num_orders = scale_count(self.rng.randint(range_orders[0], range_orders[1]), self.config.activity_scale, self.rng)
+            customer_id, address_id = customer_address["CUSTOMER_ID"], customer_address["ADDRESS_ID"]
+            events.extend((timestamp, customer_id, address_id) for timestamp in timeline.sample(num_orders, self.rng))
+
+        events.sort()
+        buffer = ColumnBuffer(ORDER_COLUMNS, int_columns={"CUSTOMER_ID", "STATUS_ID", "ADDRESS_ID"})
+        customer_ids, order_dates, status_ids, address_ids = buffer.data
+        for timestamp, customer_id, address_id in events:
+            customer_ids.append(customer_id)
+            order_dates.append(timeline.format(timestamp))
+            status_ids.append(int(next(statuses)))
+            address_ids.append(address_id)
+        yield buffer
+
+    def generate_and_insert_order_item(self):
+        """Gera e insere itens do pedido no banco de dados."""
 
-        state_ids = [order["STATE_ID"] for order in orders]
+        self.db.open_conn()
 
-        stores = self.db.search(
-            table_name="STORE s",
-            columns=["s.ID", "a.CITY_ID", "c.STATE_ID"],
-            join="JOIN address a ON a.ID = s.ADDRESS_ID JOIN city c ON c.ID = a.CITY_ID",
-            where="c.STATE_ID IN (%s)",
-            where_params=state_ids
-        )
+        orders = self.cache.orders(self.db)
 
-        state_ids_from_stores = list(set(store["STATE_ID"] for store in stores))
+        # Lojas dos estados que têm pedidos
+        state_ids = set(order["STATE_ID"] for order in orders)
+        stores = [store for store in self.cache.reference(self.db, "STORE") if store["STATE_ID"] in state_ids]
 
-        products = self.db.search(
-            table_name="PRODUCT p",
-            columns=["p.ID", "p.NAME", "p.DESCRIPTION", "p.SKU", "p.STORE_ID"]
-        )
+        products = self.cache.reference(self.db, "PRODUCT")
 
-        species_per_customer = self.db.search(
-            table_name="PET p",
-            columns=["p.CUSTOMER_ID", "s.NAME"],
-            join="JOIN BREED b ON b.ID = p.BREED_ID JOIN SPECIE s ON s.ID = b.SPECIE_ID"
-        )
+        species_per_customer = self.cache.species_per_customer(self.db)
 
         species_dict = {}
 
@@ -223,112 +353,322 @@ class DataGenerator:
             
             species_dict[customer_id].append(specie_name)
 
-        products_by_store = {}
-        for product in products:
-            if product["STORE_ID"] not in products_by_store:
-                products_by_store[product["STORE_ID"]] = []
-            products_by_store[product["STORE_ID"]].append(product)
+        # Classifica os produtos por loja, espécie e temperatura e indexa as lojas uma única vez
+        product_index = ProductIndex(products)
+        store_index = StoreIndex(stores)
 
-        quantity_probabilities = getConfig("quantity_order_item_probabilities")
+        columns = ORDER_ITEM_COLUMNS
+        self.insert_shards("ORDER_ITEM", columns, "iter_order_items", orders, store_index, product_index, species_dict, bulk=True)
+        self.db.close_conn()
 
-        order_item_data = []
-        for order in orders:
-            quantity_range_str = random.choices(
-                list(quantity_probabilities.keys()), 
-                weights=list(quantity_probabilities.values())
-            )[0]
+    def iter_order_items(self, orders, store_index, product_index, species_dict):
+        """Gera os itens dos pedidos em um ColumnBuffer."""
+        city_probabilities = self.config.table("city_probabilities")
 
-            if order["STATE_ID"] in state_ids_from_stores:
-                numbers = re.findall(r'\d+', quantity_range_str)
-                quantity_range = tuple(map(int, numbers))
-                quantity = random.randint(quantity_range[0], quantity_range[1])
-            else:
-                quantity = random.randint(1, 3)
-
-            # Busca as lojas do mesmo estado do pedido
-            if order["STATE_ID"] == 25:
-                city_id = random.choices(
-                    list(city_probabilities.keys()), 
-                    weights=list(city_probabilities.values())
-                )[0]
-                stores_in_same_state = [store for store in stores if store["CITY_ID"] == int(city_id)]
-            else:
-                stores_in_same_state = [store for store in stores if store["STATE_ID"] == order["STATE_ID"]]
+        state_ids_from_stores = store_index.by_state
 
-            store_id = random.choice(stores_in_same_state)["ID"] if stores_in_same_state else random.choice(stores)["ID"]
+        quantity_probabilities = self.config.table("quantity_order_item_probabilities")
 
-            products_of_store = products_by_store.get(store_id, [])
+        # Sorteios feitos em lote para todo o estágio
+        quantity_ranges = quantity_probabilities.sample(len(orders), self.rng)
+        cities = city_probabilities.stream(self.rng)
+        item_quantities = self.config.table("quantity_order_items_probabilities").stream(self.rng)
+        product_types = {
+            "warm": self.config.product_table("warm").stream(self.rng),
+            "cold": self.config.product_table("cold").stream(self.rng)
+        }
+        timeline = self.fake_data.timeline
 
-            # Classifica os produtos por espécie
-            classified_products_per_specie = classify_product(products_of_store)
+        buffer = ColumnBuffer(ORDER_ITEM_COLUMNS, int_columns=set(ORDER_ITEM_COLUMNS))
+        order_ids, product_ids, quantities = buffer.data
+
+        for order, quantity_range_str in zip(orders, quantity_ranges):
+            if order["STATE_ID"] in state_ids_from_stores:
+                quantity_range = quantity_probabilities.ranges[quantity_range_str]
+                quantity = self.rng.randint(quantity_range[0], quantity_range[1])
+            else:
+                quantity = self.rng.randint(1, 3)
+
+            # Sorteia uma loja do mesmo estado do pedido
+            city_id = int(next(cities)) if order["STATE_ID"] == 25 else None
+            store_id = store_index.select_store_id(order["STATE_ID"], city_id, self.rng)
 
             # Busca as espécies do cliente
             specie_of_customer = species_dict.get(order["CUSTOMER_ID"], [])
 
-            # Separa os produtos que o cliente pode comprar com base na espécie do seu animal
-            products_for_customer = get_products_for_customer(classified_products_per_specie, specie_of_customer)
+            # O período do pedido é o mesmo para todos os seus itens
+            period = timeline.season(order["ORDER_DATE"])
+            product_type_draws = product_types.get(period)
 
             for _ in range(quantity):
-                product_type = get_product_type(order["ORDER_DATE"], [warm_period_start, warm_period_end], [cold_period_start, cold_period_end], product_warm_probabilities, product_cold_probabilities)
-                product_id = select_product_id(product_type, products_for_customer, products_of_store)
+                product_type = next(product_type_draws) if product_type_draws else None
+                product_id = product_index.select_product_id(store_id, specie_of_customer, product_type, self.rng)
 
-                fake_order_item = self.fake_data.generate_order_item(product_id, order["ID"])
-                order_item_data.append(fake_order_item) 
+                order_ids.append(order["ID"])
+                product_ids.append(product_id)
+                quantities.append(int(next(item_quantities)))
 
-        columns = ["ORDER_ID", "PRODUCT_ID", "QUANTITY"]
-        self.db.insert("ORDER_ITEM", columns, order_item_data)
-        self.db.close_conn()
+        yield buffer
 
     def generate_and_insert_request(self):
         """Gera e insere solicitações de serviços no banco de dados."""
 
         self.db.open_conn()
 
-        pets = self.db.search(
-            table_name="PET p",
-            columns=["p.ID", "b.SPECIE_ID", "ca.ADDRESS_ID", "a.CITY_ID"],
-            join="JOIN CUSTOMER_ADDRESS ca ON ca.CUSTOMER_ID = p.CUSTOMER_ID JOIN ADDRESS a ON a.ID = ca.ADDRESS_ID JOIN BREED b ON b.ID = p.BREED_ID",
-            where="b.SPECIE_ID != %s",
-            where_params=(3,)
-        )
-
-        services = self.db.search(
-            table_name="SERVICE s",
-            columns=["s.ID", "ss.STORE_ID", "a.CITY_ID", "st.ADDRESS_ID"],
-            join="JOIN STORE_SERVICE ss ON ss.SERVICE_ID = s.ID JOIN STORE st ON st.ID = ss.STORE_ID JOIN ADDRESS a ON a.ID = st.ADDRESS_ID"
-        )
-
-        active_inactive_customer_probabilities = getConfig("active_customer_request_probabilities")
-        range_of_requests_per_customer = getConfig("range_of_requests_per_customer")
-
-        request_data = []
-        for pet in pets:
-            type_customer = random.choices(
-                list(active_inactive_customer_probabilities.keys()), 
-                weights=list(active_inactive_customer_probabilities.values())
-            )[0]
-
-            range_requests_str = range_of_requests_per_customer[type_customer]
-            numbers = re.findall(r'\d+', range_requests_str)
-            range_requests = tuple(map(int, numbers))
-
-            num_requests = random.randint(range_requests[0], range_requests[1])
-            
-            services_filter = [service for service in services if service["CITY_ID"] == pet["CITY_ID"]]
+        # Peixes não solicitam serviços
+        pets = self.cache.pets_for_request(self.db, 3)
+
+        # Serviços indexados por cidade e espécie
+        service_index = ServiceIndex(self.cache.reference(self.db, "SERVICE"))
+
+        columns = REQUEST_COLUMNS
+        self.insert_shards("REQUEST", columns, "iter_requests", pets, service_index, bulk=True)
+        self.db.close_conn()
+
+    def iter_requests(self, pets, service_index):
+        """Gera as solicitações de serviço dos pets em ordem de data (como em iter_orders), em um ColumnBuffer."""
+        active_inactive_customer_probabilities = self.config.table("active_customer_request_probabilities")
+
+        types_customer = active_inactive_customer_probabilities.sample(len(pets), self.rng)
+        statuses = self.config.table("status_request_probabilities").stream(self.rng)
+
+        timeline = self.fake_data.timeline
+
+        events = []
+        for pet, type_customer in zip(pets, types_customer):
+            range_requests = self.config.range("range_of_requests_per_customer", type_customer)
+
+            num_requests = scale_count(self.rng.randint(range_requests[0], range_requests[1]), self.config.activity_scale, self.rng)
             
-            if not services_filter:
-                services_filter = services
-
-            for _ in range(num_requests):
-                allowed_services = get_allowed_services(pet["SPECIE_ID"], services_filter)
-                if allowed_services:
-                    random_service = random.choice(allowed_services)
-                    service_id = random_service["ID"]
-                    address_id = random_service["ADDRESS_ID"]
-                    
-                    fake_request = self.fake_data.generate_request(service_id, pet["ID"], address_id)
-                    request_data.append(fake_request)
-
-        columns = ["SERVICE_ID", "PET_ID", "REQUEST_DATE", "STATUS_ID", "SERVICE_DATE", "ADDRESS_ID"]
-        self.db.insert("REQUEST", columns, request_data)
-        self.db.close_conn()
\ No newline at end of file
+            # Serviços da cidade do pet (ou de todas, se a cidade não tiver) permitidos para a sua espécie
+            service_ids, address_ids = service_index.get_services(pet["CITY_ID"], pet["SPECIE_ID"])
+            if not service_ids:
+                continue
+
+            for timestamp in timeline.sample(num_requests, self.rng):
+                index = int(self.rng.random() * len(service_ids))
+                events.append((timestamp, pet["ID"], service_ids[index], address_ids[index]))
+
+        events.sort()
+        buffer = ColumnBuffer(REQUEST_COLUMNS, int_columns={"SERVICE_ID", "PET_ID", "STATUS_ID", "ADDRESS_ID"})
+        service_ids, pet_ids, request_dates, status_ids, service_dates, address_ids = buffer.data
+        for timestamp, pet_id, service_id, address_id in events:
+            service_ids.append(service_id)
+            pet_ids.append(pet_id)
+            request_dates.append(timeline.format(timestamp))
+            status_ids.append(int(next(statuses)))
+            service_dates.append(self.fake_data.service_date(timestamp))
+            address_ids.append(address_id)
+        yield buffer
+
+    def generate_and_insert_graph(self, num_records):
+        """Gera e insere os clientes com todas as suas entidades (endereço, pets, pedidos, itens e solicitações) em um único estágio.
+
+        Alternativa aos estágios por tabela: cada cliente é gerado de uma vez, com o seu endereço, a
+        sua cidade e as espécies dos seus pets em mãos, então nenhuma tabela gerada é lida de volta
+        (nem do cache, nem do banco); só as de referência são buscadas."""
+        self.db.open_conn()
+
+        breeds_by_specie = {}
+        for breed in self.cache.reference(self.db, "BREED"):
+            breeds_by_specie.setdefault(breed["SPECIE_ID"], []).append(breed)
+        cities = self.cache.reference(self.db, "CITY")
+
+        # Como no estágio ORDER_ITEM, só as lojas dos estados que podem ter pedidos: os sorteados para os
+        # clientes (os de "other" moram em estados sem loja). Assim a loja sorteada quando a cidade ou o
+        # estado do pedido não tem loja sai do mesmo conjunto nos dois modos.
+        order_state_ids = set(int(state) for state in self.config.table("state_probabilities").keys if state != "other")
+        stores = [store for store in self.cache.reference(self.db, "STORE") if store["STATE_ID"] in order_state_ids]
+
+        references = {
+            "state_store_ids": [state["STATE_ID"] for state in self.cache.reference(self.db, "STORE_STATE")],
+            "city_ids": cities,
+            "city_state": {city["ID"]: city["STATE_ID"] for city in cities},
+            "breeds_by_specie": breeds_by_specie,
+            "size_ids": self.cache.reference(self.db, "SIZE"),
+            "specie_names": {specie["ID"]: specie["NAME"] for specie in self.cache.reference(self.db, "SPECIE")},
+            "store_index": StoreIndex(stores),
+            "product_index": ProductIndex(self.cache.reference(self.db, "PRODUCT")),
+            "service_index": ServiceIndex(self.cache.reference(self.db, "SERVICE"))
+        }
+
+        # As tabelas de fatos seguem o modo load_indexes, como nos estágios por tabela
+        with ExitStack() as stack:
+            for table_name in ("CUSTOMER_ORDER", "ORDER_ITEM", "REQUEST"):
+                stack.enter_context(DeferredIndexes(self.db, table_name, self.load_indexes, self.manifest))
+            self.insert_graph(self.customer_indexes(num_records), references)
+        self.db.close_conn()
+
+    def insert_graph(self, customer_indexes, references):
+        """Gera os grafos dos clientes por shard e grava cada shard, tabela a tabela, com IDs de blocos reservados.
+
+        Com manifesto, cada shard gravado é registrado; ao retomar, as linhas do shard interrompido são
+        apagadas de todas as tabelas e a geração continua do shard seguinte. Retorna as linhas gravadas por tabela."""
+        tables = list(GRAPH_TABLES)
+        start = 0
+        if self.manifest:
+            start = self.manifest.resume_graph(self.db, "GRAPH", tables, len(split_shards(customer_indexes)), GRAPH_OWNER_KEYS)
+
+        # Um bloco de IDs por tabela para todos os shards restantes, com folga sobre as linhas esperadas
+        remaining = sum(len(shard) for shard in split_shards(customer_indexes)[start:])
+        expected = VolumePlan(self.config, remaining, graph=True).rows
+        try:
+            self.db.reserve_id_blocks({
+                table_name: int(expected[table_name] * ID_BLOCK_MARGIN) + 1
+                for table_name in tables if table_name not in GRAPH_OWNER_KEYS
+            })
+
+            shards = self.generate_shards("iter_graph", None, customer_indexes, references, start=start)
+            shards = ((index, metrics.timed_iter("generate_rows", graphs)) for index, graphs in shards)
+            if self.db.prefetch:
+                # Os próximos shards são gerados inteiros enquanto o anterior é gravado
+                shards = ((index, list(graphs)) for index, graphs in shards)
+
+            totals = dict.fromkeys(tables, 0)
+            with Prefetcher(shards, self.db.prefetch) as shards:
+                for index, graphs in shards:
+                    for graph in graphs:
+                        for table_name, written in self.write_graph(graph).items():
+                            totals[table_name] += written
+                    if self.manifest:
+                        self.manifest.checkpoint_graph(self.db, "GRAPH", tables, index, GRAPH_OWNER_KEYS)
+        finally:
+            # Sem isso, um shard com erro deixaria o AUTO_INCREMENT adiantado pelos blocos não usados
+            self.db.release_ids()
+        self.db.wait_seconds += shards.wait_seconds
+        return totals
+
+    def write_graph(self, graph):
+        """Tira dos blocos reservados os IDs de cada tabela do shard e grava as tabelas na ordem das referências."""
+        first_ids = {
+            table_name: self.db.reserve_ids(table_name, len(graph[table_name]))
+            for table_name in GRAPH_TABLES if table_name not in GRAPH_OWNER_KEYS
+        }
+
+        written = {}
+        for table_name in GRAPH_TABLES:
+            rows = graph.rebase(table_name, first_ids)
+            written[table_name] = self.db.load(table_name, rows.columns, [rows])
+        return written
+
+    def iter_graph(self, customer_indexes, references):
+        """Gera o grafo de cada cliente do shard em uma única passada: cliente, endereço, pets, pedidos, itens e solicitações.
+
+        Pedidos e solicitações do shard são ordenados por data antes de virarem linhas, como em
+        iter_orders e iter_requests; os itens de cada pedido são gerados junto com ele."""
+        config = self.config
+        timeline = self.fake_data.timeline
+        graph = EntityGraph()
+        num_customers = len(customer_indexes)
+
+        city_ids = references["city_ids"]
+        state_store_ids = references["state_store_ids"]
+        city_store_ids = [city for city in city_ids if city["STATE_ID"] in state_store_ids]
+        other_city_ids = [city for city in city_ids if city["STATE_ID"] not in state_store_ids]
+        city_state = references["city_state"]
+        store_index, product_index, service_index = references["store_index"], references["product_index"], references["service_index"]
+
+        # Sorteios feitos em lote para todo o shard
+        states = config.table("state_probabilities").sample(num_customers, self.rng)
+        address_cities = iter(config.table("city_probabilities").sample(states.count("25"), self.rng))
+        pets_per_customer = config.table("quantity_pets_probabilities").sample(num_customers, self.rng)
+        order_types = config.table("active_customer_order_probabilities").sample(num_customers, self.rng)
+        species = config.table("specie_probabilities").stream(self.rng)
+        request_types = config.table("active_customer_request_probabilities").stream(self.rng)
+
+        # Espécies e estado de cada cliente (pelo ID local), usados pelos itens dos pedidos
+        customer_species = []
+        customer_states = []
+        order_events = []
+        request_events = []
+
+        for customer_id, (index, state, num_pets, order_type) in enumerate(zip(customer_indexes, states, pets_per_customer, order_types)):
+            graph["CUSTOMER"].append(self.fake_data.generate_customer(index))
+
+            # Um endereço por cliente, com o mesmo ID local
+            address = self.fake_data.generate_address(self.address_cities(state, address_cities, other_city_ids, city_store_ids))
+            graph["ADDRESS"].append(address)
+            graph["CUSTOMER_ADDRESS"].append((customer_id, customer_id))
+            city_id = address["city_id"]
+            customer_states.append(city_state[city_id])
+
+            names = []
+            for _ in range(int(num_pets)):
+                specie_id = int(next(species))
+                pet_id = len(graph["PET"])
+                graph["PET"].append(self.fake_data.generate_pet(references["breeds_by_specie"].get(specie_id, []), references["size_ids"], {"ID": customer_id}))
+                names.append(references["specie_names"][specie_id])
+
+                # Serviços da cidade do dono (ou de todas) permitidos para a espécie; peixes não pedem serviços
+                service_ids, store_address_ids = service_index.get_services(city_id, specie_id)
+                if not service_ids:
+                    continue
+
+                range_requests = config.range("range_of_requests_per_customer", next(request_types))
+                num_requests = scale_count(self.rng.randint(range_requests[0], range_requests[1]), config.activity_scale, self.rng)
+                for timestamp in timeline.sample(num_requests, self.rng):
+                    service = int(self.rng.random() * len(service_ids))
+                    request_events.append((timestamp, pet_id, service_ids[service], store_address_ids[service]))
+            customer_species.append(names)
+
+            range_orders = config.range("range_of_orders_per_customer", order_type)
+            num_orders = scale_count(self.rng.randint(range_orders[0], range_orders[1]), config.activity_scale, self.rng)
+            order_events.extend((timestamp, customer_id) for timestamp in timeline.sample(num_orders, self.rng))
+
+        self.add_graph_orders(graph, sorted(order_events), customer_species, customer_states, store_index, product_index)
+
+        request_events.sort()
+        request_statuses = config.table("status_request_probabilities").stream(self.rng)
+        service_ids, pet_ids, request_dates, status_ids, service_dates, address_ids = graph["REQUEST"].data
+        for timestamp, pet_id, service_id, address_id in request_events:
+            service_ids.append(service_id)
+            pet_ids.append(pet_id)
+            request_dates.append(timeline.format(timestamp))
+            status_ids.append(int(next(request_statuses)))
+            service_dates.append(self.fake_data.service_date(timestamp))
+            address_ids.append(address_id)
+
+        yield graph
+
+    def add_graph_orders(self, graph, order_events, customer_species, customer_states, store_index, product_index):
+        """Acrescenta ao grafo os pedidos (em ordem de data) e os itens de cada um, como em iter_orders e iter_order_items."""
+        config = self.config
+        timeline = self.fake_data.timeline
+
+        statuses = config.table("status_order_probabilities").stream(self.rng)
+        quantity_probabilities = config.table("quantity_order_item_probabilities")
+        quantity_ranges = quantity_probabilities.sample(len(order_events), self.rng)
+        cities = config.table("city_probabilities").stream(self.rng)
+        item_quantities = config.table("quantity_order_items_probabilities").stream(self.rng)
+        product_types = {
+            "warm": config.product_table("warm").stream(self.rng),
+            "cold": config.product_table("cold").stream(self.rng)
+        }
+
+        customer_ids, order_dates, status_ids, address_ids = graph["CUSTOMER_ORDER"].data
+        order_ids, product_ids, quantities = graph["ORDER_ITEM"].data
+        for order_id, ((timestamp, customer_id), quantity_range_str) in enumerate(zip(order_events, quantity_ranges)):
+            order_date = timeline.format(timestamp)
+            state_id = customer_states[customer_id]
+            customer_ids.append(customer_id)
+            order_dates.append(order_date)
+            status_ids.append(int(next(statuses)))
+            address_ids.append(customer_id)
+
+            if state_id in store_index.by_state:
+                quantity_range = quantity_probabilities.ranges[quantity_range_str]
+                quantity = self.rng.randint(quantity_range[0], quantity_range[1])
+            else:
+                quantity = self.rng.randint(1, 3)
+
+            # Sorteia uma loja do mesmo estado do pedido
+            city_id = int(next(cities)) if state_id == 25 else None
+            store_id = store_index.select_store_id(state_id, city_id, self.rng)
+
+            product_type_draws = product_types.get(timeline.season(order_date))
+            for _ in range(quantity):
+                product_type = next(product_type_draws) if product_type_draws else None
+                product_id = product_index.select_product_id(store_id, customer_species[customer_id], product_type, self.rng)
+                order_ids.append(order_id)
+                product_ids.append(product_id)
+                quantities.append(int(next(item_quantities)))
@@ -0,0 +1,96 @@
+import time
+from service.manifest import max_id
+from utils.metrics import metrics
+
+# keep: índices e verificações como estão; disable: sem foreign_key_checks e unique_checks na sessão
+# da carga; drop: além disso, remove os índices secundários e as chaves estrangeiras e os recria no fim
+LOAD_INDEX_MODES = ("keep", "disable", "drop")
+
+class DeferredIndexes:
+    """Adia a manutenção dos índices de uma tabela durante a sua carga (use com with).
+
+    Com "disable", a sessão da carga desliga foreign_key_checks e unique_checks. Com "drop", os
+    índices secundários não únicos e as chaves estrangeiras também são removidos antes da carga e
+    recriados de uma vez no fim, sem revalidar as linhas. Nos dois modos, a integridade referencial
+    das linhas novas é verificada no fim com uma consulta por chave estrangeira (anti-join), e uma
+    linha órfã é um erro.
+
+    Com manifesto, as definições removidas e o maior ID anterior à carga ficam gravados nele, então
+    uma execução retomada recria os mesmos índices e verifica todas as linhas da carga."""
+
+    def __init__(self, db, table_name, mode, manifest=None):
+        if mode not in LOAD_INDEX_MODES:
+            raise ValueError(f"Modo de índices inválido: {mode!r}. Use um de {', '.join(LOAD_INDEX_MODES)}")
+        self.db = db
+        self.table_name = table_name
+        self.mode = mode
+        self.manifest = manifest
+        self.state = None
+        # Valores das variáveis de sessão antes da carga, restaurados no fim
+        self.previous_session = None
+
+    def __enter__(self):
+        if self.mode == "keep":
+            return self
+
+        self.previous_session = self.db.get_session("foreign_key_checks", "unique_checks")
+        self.db.set_session(foreign_key_checks=0, unique_checks=0)
+
+        self.state = self.manifest.deferred_indexes(self.table_name) if self.manifest else None
+        indexes = [index for index in self.db.secondary_indexes(self.table_name) if not index["unique"]]
+        foreign_keys = self.db.foreign_keys(self.table_name)
+        if self.state is None:
+            self.state = {"first_id": max_id(self.db, self.table_name), "indexes": [], "foreign_keys": foreign_keys}
+            if self.mode == "drop":
+                self.state["indexes"] = indexes
+            if self.manifest:
+                self.manifest.save_deferred_indexes(self.table_name, self.state)
+
+        if self.mode == "drop":
+            # Ao retomar, só existem os que foram recriados antes da interrupção
+            self.db.drop_indexes(self.table_name, indexes, foreign_keys)
+            print(f"{self.table_name}: {len(indexes)} indexes and {len(foreign_keys)} foreign keys dropped for the load")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.mode == "keep":
+            return
+
+        # A conexão (e as próximas deste Database) volta a verificar as chaves, mesmo se a carga falhou
+        try:
+            if self.mode == "drop":
+                self.rebuild()
+            if exc_type is None:
+                self.verify()
+            if self.manifest:
+                self.manifest.clear_deferred_indexes(self.table_name)
+        finally:
+            self.db.set_session(**self.previous_session)
+
+    def rebuild(self):
+        """Recria os índices e as chaves estrangeiras removidos, em um único comando quando o banco permite."""
+        indexes, foreign_keys = self.state["indexes"], self.state["foreign_keys"]
+        start = time.perf_counter()
+        self.db.add_indexes(self.table_name, indexes, foreign_keys)
+        seconds = time.perf_counter() - start
+
+        if metrics.enabled:
+            metrics.add_time("db.rebuild_indexes", seconds)
+        print(f"{self.table_name}: {len(indexes)} indexes and {len(foreign_keys)} foreign keys rebuilt in {seconds:.2f} seconds")
+
+    def verify(self):
+        """Conta, para cada chave estrangeira, as linhas novas sem a linha referenciada."""
+        start = time.perf_counter()
+        orphans = {
+            foreign_key["name"]: self.db.count_orphans(self.table_name, foreign_key, self.state["first_id"])
+            for foreign_key in self.state["foreign_keys"]
+        }
+        seconds = time.perf_counter() - start
+
+        if metrics.enabled:
+            metrics.add_time("db.verify_integrity", seconds)
+        broken = {name: count for name, count in orphans.items() if count}
+        if broken:
+            details = ", ".join(f"{name}: {count}" for name, count in broken.items())
+            raise ValueError(f"{self.table_name}: linhas sem a linha referenciada pela chave estrangeira ({details})")
+        print(f"{self.table_name}: referential integrity verified ({len(orphans)} foreign keys) in {seconds:.2f} seconds")
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+MANIFEST_VERSION = 1
+
+class RunManifest:
+    """Manifesto da execução, gravado em JSON a cada ponto de controle, para retomar uma execução interrompida.
+
+    Guarda as opções que definem os dados (semente mestre, clientes, janela, SHARD_SIZE), as marcas
+    d'água do início, os estágios concluídos e, por tabela, os shards já gravados e confirmados
+    com o maior ID depois do último deles. Como cada shard tem a sua semente, derivada da semente
+    mestre, esse é todo o estado dos sorteios: ao retomar, as linhas do shard interrompido são
+    apagadas (ID acima do último ponto de controle) e a geração continua do shard seguinte."""
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self.lock = threading.Lock()
+
+    @classmethod
+    def create(cls, path, options, watermarks):
+        """Começa o manifesto de uma execução nova."""
+        now = datetime.now().isoformat(timespec="seconds")
+        manifest = cls(path, {
+            "version": MANIFEST_VERSION,
+            "status": "running",
+            "created": now,
+            "updated": now,
+            "options": options,
+            "watermarks": dict(watermarks),
+            "stages": {},
+            "tables": {}
+        })
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, path):
+        """Lê o manifesto de uma execução anterior (None se o arquivo não existir)."""
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Versão do manifesto {path} não suportada: {data.get('version')}")
+        return cls(path, data)
+
+    @property
+    def options(self):
+        return self.data["options"]
+
+    @property
+    def watermarks(self):
+        return self.data["watermarks"]
+
+    @property
+    def finished(self):
+        return self.data["status"] == "done"
+
+    def save(self):
+        """Grava o manifesto em um arquivo temporário e o troca pelo atual, para nunca deixar um JSON pela metade."""
+        with self.lock:
+            self.data["updated"] = datetime.now().isoformat(timespec="seconds")
+            path = f"{self.path}.tmp"
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2, default=str)
+            os.replace(path, self.path)
+
+    def stage_done(self, stage_name):
+        return self.data["stages"].get(stage_name, {}).get("status") == "done"
+
+    def finish_stage(self, stage_name, result):
+        with self.lock:
+            self.data["stages"][stage_name] = {"status": "done", "result": result}
+        self.save()
+
+    def finish(self):
+        """Marca a execução como concluída: não há mais nada a retomar."""
+        with self.lock:
+            self.data["status"] = "done"
+        self.save()
+
+    def resume_table(self, db, table_name, shards):
+        """Prepara a gravação dos shards da tabela e retorna o índice do primeiro shard a gerar.
+
+        Na primeira vez registra o maior ID atual da tabela; ao retomar, apaga as linhas gravadas
+        depois do último shard confirmado."""
+        with self.lock:
+            entry = self.data["tables"].get(table_name)
+            if entry is None:
+                self.data["tables"][table_name] = {"shards": shards, "shards_done": 0, "rows": 0, "last_id": max_id(db, table_name)}
+
+        if entry is None:
+            self.save()
+            return 0
+
+        if entry["shards"] != shards:
+            raise ValueError(
+                f"A tabela {table_name} tinha {entry['shards']} shards no manifesto e agora tem {shards}: "
+                f"os dados de entrada ou o SHARD_SIZE mudaram desde a execução interrompida"
+            )
+
+        removed = db.delete(table_name, f"ID > {int(entry['last_id'])}")
+        if removed:
+            print(f"{table_name}: {removed} rows of an interrupted shard removed")
+        return entry["shards_done"]
+
+    def checkpoint(self, db, table_name, index, rows):
+        """Registra o shard index da tabela como gravado e confirmado, com rows linhas."""
+        last_id = max_id(db, table_name)
+        with self.lock:
+            entry = self.data["tables"][table_name]
+            entry["shards_done"] = index + 1
+            entry["rows"] += rows
+            entry["last_id"] = last_id
+        self.save()
+
+    def resume_graph(self, db, name, tables, shards, owner_keys=None):
+        """Como resume_table, para um estágio que grava várias tabelas em cada shard (tables, na ordem de gravação).
+
+        Guarda o maior ID de cada tabela depois do último shard confirmado; ao retomar, apaga as linhas
+        acima dele, das tabelas que referenciam para as referenciadas. Uma tabela sem ID entra em
+        owner_keys com (coluna, tabela dona): as suas linhas são apagadas pela coluna."""
+        owner_keys = owner_keys or {}
+        with self.lock:
+            entry = self.data["tables"].get(name)
+            if entry is None:
+                last_ids = {table_name: max_id(db, table_name) for table_name in tables if table_name not in owner_keys}
+                self.data["tables"][name] = {"shards": shards, "shards_done": 0, "last_ids": last_ids}
+
+        if entry is None:
+            self.save()
+            return 0
+
+        if entry["shards"] != shards:
+            raise ValueError(
+                f"O estágio {name} tinha {entry['shards']} shards no manifesto e agora tem {shards}: "
+                f"os dados de entrada ou o SHARD_SIZE mudaram desde a execução interrompida"
+            )
+
+        for table_name in reversed(tables):
+            column, owner = owner_keys.get(table_name, ("ID", table_name))
+            removed = db.delete(table_name, f"{column} > {int(entry['last_ids'][owner])}")
+            if removed:
+                print(f"{table_name}: {removed} rows of an interrupted shard removed")
+        return entry["shards_done"]
+
+    def checkpoint_graph(self, db, name, tables, index, owner_keys=None):
+        """Registra o shard index do estágio name como gravado e confirmado em todas as tabelas."""
+        owner_keys = owner_keys or {}
+        last_ids = {table_name: max_id(db, table_name) for table_name in tables if table_name not in owner_keys}
+        with self.lock:
+            entry = self.data["tables"][name]
+            entry["shards_done"] = index + 1
+            entry["last_ids"] = last_ids
+        self.save()
+
+    def deferred_indexes(self, table_name):
+        """Índices e chaves da tabela adiados por uma carga interrompida (None se não houver)."""
+        return self.data.get("deferred_indexes", {}).get(table_name)
+
+    def save_deferred_indexes(self, table_name, state):
+        """Guarda as definições removidas antes da carga da tabela, para recriá-las mesmo se a execução parar."""
+        with self.lock:
+            self.data.setdefault("deferred_indexes", {})[table_name] = state
+        self.save()
+
+    def clear_deferred_indexes(self, table_name):
+        with self.lock:
+            self.data.get("deferred_indexes", {}).pop(table_name, None)
+        self.save()
+
+def max_id(db, table_name):
+    """Maior ID da tabela (0 se vazia)."""
+    return db.search(table_name=table_name, columns=["COALESCE(MAX(ID), 0) AS ID"])[0]["ID"]
@@ -0,0 +1,98 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from config.probabilities import load_config
+from config.env import SHARD_SIZE
+from utils.rng import derive_seed
+from utils.metrics import metrics
+
+_worker = None
+
+def init_worker(config_path, method_name, shared_args, seed, instrument=False, window=None):
+    """Inicializa o processo: cria o gerador e guarda os argumentos comuns a todos os shards do estágio."""
+    global _worker
+    metrics.enabled = instrument
+    # Importado aqui para evitar import circular com service.generator
+    from service.generator import DataGenerator
+
+    # Com a mesma semente mestre, os pools de valores do Faker são os mesmos em todos os processos
+    config = load_config(config_path)
+    generator = DataGenerator(config.with_window(*window) if window else config, seed=seed)
+
+    _worker = (generator, method_name, shared_args)
+
+def generate_shard(task):
+    """Gera as linhas de um shard com a sua própria semente e as devolve como tuplas na ordem das colunas
+    (ou como os ColumnBuffers e EntityGraphs produzidos pelo método, que voltam ao processo principal sem conversão).
+
+    Com a instrumentação ligada, devolve também as métricas do shard, somadas depois no processo principal."""
+    shard_seed, items, columns = task
+    generator, method_name, shared_args = _worker
+
+    generator.fake_data.reseed(shard_seed)
+    metrics.reset()
+
+    rows = []
+    for row in getattr(generator, method_name)(items, *shared_args):
+        if isinstance(row, dict):
+            rows.append(tuple(row[col.lower()] for col in columns))
+        elif isinstance(row, (tuple, list)):
+            rows.append(tuple(row))
+        else:
+            rows.append(row)
+    return rows, metrics.snapshot() if metrics.enabled else None
+
+def split_shards(items, shard_size=SHARD_SIZE):
+    """Divide uma quantidade (int) ou uma lista em partes contíguas de até shard_size entidades.
+
+    O tamanho fixo (e não a quantidade de processos) define os shards, então as sementes de cada
+    shard não mudam com o paralelismo. Uma quantidade vira ranges de índices, para que cada shard
+    saiba a posição global das suas entidades."""
+    if isinstance(items, int):
+        items = range(items)
+
+    return [items[start:start + shard_size] for start in range(0, len(items), shard_size)]
+
+def shard_seeds(seed, method_name, shards):
+    """Semente de cada shard, derivada da semente mestre, do método do estágio e do índice do shard."""
+    return [derive_seed(seed, method_name, index) for index in range(len(shards))]
+
+class ShardedGenerator:
+    """Gera as linhas de um estágio em vários processos, dividindo as entidades em shards.
+
+    Cada shard usa uma semente derivada da semente mestre, do estágio e do índice do shard, e os
+    resultados voltam na ordem dos shards. Assim, a saída é a mesma para a mesma semente, com
+    qualquer quantidade de processos (inclusive a geração sequencial do DataGenerator)."""
+
+    def __init__(self, processes, seed, config_path=None, window=None):
+        self.processes = processes
+        self.seed = seed
+        self.config_path = config_path or load_config().path
+        self.window = window
+
+    def generate(self, method_name, columns, items, shared_args, start=0):
+        """Retorna um iterador com (índice, linhas) de cada shard a partir do shard start, mantendo no máximo dois shards por processo em memória."""
+        shards = split_shards(items)
+        tasks = list(zip(shard_seeds(self.seed, method_name, shards), shards, [columns] * len(shards)))[start:]
+        indexes = iter(range(start, len(shards)))
+
+        with ProcessPoolExecutor(
+            max_workers=self.processes,
+            initializer=init_worker,
+            initargs=(self.config_path, method_name, shared_args, self.seed, metrics.enabled, self.window)
+        ) as executor:
+            in_flight = deque()
+            tasks = iter(tasks)
+
+            for task in tasks:
+                in_flight.append(executor.submit(generate_shard, task))
+                if len(in_flight) >= self.processes * 2:
+                    break
+
+            while in_flight:
+                rows, shard_metrics = in_flight.popleft().result()
+                if shard_metrics:
+                    metrics.merge(shard_metrics)
+                next_task = next(tasks, None)
+                if next_task is not None:
+                    in_flight.append(executor.submit(generate_shard, next_task))
+                yield next(indexes), rows
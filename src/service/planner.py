@@ -0,0 +1,234 @@
+import json
+import os
+from config.env import SHARD_SIZE, WRITE_PREFETCH
+from utils.utils import ALLOWED_SERVICES_FOR_PETS
+
+# Quantidade de clientes de cada preset (--preset)
+PRESETS = {
+    "small": 1_000,
+    "medium": 50_000,
+    "xl": 1_000_000
+}
+
+# Tabelas geradas, na ordem dos estágios
+PLAN_TABLES = ["CUSTOMER", "ADDRESS", "PET", "CUSTOMER_ADDRESS", "CUSTOMER_ORDER", "ORDER_ITEM", "REQUEST"]
+ACTIVITY_TABLES = ["CUSTOMER_ORDER", "ORDER_ITEM", "REQUEST"]
+
+# Bytes aproximados por linha no InnoDB, com o cabeçalho da linha, as páginas não cheias e os índices secundários
+ROW_BYTES = {
+    "CUSTOMER": 100,
+    "ADDRESS": 140,
+    "PET": 105,
+    "CUSTOMER_ADDRESS": 60,
+    "CUSTOMER_ORDER": 95,
+    "ORDER_ITEM": 90,
+    "REQUEST": 125
+}
+
+# Bytes médios por linha no CSV do --export, sem compactação (medidos nos arquivos gerados)
+CSV_ROW_BYTES = {
+    "CUSTOMER": 57,
+    "ADDRESS": 62,
+    "PET": 33,
+    "CUSTOMER_ADDRESS": 9,
+    "CUSTOMER_ORDER": 36,
+    "ORDER_ITEM": 17,
+    "REQUEST": 57
+}
+
+# Memória do processo principal: base (interpretador, Faker e tabelas de referência) mais as linhas que
+# ficam no cache da execução ou nas listas dos estágios, por entidade (medido com o benchmark)
+BASE_MEMORY_MB = 40
+ENTITY_MEMORY_BYTES = {
+    "CUSTOMER": 800,
+    "PET": 300,
+    "CUSTOMER_ORDER": 610
+}
+# Com --graph nada fica no cache: só os shards em andamento, com todas as linhas de cada cliente
+GRAPH_CUSTOMER_MEMORY_BYTES = 6000
+
+# Fração da memória acima da qual o plano avisa antes de rodar
+MEMORY_WARNING_RATIO = 0.8
+
+def weighted_mean(table, value):
+    """Média de value(chave) com os pesos da tabela de probabilidades."""
+    return sum(weight * value(key) for key, weight in zip(table.keys, table.weights)) / sum(table.weights)
+
+def share(table, keys):
+    """Probabilidade de sortear uma das chaves informadas."""
+    return sum(weight for key, weight in zip(table.keys, table.weights) if key in keys) / sum(table.weights)
+
+def range_mean(values):
+    """Média de randint(min, max)."""
+    return (values[0] + values[1]) / 2
+
+def physical_memory_mb():
+    """Memória física da máquina, em MB (None se o sistema não informar)."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / (1024 * 1024)
+    except (AttributeError, ValueError, OSError):
+        return None
+
+def load_throughput(path):
+    """rows/s de cada tabela no resultado de um benchmark (benchmark.py), na maior escala medida.
+
+    Retorna (rows/s por tabela, descrição da medição), ou (None, None) se o arquivo não existir."""
+    if not path or not os.path.exists(path):
+        return None, None
+
+    with open(path, encoding="utf-8") as f:
+        results = json.load(f)
+    scale = max(results["scales"], key=lambda scale: scale["customers"])
+    throughput = {stage["table"]: stage["rows_per_second"] for stage in scale["stages"] if stage["rows_per_second"]}
+    source = f"{path} ({results.get('backend')}, {scale['customers']} customers, revision {results.get('revision')})"
+    return throughput, source
+
+class VolumePlan:
+    """Estimativa de uma execução antes de rodá-la: linhas, bytes e tempo de cada tabela e a memória.
+
+    As linhas esperadas saem das distribuições do config (médias ponderadas das tabelas de
+    probabilidades e dos intervalos), com a janela de atividades aplicada. Os bytes usam tamanhos
+    médios de linha e o tempo, o rows/s de um benchmark anterior. A memória é a do processo
+    principal, que guarda as chaves geradas no cache da execução (ou, com graph, os shards em andamento)."""
+
+    def __init__(self, config, num_customer, activity_only=False, throughput=None, throughput_source=None, graph=False):
+        self.config = config
+        self.num_customer = num_customer
+        self.activity_only = activity_only
+        self.graph = graph
+        self.throughput = throughput
+        self.throughput_source = throughput_source
+        self.rows = self.expected_rows()
+
+    def expected_rows(self):
+        """Linhas esperadas por tabela, seguindo os sorteios de cada gerador."""
+        config = self.config
+        customers = self.num_customer
+        pets = customers * weighted_mean(config.tables["quantity_pets_probabilities"], int)
+
+        # Quantidade média de pedidos e de solicitações por cliente (ou pet), entre ativos e inativos
+        def per_customer(activity_table, range_table):
+            return weighted_mean(config.tables[activity_table], lambda key: range_mean(config.ranges[range_table][key]))
+
+        orders = customers * per_customer("active_customer_order_probabilities", "range_of_orders_per_customer") * config.activity_scale
+
+        # Pedidos de estados sem loja têm de 1 a 3 itens; os demais seguem quantity_order_item_probabilities
+        item_ranges = config.tables["quantity_order_item_probabilities"]
+        items_with_store = weighted_mean(item_ranges, lambda key: range_mean(item_ranges.ranges[key]))
+        without_store = share(config.tables["state_probabilities"], {"other"})
+        items = orders * (without_store * 2 + (1 - without_store) * items_with_store)
+
+        # Só pedem serviços os pets de espécies com serviços permitidos (peixes não pedem)
+        species = config.tables["specie_probabilities"]
+        pets_with_services = pets * share(species, {str(specie_id) for specie_id in ALLOWED_SERVICES_FOR_PETS})
+        requests = pets_with_services * per_customer("active_customer_request_probabilities", "range_of_requests_per_customer") * config.activity_scale
+
+        rows = {
+            "CUSTOMER": customers,
+            "ADDRESS": customers,
+            "PET": pets,
+            "CUSTOMER_ADDRESS": customers,
+            "CUSTOMER_ORDER": orders,
+            "ORDER_ITEM": items,
+            "REQUEST": requests
+        }
+        tables = ACTIVITY_TABLES if self.activity_only else PLAN_TABLES
+        return {table_name: round(rows[table_name]) for table_name in tables}
+
+    def seconds(self, table_name):
+        rows_per_second = (self.throughput or {}).get(table_name)
+        return self.rows[table_name] / rows_per_second if rows_per_second else None
+
+    @property
+    def total_rows(self):
+        return sum(self.rows.values())
+
+    @property
+    def total_seconds(self):
+        seconds = [self.seconds(table_name) for table_name in self.rows]
+        return None if None in seconds else sum(seconds)
+
+    @property
+    def memory_mb(self):
+        """Pico estimado de memória do processo principal (no estágio dos itens, com os pedidos no cache e na lista do estágio).
+
+        Com --activity-only, clientes e pets são lidos do banco em vez de gerados, mas ocupam o mesmo espaço.
+        Com graph, são os shards gerados à frente da gravação, mais o que está sendo gerado e o que está sendo gravado."""
+        if self.graph:
+            customers_in_flight = min(self.num_customer, SHARD_SIZE * (WRITE_PREFETCH + 2))
+            return BASE_MEMORY_MB + customers_in_flight * GRAPH_CUSTOMER_MEMORY_BYTES / (1024 * 1024)
+
+        pets = self.num_customer * weighted_mean(self.config.tables["quantity_pets_probabilities"], int)
+        orders = self.rows["CUSTOMER_ORDER"]
+        entity_bytes = (
+            self.num_customer * ENTITY_MEMORY_BYTES["CUSTOMER"]
+            + pets * ENTITY_MEMORY_BYTES["PET"]
+            + orders * ENTITY_MEMORY_BYTES["CUSTOMER_ORDER"]
+        )
+        return BASE_MEMORY_MB + entity_bytes / (1024 * 1024)
+
+    def to_dict(self):
+        return {
+            "customers": self.num_customer,
+            "activity_only": self.activity_only,
+            "graph": self.graph,
+            "activity_scale": self.config.activity_scale,
+            "tables": [
+                {
+                    "table": table_name,
+                    "rows": rows,
+                    "bytes": rows * ROW_BYTES[table_name],
+                    "csv_bytes": rows * CSV_ROW_BYTES[table_name],
+                    "seconds": self.seconds(table_name)
+                }
+                for table_name, rows in self.rows.items()
+            ],
+            "total_rows": self.total_rows,
+            "total_bytes": sum(rows * ROW_BYTES[table_name] for table_name, rows in self.rows.items()),
+            "total_seconds": self.total_seconds,
+            "memory_mb": round(self.memory_mb, 1),
+            "throughput": self.throughput_source
+        }
+
+    def summary(self):
+        """Texto do plano: uma linha por tabela e os totais."""
+        plan = self.to_dict()
+        lines = [f"plan for {self.num_customer} customers (activity scale {self.config.activity_scale:.2f}):"]
+        for table in plan["tables"]:
+            seconds = f", ~{format_seconds(table['seconds'])}" if table["seconds"] is not None else ""
+            lines.append(f"  {table['table']}: {table['rows']:,} rows, ~{format_bytes(table['bytes'])} "
+                         f"(csv ~{format_bytes(table['csv_bytes'])}){seconds}")
+
+        total_seconds = f", ~{format_seconds(plan['total_seconds'])}" if plan["total_seconds"] is not None else ""
+        lines.append(f"  total: {plan['total_rows']:,} rows, ~{format_bytes(plan['total_bytes'])}{total_seconds}")
+        lines.append(f"  memory: ~{plan['memory_mb']:,.0f} MB")
+        lines.append(f"  throughput: {plan['throughput'] or 'no benchmark results, runtime not estimated'}")
+        return "\n".join(lines)
+
+    def check_memory(self, budget_mb, force=False):
+        """Recusa o plano acima do orçamento de memória (a não ser com force) e avisa perto dele."""
+        if not budget_mb:
+            return
+
+        memory_mb = self.memory_mb
+        if memory_mb > budget_mb:
+            message = f"A execução precisa de ~{memory_mb:,.0f} MB de memória, acima do orçamento de {budget_mb:,.0f} MB"
+            if not force:
+                raise ValueError(f"{message}: reduza os clientes ou a janela, ou use --force")
+            print(f"warning: ~{memory_mb:,.0f} MB needed, above the {budget_mb:,.0f} MB budget (--force)")
+        elif memory_mb > budget_mb * MEMORY_WARNING_RATIO:
+            print(f"warning: ~{memory_mb:,.0f} MB needed, {memory_mb / budget_mb:.0%} of the {budget_mb:,.0f} MB budget")
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+def format_seconds(seconds):
+    if seconds < 60:
+        return f"{seconds:.1f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
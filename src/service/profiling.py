@@ -0,0 +1,75 @@
+import cProfile
+import io
+import os
+import pstats
+
+try:
+    from pyinstrument import Profiler
+except ImportError:
+    Profiler = None
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+# Funções listadas por estágio no relatório
+TOP_FUNCTIONS = 15
+
+class StageProfiler:
+    """Perfila cada estágio separadamente, com cProfile ou pyinstrument (se instalado).
+
+    Os perfis ficam em directory, um arquivo por estágio. Só a thread do estágio é perfilada;
+    as linhas geradas nos processos do pool (--processes) não entram no perfil."""
+
+    def __init__(self, mode, directory):
+        if mode not in PROFILERS:
+            raise ValueError(f"Profiler inválido: {mode!r}. Use um de {', '.join(PROFILERS)}")
+        if mode == "pyinstrument" and Profiler is None:
+            raise ValueError("pyinstrument não está instalado (pip install pyinstrument)")
+
+        self.mode = mode
+        self.directory = directory
+        self.results = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def wrap(self, stage):
+        """Troca a função do estágio por uma que roda sob o profiler."""
+        func = stage.func
+
+        def run():
+            if self.mode == "cprofile":
+                return self.run_cprofile(stage.name, func)
+            return self.run_pyinstrument(stage.name, func)
+
+        stage.func = run
+        return stage
+
+    def run_cprofile(self, name, func):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func)
+        finally:
+            path = os.path.join(self.directory, f"{name}.prof")
+            profile.dump_stats(path)
+
+            stats = pstats.Stats(profile, stream=io.StringIO()).sort_stats("cumulative")
+            top = []
+            for (filename, line, function), (_, calls, own_time, cumulative_time, _) in stats.stats.items():
+                top.append({
+                    "function": f"{os.path.basename(filename)}:{line}({function})",
+                    "calls": calls,
+                    "own_seconds": round(own_time, 6),
+                    "cumulative_seconds": round(cumulative_time, 6)
+                })
+            top.sort(key=lambda entry: entry["own_seconds"], reverse=True)
+            self.results[name] = {"file": path, "top_functions": top[:TOP_FUNCTIONS]}
+
+    def run_pyinstrument(self, name, func):
+        profiler = Profiler()
+        profiler.start()
+        try:
+            return func()
+        finally:
+            profiler.stop()
+            path = os.path.join(self.directory, f"{name}.html")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+            self.results[name] = {"file": path, "summary": profiler.output_text(unicode=False, color=False)}
@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+from utils.metrics import metrics
+
+# Temporizadores listados no resumo, por tempo total
+SUMMARY_HOT_SPOTS = 10
+
+class RunReport:
+    """Relatório da execução: estágios, caminho crítico, métricas dos pontos quentes, config e perfis.
+
+    Substitui os prints soltos do main: gera um JSON estruturado e um resumo legível."""
+
+    def __init__(self, options, scheduler, config, profiler=None):
+        self.options = options
+        self.scheduler = scheduler
+        self.config = config
+        self.profiler = profiler
+
+    def to_dict(self):
+        config_stats = self.config.stats()
+        return {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "options": self.options,
+            "schedule": self.scheduler.summary(),
+            "metrics": {stage or "(no stage)": values for stage, values in metrics.per_stage().items()} if metrics.enabled else None,
+            "config": {
+                "load_seconds": round(config_stats["load_time"], 6),
+                "lookups": config_stats["total_calls"],
+                "calls": config_stats["calls"]
+            },
+            "profiles": self.profiler.results if self.profiler else None
+        }
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+
+    def summary(self):
+        """Texto do resumo legível."""
+        report = self.to_dict()
+        schedule = report["schedule"]
+        lines = [
+            f"wall clock: {schedule['wall_clock_seconds']:.2f} seconds (sum of stages: {schedule['sum_of_stages_seconds']:.2f} seconds)",
+            f"critical path: {' -> '.join(schedule['critical_path'])} ({schedule['critical_path_seconds']:.2f} seconds)"
+        ]
+        for stage in schedule["stages"]:
+            lines.append(f"  {stage['name']}: {stage['start']:.2f}s -> {stage['end']:.2f}s")
+
+        if report["metrics"]:
+            hot_spots = [
+                (values["seconds"], stage, name, values["calls"])
+                for stage, stage_metrics in report["metrics"].items()
+                for name, values in stage_metrics["timers"].items()
+            ]
+            lines.append("hot spots:")
+            for seconds, stage, name, calls in sorted(hot_spots, reverse=True)[:SUMMARY_HOT_SPOTS]:
+                lines.append(f"  {stage} {name}: {seconds:.2f} seconds ({calls} calls)")
+
+        if report["profiles"]:
+            lines.append("profiles:")
+            for stage, profile in report["profiles"].items():
+                lines.append(f"  {stage}: {profile['file']}")
+                for entry in profile.get("top_functions", [])[:3]:
+                    lines.append(f"    {entry['function']}: {entry['own_seconds']:.2f} seconds ({entry['calls']} calls)")
+
+        lines.append(f"config: loaded in {report['config']['load_seconds'] * 1000:.2f} ms, {report['config']['lookups']} lookups")
+        return "\n".join(lines)
@@ -0,0 +1,134 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class Stage:
+    """Estágio do pipeline: uma função e as tabelas que ela lê (inputs) e grava (outputs)."""
+
+    def __init__(self, name, func, inputs=(), outputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = set(inputs)
+        self.outputs = set(outputs)
+        self.dependencies = set()
+        self.result = None
+        self.start = None
+        self.end = None
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+class StageScheduler:
+    """Executa os estágios respeitando o grafo de dependências entre tabelas.
+
+    Um estágio depende de todo estágio que grava uma tabela que ele lê. Estágios independentes
+    rodam ao mesmo tempo, até max_workers, cada um com a sua própria conexão."""
+
+    def __init__(self, stages, max_workers=1):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.start = None
+        self.end = None
+
+        producers = {}
+        for stage in stages:
+            for table in stage.outputs:
+                producers.setdefault(table, []).append(stage.name)
+
+        for stage in stages:
+            for table in stage.inputs:
+                stage.dependencies.update(name for name in producers.get(table, []) if name != stage.name)
+
+        self.check_cycles()
+
+    def check_cycles(self):
+        """Garante que o grafo de dependências não tem ciclos."""
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f"Dependência circular envolvendo o estágio '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].dependencies:
+                visit(dependency)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def run_stage(self, stage):
+        stage.start = time.time()
+        try:
+            stage.result = stage.func()
+        finally:
+            stage.end = time.time()
+        return stage
+
+    def run(self):
+        """Executa todos os estágios, imprimindo o tempo de cada um ao terminar."""
+        self.start = time.time()
+        done = set()
+        pending = list(self.stages.values())
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # Dispara, na ordem declarada, os estágios cujas dependências já terminaram
+                for stage in list(pending):
+                    if len(running) >= self.max_workers:
+                        break
+                    if stage.dependencies <= done:
+                        pending.remove(stage)
+                        running[executor.submit(self.run_stage, stage)] = stage
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    # Repassa a exceção do estágio; os que já estão rodando terminam antes de sair
+                    future.result()
+                    done.add(stage.name)
+                    label = f" [{stage.result}]" if stage.result else ""
+                    print(f"{stage.name}{label}: {stage.duration:.2f} seconds")
+
+        self.end = time.time()
+
+    def critical_path(self):
+        """Retorna a cadeia de estágios dependentes com a maior soma de tempos e essa soma."""
+        best = {}
+
+        def longest(name):
+            if name not in best:
+                stage = self.stages[name]
+                chain, total = [], 0.0
+                for dependency in stage.dependencies:
+                    dependency_chain, dependency_total = longest(dependency)
+                    if dependency_total > total:
+                        chain, total = dependency_chain, dependency_total
+                best[name] = (chain + [name], total + stage.duration)
+            return best[name]
+
+        return max((longest(name) for name in self.stages), key=lambda path: path[1])
+
+    def summary(self):
+        """Tempo total, soma dos estágios, caminho crítico e o intervalo de cada estágio, em segundos."""
+        chain, critical_time = self.critical_path()
+
+        return {
+            "wall_clock_seconds": round(self.end - self.start, 4),
+            "sum_of_stages_seconds": round(sum(stage.duration for stage in self.stages.values()), 4),
+            "critical_path": chain,
+            "critical_path_seconds": round(critical_time, 4),
+            "stages": [
+                {
+                    "name": stage.name,
+                    "result": stage.result,
+                    "start": round(stage.start - self.start, 4),
+                    "end": round(stage.end - self.start, 4),
+                    "seconds": round(stage.duration, 4)
+                }
+                for stage in sorted(self.stages.values(), key=lambda stage: stage.start)
+            ]
+        }
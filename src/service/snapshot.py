@@ -0,0 +1,224 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+from service.generator import GRAPH_TABLES, GRAPH_OWNER_KEYS
+from service.file_database import REFERENCE_COLUMNS, REFERENCE_WHERE
+from service.database import format_load_value
+from service.load_indexes import DeferredIndexes
+from service.manifest import max_id
+from config.env import SHARD_SIZE, FAKER_POOL_SIZE, SAMPLING_BACKEND, BULK_LOAD_BATCH_SIZE, LOAD_INDEXES
+from utils.row_buffer import ColumnBuffer
+from utils.utils import chunked
+
+try:
+    from faker import VERSION as FAKER_VERSION
+except ImportError:
+    FAKER_VERSION = None
+
+# Muda quando o formato dos arquivos do snapshot muda (snapshots antigos deixam de ser encontrados)
+SNAPSHOT_VERSION = 1
+
+# Tabelas do snapshot, na ordem de carga (das referenciadas para as que referenciam)
+SNAPSHOT_TABLES = list(GRAPH_TABLES)
+# Tabelas de fatos: a carga adia os índices como na geração (LOAD_INDEXES)
+SNAPSHOT_FACT_TABLES = ["CUSTOMER_ORDER", "ORDER_ITEM", "REQUEST"]
+
+# Diretórios do código que gera os dados: uma mudança neles muda a impressão digital
+SOURCE_DIRS = ["config", "lib", "service", "utils"]
+
+SNAPSHOT_FILE = "snapshot.json"
+# Nível do gzip: o 9 (padrão do gzip.open) leva três vezes mais tempo para arquivos menos de 1% menores
+COMPRESS_LEVEL = 6
+
+def table_columns(table_name):
+    """Colunas gravadas no snapshot: o ID (se a tabela tiver) e as colunas geradas."""
+    columns = GRAPH_TABLES[table_name][0]
+    return list(columns) if table_name in GRAPH_OWNER_KEYS else ["ID"] + list(columns)
+
+def table_where(table_name, base_ids):
+    """Filtro das linhas geradas pela execução: acima do maior ID (da tabela dona, sem ID) anterior a ela."""
+    column, owner = GRAPH_OWNER_KEYS.get(table_name, ("ID", table_name))
+    return f"{column} > {int(base_ids[owner])}"
+
+def base_ids(db):
+    """Maior ID de cada tabela do snapshot com ID: o estado do banco sobre o qual os dados são gerados."""
+    return {table_name: int(max_id(db, table_name)) for table_name in SNAPSHOT_TABLES if table_name not in GRAPH_OWNER_KEYS}
+
+def reference_digest(db):
+    """Hash das tabelas de referência, nas colunas usadas pela geração."""
+    digest = hashlib.sha256()
+    for table_name, columns in REFERENCE_COLUMNS.items():
+        rows = db.search(table_name=table_name, columns=columns, where=REFERENCE_WHERE.get(table_name), order_by="1",
+                         row_format="tuple", stream=True)
+        digest.update(table_name.encode())
+        for row in rows:
+            digest.update(repr(tuple(map(str, row))).encode())
+    return digest.hexdigest()
+
+def source_digest():
+    """Hash do código que gera os dados."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    digest = hashlib.sha256()
+    paths = sorted(path for directory in SOURCE_DIRS for path in glob.glob(os.path.join(root, directory, "*.py")))
+    for path in paths:
+        digest.update(os.path.relpath(path, root).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def file_digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def fingerprint_inputs(db, config, options):
+    """Tudo o que define os dados gerados: opções da execução, config, ambiente, código, referência e estado do banco."""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "options": options,
+        "config": file_digest(config.path),
+        "shard_size": SHARD_SIZE,
+        "faker_pool_size": FAKER_POOL_SIZE,
+        "sampling_backend": SAMPLING_BACKEND,
+        "faker": FAKER_VERSION,
+        "source": source_digest(),
+        "reference": reference_digest(db),
+        "base_ids": base_ids(db)
+    }
+
+def fingerprint(inputs):
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode()).hexdigest()
+
+# Sequências de escape do formato do LOAD DATA (format_load_value)
+LOAD_ESCAPES = {"t": "\t", "n": "\n", "\\": "\\"}
+LOAD_ESCAPE = re.compile(r"\\(.)")
+
+def parse_load_value(text):
+    """Desfaz format_load_value."""
+    if text == "\\N":
+        return None
+    if "\\" not in text:
+        return text
+    return LOAD_ESCAPE.sub(lambda match: LOAD_ESCAPES.get(match.group(1), match.group(1)), text)
+
+def read_buffers(path, columns, size):
+    """Lê um arquivo do snapshot em ColumnBuffers de até size linhas."""
+    with gzip.open(path, "rt", encoding="utf-8", newline="\n") as f:
+        # Só as linhas com uma barra (nulo ou caractere escapado) precisam ser lidas valor a valor
+        rows = (
+            [parse_load_value(value) for value in line[:-1].split("\t")] if "\\" in line else line[:-1].split("\t")
+            for line in f
+        )
+        for chunk in chunked(rows, size):
+            yield ColumnBuffer.from_rows(columns, chunk)
+
+class SnapshotCache:
+    """Cache local de snapshots dos dados gerados, endereçados pela impressão digital da execução.
+
+    A impressão digital é o hash de tudo o que define os dados: semente, clientes, janela e modo,
+    o arquivo de config, SHARD_SIZE e os pools do Faker, o código de geração, as tabelas de
+    referência e o maior ID de cada tabela gerada antes da execução. Um snapshot é um diretório
+    com um arquivo por tabela (as linhas geradas, com os IDs, no formato do LOAD DATA e compactadas
+    com gzip) e o snapshot.json, gravado por último, então um diretório sem ele está incompleto.
+
+    Restaurar carrega os arquivos pelo LOAD DATA (ou pelo INSERT com várias linhas, se o servidor
+    recusar), em vez de gerar os dados de novo. O cache guarda no máximo max_bytes; acima disso,
+    os snapshots usados há mais tempo são removidos."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def find(self, key):
+        """Metadados do snapshot (None se não estiver no cache)."""
+        path = os.path.join(self.path(key), SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, db, key, inputs):
+        """Grava as linhas geradas acima de inputs["base_ids"] como o snapshot key e aplica o limite do cache."""
+        start = time.perf_counter()
+        temporary = f"{self.path(key)}.tmp"
+        shutil.rmtree(temporary, ignore_errors=True)
+        os.makedirs(temporary)
+
+        tables = {}
+        for table_name in SNAPSHOT_TABLES:
+            columns = table_columns(table_name)
+            order_by = "ID" if "ID" in columns else ", ".join(columns)
+            rows = db.search(table_name=table_name, columns=columns, where=table_where(table_name, inputs["base_ids"]),
+                             order_by=order_by, row_format="tuple", stream=True)
+            total = 0
+            with gzip.open(os.path.join(temporary, f"{table_name}.tsv.gz"), "wt", compresslevel=COMPRESS_LEVEL,
+                           encoding="utf-8", newline="\n") as f:
+                for chunk in chunked(rows, BULK_LOAD_BATCH_SIZE):
+                    f.writelines(f"{line}\n" for line in ("\t".join(map(format_load_value, row)) for row in chunk))
+                    total += len(chunk)
+            tables[table_name] = {"columns": columns, "rows": total}
+
+        with open(os.path.join(temporary, SNAPSHOT_FILE), "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": key,
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "inputs": inputs,
+                "tables": tables
+            }, f, indent=2, default=str)
+
+        shutil.rmtree(self.path(key), ignore_errors=True)
+        os.replace(temporary, self.path(key))
+        size = directory_size(self.path(key))
+        print(f"snapshot {key[:16]} saved: {sum(table['rows'] for table in tables.values())} rows, "
+              f"{size / (1024 * 1024):.1f} MB in {time.perf_counter() - start:.2f} seconds")
+        self.evict()
+
+    def restore(self, db, key):
+        """Carrega o snapshot key no banco, tabela a tabela. Se a carga falhar, as linhas carregadas são apagadas."""
+        snapshot = self.find(key)
+        start = time.perf_counter()
+        base = snapshot["inputs"]["base_ids"]
+        totals = {}
+        try:
+            for table_name in SNAPSHOT_TABLES:
+                table = snapshot["tables"][table_name]
+                path = os.path.join(self.path(key), f"{table_name}.tsv.gz")
+                mode = LOAD_INDEXES if table_name in SNAPSHOT_FACT_TABLES else "keep"
+                with DeferredIndexes(db, table_name, mode):
+                    totals[table_name] = db.load(table_name, table["columns"], read_buffers(path, table["columns"], BULK_LOAD_BATCH_SIZE))
+        except Exception:
+            for table_name in reversed(SNAPSHOT_TABLES):
+                db.delete(table_name, table_where(table_name, base))
+            raise
+
+        # A data de modificação do snapshot.json marca o último uso, para a remoção dos mais antigos
+        os.utime(os.path.join(self.path(key), SNAPSHOT_FILE))
+        print(f"snapshot {key[:16]} restored ({db.load_mode}): {sum(totals.values())} rows in {time.perf_counter() - start:.2f} seconds")
+        return totals
+
+    def evict(self):
+        """Remove os snapshots usados há mais tempo até o cache caber em max_bytes."""
+        snapshots = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name, SNAPSHOT_FILE)
+            if os.path.exists(path):
+                snapshots.append((os.path.getmtime(path), name, directory_size(self.path(name))))
+
+        total = sum(size for _, _, size in snapshots)
+        for _, name, size in sorted(snapshots):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self.path(name), ignore_errors=True)
+            total -= size
+            print(f"snapshot {name[:16]} evicted ({size / (1024 * 1024):.1f} MB)")
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
@@ -0,0 +1,287 @@
+import sqlite3
+import uuid
+from datetime import datetime
+from service.database import Database
+from utils.metrics import metrics
+
+sqlite3.register_converter("DATETIME", lambda value: datetime.fromisoformat(value.decode()))
+
+# Esquema mínimo das tabelas usadas pela geração, no lugar do MySQL (com as chaves estrangeiras e os
+# índices das tabelas de fatos; o SQLite só aplica as chaves com PRAGMA foreign_keys)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS STATE (ID INTEGER PRIMARY KEY, NAME TEXT);
+CREATE TABLE IF NOT EXISTS CITY (ID INTEGER PRIMARY KEY, NAME TEXT, STATE_ID INTEGER);
+CREATE TABLE IF NOT EXISTS ADDRESS (ID INTEGER PRIMARY KEY, POSTAL_CODE TEXT, STREET TEXT, NUMBER TEXT, COMPLEMENT TEXT,
+                                    NEIGHBORHOOD TEXT, CITY_ID INTEGER, ADDRESS_TYPE_ID INTEGER);
+CREATE TABLE IF NOT EXISTS STORE (ID INTEGER PRIMARY KEY, NAME TEXT, ADDRESS_ID INTEGER);
+CREATE TABLE IF NOT EXISTS PRODUCT (ID INTEGER PRIMARY KEY, NAME TEXT, DESCRIPTION TEXT, SKU TEXT, STORE_ID INTEGER);
+CREATE TABLE IF NOT EXISTS SPECIE (ID INTEGER PRIMARY KEY, NAME TEXT);
+CREATE TABLE IF NOT EXISTS BREED (ID INTEGER PRIMARY KEY, NAME TEXT, SPECIE_ID INTEGER);
+CREATE TABLE IF NOT EXISTS SIZE (ID INTEGER PRIMARY KEY, NAME TEXT);
+CREATE TABLE IF NOT EXISTS SERVICE (ID INTEGER PRIMARY KEY, NAME TEXT);
+CREATE TABLE IF NOT EXISTS STORE_SERVICE (STORE_ID INTEGER, SERVICE_ID INTEGER);
+CREATE TABLE IF NOT EXISTS CUSTOMER (ID INTEGER PRIMARY KEY, NAME TEXT, EMAIL TEXT, PHONE TEXT);
+CREATE TABLE IF NOT EXISTS CUSTOMER_ADDRESS (CUSTOMER_ID INTEGER, ADDRESS_ID INTEGER);
+CREATE TABLE IF NOT EXISTS PET (ID INTEGER PRIMARY KEY, NAME TEXT, DATE_BIRTH TEXT, BREED_ID INTEGER, SIZE_ID INTEGER,
+                                CUSTOMER_ID INTEGER);
+CREATE TABLE IF NOT EXISTS CUSTOMER_ORDER (ID INTEGER PRIMARY KEY, CUSTOMER_ID INTEGER REFERENCES CUSTOMER (ID),
+                                           ORDER_DATE DATETIME, STATUS_ID INTEGER, ADDRESS_ID INTEGER REFERENCES ADDRESS (ID));
+CREATE TABLE IF NOT EXISTS ORDER_ITEM (ID INTEGER PRIMARY KEY, ORDER_ID INTEGER REFERENCES CUSTOMER_ORDER (ID),
+                                       PRODUCT_ID INTEGER REFERENCES PRODUCT (ID), QUANTITY INTEGER);
+CREATE TABLE IF NOT EXISTS REQUEST (ID INTEGER PRIMARY KEY, SERVICE_ID INTEGER REFERENCES SERVICE (ID),
+                                    PET_ID INTEGER REFERENCES PET (ID), REQUEST_DATE DATETIME, STATUS_ID INTEGER,
+                                    SERVICE_DATE DATETIME, ADDRESS_ID INTEGER REFERENCES ADDRESS (ID));
+CREATE INDEX IF NOT EXISTS FK_CUSTOMER_ORDER_CUSTOMER ON CUSTOMER_ORDER (CUSTOMER_ID);
+CREATE INDEX IF NOT EXISTS FK_CUSTOMER_ORDER_ADDRESS ON CUSTOMER_ORDER (ADDRESS_ID);
+CREATE INDEX IF NOT EXISTS FK_ORDER_ITEM_ORDER ON ORDER_ITEM (ORDER_ID);
+CREATE INDEX IF NOT EXISTS FK_ORDER_ITEM_PRODUCT ON ORDER_ITEM (PRODUCT_ID);
+CREATE INDEX IF NOT EXISTS FK_REQUEST_SERVICE ON REQUEST (SERVICE_ID);
+CREATE INDEX IF NOT EXISTS FK_REQUEST_PET ON REQUEST (PET_ID);
+CREATE INDEX IF NOT EXISTS FK_REQUEST_ADDRESS ON REQUEST (ADDRESS_ID);
+"""
+
+STATES = [
+    "AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+    "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"
+]
+CITIES_PER_STATE = 4
+SPECIES = ["Cachorro", "Gato", "Peixe", "Passaro", "Hamster", "Coelho"]
+BREEDS_PER_SPECIE = 5
+SIZES = ["Pequeno", "Médio", "Grande"]
+# O serviço 4 é a consulta veterinária, o único permitido para pássaros, hamsters e coelhos
+SERVICES = ["Banho", "Tosa", "Hospedagem", "Consulta veterinária", "Adestramento"]
+PRODUCT_TYPES = ["RACAO", "CAMA", "BRINQUEDO", "ROUPA", "GARRAFA AGUA", "MANTA", "COLEIRA", "REPELENTE"]
+
+def seed_reference_data(conn, config):
+    """Preenche as tabelas de referência com dados sintéticos coerentes com as probabilidades do config.
+
+    Os estados com loja são as chaves de state_probabilities e as cidades de city_probabilities
+    ficam no estado 25, como no banco real."""
+    cursor = conn.cursor()
+
+    special_cities = [int(city_id) for city_id in config.get("city_probabilities")]
+    store_states = {int(state_id) for state_id in config.get("state_probabilities") if state_id != "other"}
+
+    cities_per_state = {}
+    for city_id in special_cities:
+        cities_per_state.setdefault(25, []).append(city_id)
+
+    next_city_id = 1
+    for state_id, name in enumerate(STATES, 1):
+        cursor.execute("INSERT INTO STATE (ID, NAME) VALUES (?, ?)", (state_id, name))
+        while len(cities_per_state.setdefault(state_id, [])) < CITIES_PER_STATE:
+            if next_city_id not in special_cities:
+                cities_per_state[state_id].append(next_city_id)
+            next_city_id += 1
+
+        for city_id in cities_per_state[state_id]:
+            cursor.execute("INSERT INTO CITY (ID, NAME, STATE_ID) VALUES (?, ?, ?)", (city_id, f"Cidade {city_id}", state_id))
+
+    # Uma loja por cidade dos estados com loja, com todos os produtos e serviços
+    store_id = 0
+    for state_id in sorted(store_states):
+        for city_id in cities_per_state.get(state_id, []):
+            store_id += 1
+            cursor.execute(
+                "INSERT INTO ADDRESS (POSTAL_CODE, STREET, NUMBER, COMPLEMENT, NEIGHBORHOOD, CITY_ID, ADDRESS_TYPE_ID) "
+                "VALUES (?, ?, ?, NULL, ?, ?, 2)",
+                ("01000000", f"Rua da Loja {store_id}", str(store_id), "Centro", city_id)
+            )
+            cursor.execute("INSERT INTO STORE (ID, NAME, ADDRESS_ID) VALUES (?, ?, ?)", (store_id, f"Loja {store_id}", cursor.lastrowid))
+
+            for specie in SPECIES:
+                for product_type in PRODUCT_TYPES:
+                    name = f"{product_type} {specie.upper()}"
+                    cursor.execute(
+                        "INSERT INTO PRODUCT (NAME, DESCRIPTION, SKU, STORE_ID) VALUES (?, ?, ?, ?)",
+                        (name, f"{name} PARA PETS", f"{product_type[:3]}-{specie[:3].upper()}-{store_id}", store_id)
+                    )
+
+    for specie_id, specie in enumerate(SPECIES, 1):
+        cursor.execute("INSERT INTO SPECIE (ID, NAME) VALUES (?, ?)", (specie_id, specie))
+        for breed in range(BREEDS_PER_SPECIE):
+            cursor.execute("INSERT INTO BREED (NAME, SPECIE_ID) VALUES (?, ?)", (f"{specie} {breed + 1}", specie_id))
+
+    cursor.executemany("INSERT INTO SIZE (ID, NAME) VALUES (?, ?)", list(enumerate(SIZES, 1)))
+    cursor.executemany("INSERT INTO SERVICE (ID, NAME) VALUES (?, ?)", list(enumerate(SERVICES, 1)))
+    cursor.executemany(
+        "INSERT INTO STORE_SERVICE (STORE_ID, SERVICE_ID) VALUES (?, ?)",
+        [(store, service) for store in range(1, store_id + 1) for service in range(1, len(SERVICES) + 1)]
+    )
+
+    conn.commit()
+    cursor.close()
+
+class SQLiteCursor:
+    """Cursor do sqlite3 com a interface usada do cursor do mysql.connector (placeholders %s, dictionary)."""
+
+    def __init__(self, cursor, dictionary=False):
+        self.cursor = cursor
+        self.dictionary = dictionary
+        self.lastrowid = None
+        self.rowcount = -1
+
+    def execute(self, query, params=()):
+        self.cursor.execute(query.replace("%s", "?"), tuple(params))
+        self.rowcount = self.cursor.rowcount
+        self.lastrowid = self.cursor.lastrowid
+
+        # Em um INSERT com várias linhas o sqlite devolve o ID da última; o MySQL devolve o da primeira
+        if self.rowcount > 1 and query.lstrip().upper().startswith("INSERT"):
+            self.lastrowid = self.lastrowid - self.rowcount + 1
+
+    def executemany(self, query, rows):
+        self.cursor.executemany(query.replace("%s", "?"), rows)
+        self.rowcount = self.cursor.rowcount
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    def to_rows(self, rows):
+        if not self.dictionary:
+            return rows
+        columns = [description[0] for description in self.cursor.description]
+        return [dict(zip(columns, row)) for row in rows]
+
+    def fetchall(self):
+        return self.to_rows(self.cursor.fetchall())
+
+    def fetchmany(self, size=1):
+        return self.to_rows(self.cursor.fetchmany(size))
+
+    def close(self):
+        self.cursor.close()
+
+class SQLiteConnection:
+    """Conexão do sqlite3 com a interface usada da conexão do mysql.connector."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self, dictionary=False, prepared=False):
+        return SQLiteCursor(self.conn.cursor(), dictionary)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
+
+class SQLiteDatabase(Database):
+    """Database sobre SQLite (arquivo ou memória), para rodar e medir a geração sem um MySQL.
+
+    Com path=None o banco fica em memória, compartilhado entre as conexões do processo enquanto
+    keep_alive() mantiver uma conexão aberta. Não há LOAD DATA: load() sempre usa insert()."""
+
+    def __init__(self, path=None, batch_size=None):
+        super().__init__(batch_size=batch_size, bulk_load=False, pooled=False, autocommit=False, disable_checks=False)
+        if path is None:
+            path = f"file:petshop_{uuid.uuid4().hex}?mode=memory&cache=shared"
+        self.path = path
+
+    def connect(self):
+        return sqlite3.connect(self.path, uri=self.path.startswith("file:"), detect_types=sqlite3.PARSE_DECLTYPES,
+                               check_same_thread=False)
+
+    def keep_alive(self):
+        """Abre uma conexão avulsa que mantém vivo o banco em memória (feche-a ao final)."""
+        return self.connect()
+
+    def create_schema(self, config):
+        """Cria as tabelas e preenche as de referência."""
+        conn = self.connect()
+        try:
+            conn.executescript(SCHEMA)
+            seed_reference_data(conn, config)
+        finally:
+            conn.close()
+
+    def open_conn(self):
+        """Abre a conexão com o SQLite."""
+        if self.conn is None:
+            self.conn = SQLiteConnection(self.connect())
+        else:
+            print("Conexão já está aberta.")
+
+    def apply_session(self):
+        """O SQLite não tem variáveis de sessão."""
+
+    def get_session(self, *names):
+        """Valores guardados em session (1, o padrão do MySQL, se não houver), já que o SQLite não tem variáveis de sessão."""
+        return {name: self.session.get(name, 1) for name in names}
+
+    def get_auto_increment_step(self):
+        """No SQLite os IDs são sempre consecutivos."""
+        return 1
+
+    def move_auto_increment(self, table_name, next_id):
+        """Sem ALTER TABLE ... AUTO_INCREMENT: um INTEGER PRIMARY KEY continua do maior ID, então o bloco já fica livre."""
+
+    def drop_temporary_table(self, name):
+        """O SQLite não tem DROP TEMPORARY TABLE: as tabelas temporárias ficam no esquema temp."""
+        cursor = self.conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS temp.{name}")
+        cursor.close()
+
+    def secondary_indexes(self, table_name):
+        """Índices criados com CREATE INDEX (os das restrições UNIQUE e da chave primária ficam de fora)."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SELECT name, \"unique\" FROM pragma_index_list(%s) WHERE origin = 'c' ORDER BY name", (table_name,))
+            indexes = [{"name": name, "columns": [], "unique": bool(unique), "type": "BTREE"} for name, unique in cursor.fetchall()]
+            for index in indexes:
+                cursor.execute("SELECT name FROM pragma_index_info(%s) ORDER BY seqno", (index["name"],))
+                index["columns"] = [column for column, in cursor.fetchall()]
+        finally:
+            cursor.close()
+        return indexes
+
+    def foreign_keys(self, table_name):
+        """Chaves estrangeiras declaradas no esquema (sem nome no SQLite, então numeradas por tabela)."""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute('SELECT id, "table", "from", "to", on_delete, on_update FROM pragma_foreign_key_list(%s) ORDER BY id, seq',
+                           (table_name,))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        foreign_keys = {}
+        for key_id, referenced_table, column, referenced_column, on_delete, on_update in rows:
+            foreign_key = foreign_keys.setdefault(key_id, {
+                "name": f"FK_{table_name}_{key_id}",
+                "columns": [],
+                "referenced_table": referenced_table,
+                "referenced_columns": [],
+                "on_delete": on_delete,
+                "on_update": on_update
+            })
+            foreign_key["columns"].append(column)
+            foreign_key["referenced_columns"].append(referenced_column)
+        return list(foreign_keys.values())
+
+    def drop_indexes(self, table_name, indexes, foreign_keys):
+        """Remove os índices; as chaves estrangeiras ficam no esquema (o SQLite não as remove sem recriar a tabela e não as aplica aqui)."""
+        cursor = self.conn.cursor()
+        try:
+            for index in indexes:
+                cursor.execute(f"DROP INDEX IF EXISTS {index['name']}")
+            self.conn.commit()
+        finally:
+            cursor.close()
+
+    def add_indexes(self, table_name, indexes, foreign_keys):
+        """Recria os índices, um CREATE INDEX por índice (o SQLite não tem ALTER TABLE ... ADD INDEX)."""
+        cursor = self.conn.cursor()
+        try:
+            for index in indexes:
+                with metrics.timer("db.alter_table"):
+                    cursor.execute(f"CREATE {'UNIQUE ' if index['unique'] else ''}INDEX IF NOT EXISTS {index['name']} "
+                                   f"ON {table_name} ({', '.join(index['columns'])})")
+            self.conn.commit()
+        finally:
+            cursor.close()
@@ -0,0 +1,146 @@
+import random
+from array import array
+from utils.utils import classify_product, get_allowed_services
+from utils.metrics import metrics
+
+TEMPERATURE_CATEGORIES = ("cold_product", "warm_product")
+
+@metrics.timed("index.classify_product_per_temperature")
+def classify_product_per_temperature(products, temperature):
+    categories = {
+        "cold_product": [
+            "CAMA",
+            "FRIO",
+            "ROUPA",
+            "MANTA",
+            "CAMISETA"
+        ],
+        "warm_product": [
+            "BRINQUEDO",
+            "AGUA",
+            "GARRAFA",
+            "REPELENTE"
+        ]
+    }
+    
+    list_products = []
+    categories_per_temperature = categories[temperature.lower()]
+
+    for product in products:
+        for keyword in categories_per_temperature:
+            if keyword in product['name'] or keyword in product['description']:
+                list_products.append(product['ID'])
+                break
+    
+    return list_products
+
+class ProductIndex:
+    """Índice dos produtos por (loja, espécie, categoria de temperatura), montado uma única vez por execução.
+
+    Substitui a classificação dos produtos da loja a cada pedido: escolher um produto passa a ser
+    uma busca em dicionário mais um índice aleatório."""
+
+    @metrics.timed("index.products")
+    def __init__(self, products):
+        self.products_by_store = {}
+        self.index = {}
+        self.customer_products = {}
+
+        classified_products = classify_product(products)
+        store_per_product = {product["ID"]: product["STORE_ID"] for product in products}
+        ids_per_temperature = {
+            temperature: set(classify_product_per_temperature(classified_products, temperature))
+            for temperature in TEMPERATURE_CATEGORIES
+        }
+
+        for product in classified_products:
+            product_id = product["ID"]
+            store_id = store_per_product[product_id]
+            specie = product["classification"].lower()
+
+            self.products_by_store.setdefault(store_id, []).append(product_id)
+            self.index.setdefault((store_id, specie, None), []).append(product_id)
+
+            for temperature, product_ids in ids_per_temperature.items():
+                if product_id in product_ids:
+                    self.index.setdefault((store_id, specie, temperature), []).append(product_id)
+
+    def get_products(self, store_id, species, temperature=None):
+        """Retorna os IDs dos produtos da loja para as espécies informadas e, opcionalmente, a categoria de temperatura."""
+        key = (store_id, species, temperature)
+        products = self.customer_products.get(key)
+
+        if products is None:
+            # Cada produto tem uma única espécie, então as listas por espécie não se repetem
+            products = []
+            for specie in species:
+                products.extend(self.index.get((store_id, specie, temperature), []))
+            self.customer_products[key] = products
+
+        return products
+
+    def select_product_id(self, store_id, species_of_customer, product_type, rng=None):
+        """Seleciona um ID de produto com base nas espécies do cliente, no tipo de produto e na disponibilidade da loja."""
+        rng = rng or random
+        species = tuple(sorted(set(specie.lower() for specie in species_of_customer)))
+
+        products_for_customer = self.get_products(store_id, species)
+        if products_for_customer:
+            if product_type and product_type != "other":
+                products_per_temperature = self.get_products(store_id, species, product_type)
+                if products_per_temperature:
+                    return rng.choice(products_per_temperature)
+            return rng.choice(products_for_customer)
+
+        return rng.choice(self.products_by_store.get(store_id, []))
+
+class StoreIndex:
+    """Lojas indexadas por estado e por cidade, em arrays compactos de IDs."""
+
+    def __init__(self, stores):
+        self.store_ids = array("q", (store["ID"] for store in stores))
+        self.by_state = {}
+        self.by_city = {}
+
+        for store in stores:
+            self.by_state.setdefault(store["STATE_ID"], array("q")).append(store["ID"])
+            self.by_city.setdefault(store["CITY_ID"], array("q")).append(store["ID"])
+
+    def select_store_id(self, state_id, city_id=None, rng=None):
+        """Sorteia uma loja da cidade (quando informada) ou do estado; sem lojas ali, sorteia entre todas."""
+        rng = rng or random
+        candidates = self.by_city.get(city_id) if city_id is not None else self.by_state.get(state_id)
+
+        if candidates:
+            return candidates[int(rng.random() * len(candidates))]
+        return self.store_ids[int(rng.random() * len(self.store_ids))]
+
+class ServiceIndex:
+    """Serviços indexados por (cidade, espécie do pet), já filtrados pelas permissões de cada espécie.
+
+    Cada entrada guarda dois arrays paralelos: IDs dos serviços e endereços das lojas que os oferecem.
+    Pets de cidades sem serviços usam os serviços de todas as cidades, como antes."""
+
+    def __init__(self, services):
+        self.services = services
+        self.services_by_city = {}
+        for service in services:
+            self.services_by_city.setdefault(service["CITY_ID"], []).append(service)
+        self.index = {}
+
+    def get_services(self, city_id, specie_id):
+        """Retorna os arrays (IDs dos serviços, IDs dos endereços) permitidos para a espécie na cidade."""
+        city_key = city_id if city_id in self.services_by_city else None
+        key = (city_key, specie_id)
+        entry = self.index.get(key)
+
+        if entry is None:
+            services = self.services_by_city[city_key] if city_key is not None else self.services
+            allowed_services = get_allowed_services(specie_id, services)
+            entry = (
+                array("q", (service["ID"] for service in allowed_services)),
+                array("q", (service["ADDRESS_ID"] for service in allowed_services))
+            )
+            self.index[key] = entry
+
+        return entry
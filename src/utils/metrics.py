@@ -0,0 +1,139 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+class Metrics:
+    """Temporizadores e contadores dos pontos quentes (banco, Faker, sorteios), separados por estágio.
+
+    Desligado por padrão: enquanto enabled for False, os ganchos só verificam a flag. O estágio
+    corrente é guardado por thread, então estágios concorrentes não se misturam."""
+
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @property
+    def stage(self):
+        return getattr(self.local, "stage", None)
+
+    @stage.setter
+    def stage(self, name):
+        self.local.stage = name
+
+    def add_time(self, name, seconds, calls=1):
+        """Soma seconds ao temporizador name do estágio corrente."""
+        key = (self.stage, name)
+        with self.lock:
+            timer = self.timers.get(key)
+            if timer is None:
+                self.timers[key] = [calls, seconds, seconds]
+            else:
+                timer[0] += calls
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def increment(self, name, amount=1):
+        """Soma amount ao contador name do estágio corrente."""
+        if not self.enabled:
+            return
+        key = (self.stage, name)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        """Mede o tempo do bloco."""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorador que mede cada chamada da função."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.add_time(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def timed_iter(self, name, iterable):
+        """Mede o tempo gasto produzindo cada item do iterável (ex.: a geração das linhas de um estágio)."""
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(name, iterable)
+
+    def _timed_iter(self, name, iterable):
+        iterator = iter(iterable)
+        total, items = 0.0, 0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    total += time.perf_counter() - start
+                items += 1
+                yield item
+        finally:
+            self.add_time(name, total, items)
+
+    def reset(self):
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+
+    def snapshot(self):
+        """Copia os valores atuais (para juntar os de outros processos com merge)."""
+        with self.lock:
+            return {
+                "timers": {key: list(value) for key, value in self.timers.items()},
+                "counters": dict(self.counters)
+            }
+
+    def merge(self, snapshot):
+        """Soma os valores de um snapshot (de um processo do pool) ao estágio corrente."""
+        for (_, name), (calls, seconds, max_seconds) in snapshot["timers"].items():
+            self.add_time(name, seconds, calls)
+            key = (self.stage, name)
+            with self.lock:
+                self.timers[key][2] = max(self.timers[key][2], max_seconds)
+        for (_, name), amount in snapshot["counters"].items():
+            self.increment(name, amount)
+
+    def per_stage(self):
+        """Valores agrupados por estágio, prontos para o relatório."""
+        stages = {}
+        with self.lock:
+            for (stage, name), (calls, seconds, max_seconds) in self.timers.items():
+                stages.setdefault(stage, {"timers": {}, "counters": {}})["timers"][name] = {
+                    "calls": calls,
+                    "seconds": round(seconds, 6),
+                    "mean_ms": round(seconds / calls * 1000, 6) if calls else 0.0,
+                    "max_ms": round(max_seconds * 1000, 6)
+                }
+            for (stage, name), amount in self.counters.items():
+                stages.setdefault(stage, {"timers": {}, "counters": {}})["counters"][name] = amount
+        return stages
+
+# Instância única, compartilhada por todos os módulos do processo
+metrics = Metrics()
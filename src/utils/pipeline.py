@@ -0,0 +1,87 @@
+import queue
+import threading
+import time
+from utils.metrics import metrics
+
+# Marca o fim da produção na fila
+_DONE = object()
+
+class Prefetcher:
+    """Produz os itens de um iterável em uma thread, até size itens à frente do consumidor.
+
+    Enquanto o consumidor grava um lote no banco (esperando a rede, sem segurar o GIL), a thread
+    produtora já gera os próximos, então o tempo de um estágio se aproxima do maior entre geração
+    e gravação, e não da soma. Uma exceção na produção é repassada ao consumidor; ao fechar (use
+    com with), a produção para. Com size 0 os itens são produzidos na própria thread do consumidor.
+
+    wait_seconds acumula o tempo que o consumidor ficou esperando itens."""
+
+    def __init__(self, iterable, size):
+        self.iterable = iterable
+        self.size = size
+        self.wait_seconds = 0.0
+        self.items = queue.Queue(maxsize=max(size, 1))
+        self.stop = threading.Event()
+        self.producer = None
+        if size > 0:
+            # As métricas da produção continuam associadas ao estágio do consumidor
+            self.producer = threading.Thread(target=self.produce, args=(metrics.stage,), name="prefetch", daemon=True)
+            self.producer.start()
+
+    def produce(self, stage):
+        metrics.stage = stage
+        try:
+            for item in self.iterable:
+                if not self.put((item, None)):
+                    break
+            else:
+                self.put((_DONE, None))
+        except BaseException as error:
+            self.put((_DONE, error))
+        finally:
+            # Um gerador interrompido é fechado na thread que o consumia
+            close = getattr(self.iterable, "close", None)
+            if close:
+                close()
+
+    def put(self, entry):
+        """Põe o item na fila, esperando espaço enquanto o consumidor não desistir."""
+        while not self.stop.is_set():
+            try:
+                self.items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        if self.producer is None:
+            iterator = iter(self.iterable)
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, _DONE)
+                self.wait_seconds += time.perf_counter() - start
+                if item is _DONE:
+                    return
+                yield item
+
+        while True:
+            start = time.perf_counter()
+            item, error = self.items.get()
+            self.wait_seconds += time.perf_counter() - start
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+
+    def close(self):
+        self.stop.set()
+        if self.producer:
+            self.producer.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,15 @@
+import hashlib
+import random
+
+def derive_seed(master_seed, *names):
+    """Deriva uma semente independente e reprodutível a partir da semente mestre e de nomes (estágio, shard...)."""
+    data = ":".join(str(part) for part in (master_seed, *names)).encode()
+    return int.from_bytes(hashlib.sha256(data).digest()[:8], "big")
+
+def stage_rng(master_seed, *names):
+    """Cria um random.Random próprio do estágio (ou shard), independente dos demais e do random global."""
+    return random.Random(derive_seed(master_seed, *names))
+
+def new_master_seed():
+    """Sorteia uma semente mestre quando nenhuma foi informada."""
+    return random.SystemRandom().randrange(2 ** 32)
@@ -0,0 +1,110 @@
+from array import array
+from itertools import chain
+
+class ColumnBuffer:
+    """Linhas geradas guardadas por coluna, sem um dicionário (ou tupla) por linha.
+
+    As colunas inteiras (int_columns) ficam em array("q"), com 8 bytes por valor, e as demais em
+    listas. Os geradores das tabelas de fatos preenchem as colunas direto, os processos do pool
+    devolvem os buffers (o pickle de um array é compacto) e Database.insert, load e o FileSink os
+    consomem em lotes, fatiando as colunas."""
+
+    def __init__(self, columns, int_columns=()):
+        self.columns = list(columns)
+        self.data = [array("q") if column in int_columns else [] for column in self.columns]
+
+    @classmethod
+    def from_rows(cls, columns, rows):
+        """Buffer com as linhas informadas: dicionários (chaves com os nomes das colunas em minúsculas) ou tuplas na ordem das colunas."""
+        buffer = cls(columns)
+        if rows and isinstance(rows[0], dict):
+            buffer.data = [[row[column.lower()] for row in rows] for column in buffer.columns]
+        elif rows:
+            buffer.data = [list(values) for values in zip(*rows)]
+        return buffer
+
+    def __len__(self):
+        return len(self.data[0]) if self.data else 0
+
+    def column(self, name):
+        return self.data[self.columns.index(name)]
+
+    def append(self, row):
+        """Acrescenta uma linha: dicionário (chaves com os nomes das colunas em minúsculas) ou tupla na ordem das colunas."""
+        if isinstance(row, dict):
+            row = [row[column.lower()] for column in self.columns]
+        for values, value in zip(self.data, row):
+            values.append(value)
+
+    def select(self, columns):
+        """O mesmo buffer com as colunas na ordem informada (sem copiar os valores)."""
+        if columns == self.columns:
+            return self
+        buffer = ColumnBuffer(columns)
+        buffer.data = [self.column(column) for column in columns]
+        return buffer
+
+    def slice(self, start, end):
+        buffer = ColumnBuffer(self.columns)
+        buffer.data = [values[start:end] for values in self.data]
+        return buffer
+
+    def extend(self, other, start=0, end=None):
+        """Acrescenta as linhas de start a end de outro buffer com as mesmas colunas."""
+        for values, other_values in zip(self.data, other.data):
+            values.extend(other_values[start:end])
+
+    def with_column(self, name, values):
+        """Novo buffer com a coluna name (ex.: IDs atribuídos) antes das demais."""
+        buffer = ColumnBuffer([name] + self.columns)
+        buffer.data = [values] + self.data
+        return buffer
+
+    def rows(self):
+        """Linhas como tuplas, na ordem das colunas (para executemany e writerows)."""
+        return zip(*self.data)
+
+    def values(self):
+        """Valores de todas as linhas em sequência, linha a linha (para um INSERT com várias linhas)."""
+        return chain.from_iterable(zip(*self.data))
+
+def buffer_chunks(data, columns, size):
+    """Divide as linhas geradas em ColumnBuffers de até size linhas, com as colunas na ordem de columns.
+
+    data pode ter linhas (dicionários ou tuplas), agrupadas aqui, ou ColumnBuffers, que são
+    fatiados e juntados sem passar por linhas."""
+    chunk = ColumnBuffer(columns)
+    for buffer in as_buffers(data, columns, size):
+        start = 0
+        while start < len(buffer):
+            # Um buffer do tamanho exato do lote segue sem cópia
+            if not len(chunk) and start == 0 and len(buffer) == size:
+                yield buffer
+                break
+
+            end = min(len(buffer), start + size - len(chunk))
+            chunk.extend(buffer, start, end)
+            start = end
+            if len(chunk) >= size:
+                yield chunk
+                chunk = ColumnBuffer(columns)
+
+    if len(chunk):
+        yield chunk
+
+def as_buffers(data, columns, size):
+    rows = []
+    for item in data:
+        if isinstance(item, ColumnBuffer):
+            if rows:
+                yield ColumnBuffer.from_rows(columns, rows)
+                rows = []
+            yield item.select(columns)
+        else:
+            rows.append(item)
+            if len(rows) >= size:
+                yield ColumnBuffer.from_rows(columns, rows)
+                rows = []
+
+    if rows:
+        yield ColumnBuffer.from_rows(columns, rows)
@@ -0,0 +1,102 @@
+import random
+from itertools import accumulate
+from config.env import SAMPLING_BACKEND
+from utils.metrics import metrics
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BACKENDS = ("choices", "alias", "numpy")
+
+# Quantidade de sorteios gerados de uma vez pelos fluxos contínuos (stream)
+STREAM_BATCH_SIZE = 4096
+
+def build_alias_table(weights):
+    """Monta a tabela de alias (método de Vose) para sorteios em O(1)."""
+    n = len(weights)
+    total = sum(weights)
+    scaled = [weight * n / total for weight in weights]
+
+    prob = [0.0] * n
+    alias = [0] * n
+    small = [i for i, p in enumerate(scaled) if p < 1.0]
+    large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        prob[s] = scaled[s]
+        alias[s] = l
+        scaled[l] = scaled[l] + scaled[s] - 1.0
+        if scaled[l] < 1.0:
+            small.append(l)
+        else:
+            large.append(l)
+
+    # Sobras por erro de arredondamento ficam com probabilidade 1
+    for i in large + small:
+        prob[i] = 1.0
+        alias[i] = i
+
+    return prob, alias
+
+class WeightedSampler:
+    """Sorteador ponderado que devolve lotes inteiros de resultados por chamada."""
+
+    def __init__(self, keys, weights, backend=None):
+        backend = backend or SAMPLING_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de sorteio inválido: {backend!r}. Use um de {', '.join(BACKENDS)}")
+
+        # Sem NumPy instalado, o backend "numpy" cai para a bisseção do random.choices
+        if backend == "numpy" and np is None:
+            backend = "choices"
+
+        self.keys = list(keys)
+        self.weights = list(weights)
+        self.cum_weights = list(accumulate(self.weights))
+        self.backend = backend
+
+        if backend == "alias":
+            self.prob, self.alias = build_alias_table(self.weights)
+        elif backend == "numpy":
+            total = self.cum_weights[-1]
+            self.np_keys = np.array(self.keys, dtype=object)
+            self.np_probs = np.array(self.weights, dtype=float) / total
+
+    @metrics.timed("sampling.sample")
+    def sample(self, k, rng=None):
+        """Retorna uma lista com k sorteios."""
+        rng = rng or random
+
+        if k <= 0:
+            return []
+
+        metrics.increment("sampling.draws", k)
+
+        if self.backend == "alias":
+            n = len(self.keys)
+            keys = self.keys
+            prob = self.prob
+            alias = self.alias
+            rand = rng.random
+            result = []
+            for _ in range(k):
+                x = rand() * n
+                i = int(x)
+                result.append(keys[i] if x - i < prob[i] else keys[alias[i]])
+            return result
+
+        if self.backend == "numpy":
+            generator = np.random.default_rng(rng.getrandbits(64))
+            indexes = generator.choice(len(self.keys), size=k, p=self.np_probs)
+            return self.np_keys[indexes].tolist()
+
+        return rng.choices(self.keys, cum_weights=self.cum_weights, k=k)
+
+    def stream(self, batch_size=STREAM_BATCH_SIZE, rng=None):
+        """Gera sorteios indefinidamente, calculados em lotes de batch_size."""
+        while True:
+            yield from self.sample(batch_size, rng)
@@ -0,0 +1,99 @@
+import random
+from bisect import bisect
+from datetime import date, timedelta
+from itertools import accumulate
+from config.probabilities import load_config
+from utils.utils import get_period_dates, is_in_period
+
+SECONDS_PER_DAY = 86400
+
+# Dias além do fim do período com data formatada (datas de serviço até 30 dias depois da solicitação)
+EXTRA_DAYS = 31
+
+class Timeline:
+    """Linha do tempo das atividades no período do config (start_date a end_date), de qualquer tamanho.
+
+    Os instantes são segundos desde start_date: sortear, ordenar e comparar são operações com
+    inteiros, e a formatação usa as datas de cada dia pré-formatadas. A estação (warm/cold) de
+    cada dia também é pré-calculada, por dia do período e por (mês, dia) para datas fora dele.
+
+    O peso de cada dia vem de weekday_weights no config (opcional, "0" = segunda ... "6" = domingo);
+    sem ele, os instantes são uniformes no período."""
+
+    def __init__(self, config=None):
+        config = config or load_config()
+        self.start = config.start_date
+        self.num_days = max((config.end_date - config.start_date).days, 1)
+
+        first_day = self.start.date()
+        self.days = [(first_day + timedelta(days=index)).isoformat() for index in range(self.num_days + EXTRA_DAYS)]
+
+        temperature_periods = config.get("temperature_periods")
+        warm_period = get_period_dates(temperature_periods["warm_period"])
+        cold_period = get_period_dates(temperature_periods["cold_period"])
+
+        # Estação por (mês, dia), usando um ano bissexto para incluir 29/02
+        self.season_by_month_day = {}
+        day = date(2000, 1, 1)
+        while day.year == 2000:
+            month_day = (day.month, day.day)
+            if is_in_period(month_day, *warm_period):
+                self.season_by_month_day[month_day] = "warm"
+            elif is_in_period(month_day, *cold_period):
+                self.season_by_month_day[month_day] = "cold"
+            else:
+                self.season_by_month_day[month_day] = None
+            day += timedelta(days=1)
+
+        self.season_by_day = {
+            day_str: self.season_by_month_day[(int(day_str[5:7]), int(day_str[8:10]))]
+            for day_str in self.days
+        }
+
+        weekday_weights = config.raw.get("weekday_weights")
+        if weekday_weights:
+            weights = [float(weekday_weights.get(str((first_day + timedelta(days=index)).weekday()), 1)) for index in range(self.num_days)]
+            self.cum_weights = list(accumulate(weights))
+        else:
+            self.cum_weights = None
+
+    def sample(self, k, rng=None):
+        """Sorteia k instantes (segundos desde o início do período), já em ordem."""
+        rng = rng or random
+        rand = rng.random
+
+        if self.cum_weights is None:
+            total_seconds = self.num_days * SECONDS_PER_DAY
+            timestamps = [int(rand() * total_seconds) for _ in range(k)]
+        else:
+            cum_weights = self.cum_weights
+            total = cum_weights[-1]
+            timestamps = [
+                bisect(cum_weights, rand() * total) * SECONDS_PER_DAY + int(rand() * SECONDS_PER_DAY)
+                for _ in range(k)
+            ]
+
+        timestamps.sort()
+        return timestamps
+
+    def day(self, index):
+        """Data (AAAA-MM-DD) do dia index do período."""
+        if index < len(self.days):
+            return self.days[index]
+        return (self.start.date() + timedelta(days=index)).isoformat()
+
+    def format(self, timestamp):
+        """Formata o instante como AAAA-MM-DD HH:MM:SS."""
+        day, seconds = divmod(timestamp, SECONDS_PER_DAY)
+        hours, seconds = divmod(seconds, 3600)
+        minutes, seconds = divmod(seconds, 60)
+        return f"{self.day(day)} {hours:02d}:{minutes:02d}:{seconds:02d}"
+
+    def season(self, value):
+        """Estação ("warm", "cold" ou None) de uma data em texto (AAAA-MM-DD...) ou datetime, de qualquer ano."""
+        if isinstance(value, str):
+            season = self.season_by_day.get(value[:10], False)
+            if season is not False:
+                return season
+            return self.season_by_month_day[(int(value[5:7]), int(value[8:10]))]
+        return self.season_by_month_day[(value.month, value.day)]